@@ -0,0 +1,86 @@
+import argparse
+import os
+import time
+
+from tqdm import tqdm
+from fastgres.query_encoding.fast_extraction import parse_conjunctive_query
+from fastgres.query_encoding.query import Query
+from fastgres.workload.workload import Workload
+
+
+def extract(query: Query):
+    """
+    :return: tables, context, and attributes of a query or the error raised while extracting them
+    """
+    try:
+        return query.tables, query.context, query.attributes
+    except (KeyError, ValueError, TypeError, AttributeError) as error:
+        return type(error).__name__
+
+
+def compare(query_texts: dict[str, str]) -> list[str]:
+    """
+    :return: names of queries whose fast path extraction differs from the full parser
+    """
+    mismatches = list()
+    for query_name, query_text in tqdm(query_texts.items(), desc="Comparing Extractions"):
+        try:
+            expected = extract(Query(query_name, query_text))
+        except ValueError:
+            expected = "ValueError"
+        try:
+            actual = extract(Query.from_text(query_name, query_text))
+        except ValueError:
+            actual = "ValueError"
+        if expected != actual:
+            mismatches.append(query_name)
+    return mismatches
+
+
+def benchmark(query_texts: dict[str, str], fast_path: bool, repetitions: int) -> float:
+    """
+    :return: best time in seconds to extract the attributes of all queries
+    """
+    best = float("inf")
+    for _ in range(repetitions):
+        t0 = time.perf_counter()
+        for query_name, query_text in query_texts.items():
+            try:
+                query = Query.from_text(query_name, query_text) if fast_path else Query(query_name, query_text)
+                _ = query.context, query.attributes
+            except (KeyError, ValueError):
+                pass
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Check that the fast path extraction of tables, contexts, and "
+                                                 "attributes equals the full parser and compare their speed")
+    parser.add_argument("queries", help="Directory in which .sql-queries are located, e.g., queries/stack/")
+    parser.add_argument("-r", "--repetitions", type=int, default=3, help="Timed passes over the queries, the best "
+                                                                         "one is reported.")
+    parser.add_argument("-n", "--number", type=int, default=None, help="Optional: only use the first n queries.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.queries):
+        raise ValueError(f"Invalid query path: {args.queries}.")
+
+    workload = Workload(args.queries)
+    query_names = workload.query_names[:args.number]
+    query_texts = {query_name: workload.read_query(query_name) for query_name in query_names}
+
+    mismatches = compare(query_texts)
+    fast_queries = sum(parse_conjunctive_query(query_text) is not None for query_text in query_texts.values())
+    print(f"Fast path handled {fast_queries} / {len(query_texts)} queries, the others fell back to the full parser.")
+    if mismatches:
+        raise ValueError(f"Fast path extraction differs for {len(mismatches)} queries, e.g.: {mismatches[:5]}.")
+    print("All extractions are equal.")
+
+    full_time = benchmark(query_texts, False, args.repetitions)
+    fast_time = benchmark(query_texts, True, args.repetitions)
+    print(f"Full parser: {full_time:.3f}s, fast path: {fast_time:.3f}s, speedup: {full_time / fast_time:.1f}x.")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,179 @@
+import argparse
+import glob
+import hashlib
+import math
+import os
+import re
+import shutil
+import pandas as pd
+
+from tqdm import tqdm
+from fastgres.baseline.utility import save_json
+from fastgres.labeling.archive import DataframeArchive, JsonArchive
+
+
+RUN_PATTERN = re.compile(r"_split_(\d+)_seed_(\d+)\.csv$")
+FROZENSET_PATTERN = re.compile(r"frozenset\((?:\{([^}]*)\})?\)")
+NAME_PATTERN = re.compile(r"'([^']*)'")
+
+
+def get_partition(run_path: str) -> tuple[str, str]:
+    """
+    :return: seed and split of a run output, labeling archives without them fall into "none"
+    """
+    match = RUN_PATTERN.search(os.path.basename(run_path))
+    if match is None:
+        return "none", "none"
+    return match.group(2), match.group(1)
+
+
+def canonicalize_context(context: str) -> str:
+    """
+    Contexts are written as sets of frozensets, whose order depends on the string hash seed of the writing process.
+    :return: sorted tuples of sorted table names, or the context itself if it is no set of frozensets
+    """
+    tables = FROZENSET_PATTERN.findall(context)
+    if not tables:
+        return context
+    return repr(tuple(sorted(tuple(sorted(NAME_PATTERN.findall(names))) for names in tables)))
+
+
+def get_context_key(context: str) -> str:
+    return hashlib.sha1(context.encode("utf-8")).hexdigest()[:12]
+
+
+class Compactor:
+    """
+    Streams run outputs chunk-wise into a csv dataset partitioned by seed, split, and context. Identical rows of a
+    partition are dropped on disk afterwards by spilling the partition into hash buckets of about one chunk each, so
+    memory stays bounded by the chunk size.
+    """
+
+    def __init__(self, save_path: str, chunk_size: int):
+        self.save_path = save_path
+        self.chunk_size = chunk_size
+        # partition directory -> number of appended rows
+        self.partition_rows = dict()
+        self.contexts = dict()
+        self.written_rows = 0
+        self.duplicate_rows = 0
+
+    def _write(self, partition: str, chunk: pd.DataFrame) -> None:
+        partition_path = os.path.join(self.save_path, partition)
+        part_file = os.path.join(partition_path, "part.csv")
+        new_file = not os.path.exists(part_file)
+        os.makedirs(partition_path, exist_ok=True)
+        chunk.to_csv(part_file, mode="w" if new_file else "a", header=new_file, index=False)
+        self.partition_rows[partition] = self.partition_rows.get(partition, 0) + len(chunk)
+
+    def _deduplicate(self, partition: str) -> None:
+        partition_path = os.path.join(self.save_path, partition)
+        part_file = os.path.join(partition_path, "part.csv")
+        bucket_path = os.path.join(partition_path, "buckets")
+        bucket_count = max(1, math.ceil(self.partition_rows[partition] / self.chunk_size))
+        os.makedirs(bucket_path)
+        # rows are compared as written, identical rows always fall into the same bucket
+        for chunk in pd.read_csv(part_file, dtype=str, keep_default_na=False, chunksize=self.chunk_size):
+            buckets = pd.util.hash_pandas_object(chunk, index=False).to_numpy() % bucket_count
+            for bucket, bucket_chunk in chunk.groupby(buckets, sort=False):
+                bucket_file = os.path.join(bucket_path, f"{bucket}.csv")
+                new_file = not os.path.exists(bucket_file)
+                bucket_chunk.to_csv(bucket_file, mode="w" if new_file else "a", header=new_file, index=False)
+        os.remove(part_file)
+        for bucket in range(bucket_count):
+            bucket_file = os.path.join(bucket_path, f"{bucket}.csv")
+            if not os.path.exists(bucket_file):
+                continue
+            bucket_rows = pd.read_csv(bucket_file, dtype=str, keep_default_na=False)
+            unique_rows = bucket_rows.drop_duplicates()
+            new_file = not os.path.exists(part_file)
+            unique_rows.to_csv(part_file, mode="w" if new_file else "a", header=new_file, index=False)
+            self.written_rows += len(unique_rows)
+            self.duplicate_rows += len(bucket_rows) - len(unique_rows)
+        shutil.rmtree(bucket_path)
+
+    def deduplicate(self) -> None:
+        for partition in tqdm(sorted(self.partition_rows), desc="Deduplicating Partitions"):
+            self._deduplicate(partition)
+
+    def add_run(self, run_path: str) -> None:
+        seed, split = get_partition(run_path)
+        for chunk in pd.read_csv(run_path, chunksize=self.chunk_size):
+            if "context" not in chunk.columns:
+                self._write(os.path.join(f"seed={seed}", f"split={split}", "context=none"), chunk)
+                continue
+            contexts = chunk["context"].astype(str).map(canonicalize_context)
+            chunk["context"] = contexts
+            context_keys = contexts.map(get_context_key)
+            for context in contexts.unique():
+                self.contexts.setdefault(get_context_key(context), context)
+            for context_key, context_chunk in chunk.groupby(context_keys, sort=False):
+                self._write(os.path.join(f"seed={seed}", f"split={split}", f"context={context_key}"), context_chunk)
+
+    def save_contexts(self) -> None:
+        os.makedirs(self.save_path, exist_ok=True)
+        pd.DataFrame({"context_key": list(self.contexts.keys()), "context": list(self.contexts.values())}).to_csv(
+            os.path.join(self.save_path, "contexts.csv"), index=False)
+
+
+def load_partitions(save_path: str, seeds: list[str] = None, splits: list[str] = None) -> pd.DataFrame:
+    """
+    Reads selected partitions of a compacted dataset back into one frame with seed, split, and context_key columns.
+    """
+    frames = list()
+    for part_file in sorted(glob.glob(os.path.join(save_path, "seed=*", "split=*", "context=*", "part.csv"))):
+        context_dir = os.path.dirname(part_file)
+        split_dir = os.path.dirname(context_dir)
+        seed = os.path.basename(os.path.dirname(split_dir))[len("seed="):]
+        split = os.path.basename(split_dir)[len("split="):]
+        if (seeds is not None and seed not in seeds) or (splits is not None and split not in splits):
+            continue
+        frame = pd.read_csv(part_file)
+        frame["seed"], frame["split"] = seed, split
+        frame["context_key"] = os.path.basename(context_dir)[len("context="):]
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def convert_archive(archive_path: str, save_path: str) -> None:
+    if archive_path.endswith(".json"):
+        JsonArchive(archive_path).to_dataframe().to_csv(save_path, index=False)
+    else:
+        save_json(DataframeArchive(archive_path).to_json(), save_path)
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Compact run outputs into one deduplicated dataset partitioned by "
+                                                 "seed, split, and context, or convert between archive formats")
+    parser.add_argument("runs", nargs="+", help="Run output csvs or glob patterns, e.g., <base>_split_*_seed_*.csv. "
+                                                "With --convert, the one archive to convert.")
+    parser.add_argument("-o", "--output", required=True, help="Output directory of the compacted dataset or, with "
+                                                              "--convert, the converted archive")
+    parser.add_argument("-cs", "--chunk-size", type=int, default=100_000, help="Rows read at once.")
+    parser.add_argument("-cv", "--convert", action="store_true", help="Convert a json archive to csv or a csv "
+                                                                      "archive to json instead of compacting.")
+    args = parser.parse_args()
+
+    if os.path.exists(args.output):
+        raise ValueError(f"Save path: {args.output} already exists.")
+    run_paths = sorted(set(path for pattern in args.runs for path in glob.glob(pattern)))
+    if not run_paths:
+        raise ValueError(f"No run outputs found for: {args.runs}.")
+
+    if args.convert:
+        if len(run_paths) != 1:
+            raise ValueError(f"Exactly one archive can be converted, got: {len(run_paths)}.")
+        convert_archive(run_paths[0], args.output)
+        return
+
+    compactor = Compactor(args.output, args.chunk_size)
+    for run_path in tqdm(run_paths, desc="Compacting Runs"):
+        compactor.add_run(run_path)
+    compactor.deduplicate()
+    compactor.save_contexts()
+    print(f"Compacted {len(run_paths)} runs into {compactor.written_rows} rows, dropped {compactor.duplicate_rows} "
+          f"duplicates.")
+
+
+if __name__ == "__main__":
+    run()
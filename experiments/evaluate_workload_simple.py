@@ -6,18 +6,19 @@ import time
 import numpy as np
 import pandas as pd
 
-from sklearn.ensemble import GradientBoostingClassifier
+from typing import Optional
 from sklearn.model_selection import train_test_split
 from tqdm import tqdm
 from joblib.parallel import Parallel, delayed
 
 from fastgres.query_encoding.encoded_query import EncodedQuery
-from fastgres.labeling.archive import DataframeArchive
+from fastgres.labeling.archive import load_archive
 from fastgres.workload.workload import Workload
 from fastgres.baseline.database_connection import DatabaseConnection
 from fastgres.definitions import PathConfig
 from fastgres.model.context import Context
-from fastgres.query_encoding.query import Query
+from fastgres.model.model import Model, save_models
+from fastgres.query_encoding.query import CompactQuery, Query, prepare_queries
 from fastgres.baseline.utility import save_json, load_json, set_seeds
 from fastgres.baseline.log_utils import Logger, get_logger
 from fastgres.query_encoding.feature_extractor import EncodingInformation
@@ -39,7 +40,8 @@ class FastgresSettings:
 
     def __init__(self, query_path: str, save_path: str, config_path: str, archive_path: str, database_name: str,
                  train_size: float, execute_queries: bool, use_contexts: bool, seed: int, database_statistics_path: str,
-                 encoded_query_path: [str, None]):
+                 encoded_query_path: [str, None], query_cache_path: Optional[str] = None,
+                 manifest_path: Optional[str] = None):
         self.query_path = query_path
         self.save_path = save_path
         self.config_path = config_path
@@ -51,23 +53,27 @@ class FastgresSettings:
         self.seed = seed
         self.database_statistics_path = database_statistics_path
         self.encoded_query_path = encoded_query_path
+        self.query_cache_path = query_cache_path
+        self.manifest_path = manifest_path
 
-        self.workload = Workload(self.query_path)
+        self.workload = Workload(self.query_path, self.query_cache_path, self.manifest_path)
         self.log_name = os.path.basename(self.save_path)[:-4]  # truncate file extension .csv
         self.path_config = PathConfig(self.config_path)
         _ = Logger(self.path_config, f"{os.path.basename(self.save_path)[:-4]}.log")
         self.logger = get_logger()
         self.dbc = DatabaseConnection(self.path_config.get_db_connection(self.database_name), self.database_name)
-        self.archive = DataframeArchive(self.archive_path)
+        self.archive = load_archive(self.archive_path)
 
         if self.encoded_query_path is not None:
             self.logger.info("Loading pre-encoded queries.")
             loaded_encoded_queries = load_json(self.encoded_query_path)
             self.pre_encoded_queries = dict()
             for query_name, query_dict in loaded_encoded_queries.items():
-                q = Query.from_dict(query_dict)
-                self.pre_encoded_queries[query_name] = q
+                self.pre_encoded_queries[query_name] = CompactQuery.from_dict(query_dict)
             self.logger.info(f"Loaded {len(loaded_encoded_queries)} pre-encoded queries successfully.")
+        elif self.query_cache_path is not None:
+            self.pre_encoded_queries = prepare_queries(self.workload, compact=True)
+            self.logger.info(f"Prepared {len(self.pre_encoded_queries)} queries using cache: {self.query_cache_path}")
         else:
             self.logger.info("Did not load pre-encoded queries.")
             self.pre_encoded_queries = dict()
@@ -87,7 +93,7 @@ class FastgresSettings:
                 if self.pre_encoded_queries:
                     query = self.pre_encoded_queries[query_name]
                 else:
-                    query = Query(query_name, self.workload)
+                    query = Query.from_workload(query_name, self.workload).compact()
                 context = Context(query.context)
                 if context in context_dict:
                     context_dict[context].append(query)
@@ -100,7 +106,7 @@ class FastgresSettings:
                 if self.pre_encoded_queries:
                     query = self.pre_encoded_queries[query_name]
                 else:
-                    query = Query(query_name, self.workload)
+                    query = Query.from_workload(query_name, self.workload).compact()
                 if query.context not in merged_context.covered_contexts:
                     merged_context.add_context(query.context)
                 queries.append(query)
@@ -112,7 +118,7 @@ class FastgresSettings:
 
         def prep_context_input(context):
             context_queries = self.context_queries[context]
-            context_labels = np.array([self.archive.get_opt(query.name) for query in context_queries])
+            context_labels = self.archive.get_opts([query.name for query in context_queries])
 
             if self.train_size == 1.0:
                 return context, context_queries, context_queries, context_labels, context_labels
@@ -152,42 +158,12 @@ class FastgresSettings:
         return context_features
 
 
-class IntegerModel:
-
-    def __init__(self):
-        self._model_integer = None
-
-    def fit(self, labels: list[int]):
-        self._model_integer = labels[0]
-        return self
-
-    def predict(self, features):
-        return [self._model_integer for _ in features]
-
-
-class Model:
-
-    def __init__(self):
-        self._model = None
-
-    def fit(self, features, labels, seed):
-        if len(np.unique(labels)) <= 1:
-            int_model = IntegerModel()
-            return int_model.fit(labels)
-        self._model = GradientBoostingClassifier(max_depth=1000, random_state=seed).fit(features, labels)
-        return self._model
-
-    def predict(self, features):
-        if isinstance(self._model, IntegerModel):
-            return self._model.predict(features)
-        return int(self._model.predict(np.reshape(features, (1, -1)))[0])
-
-
-def train_models(context_train_features, context_train_labels, seed):
+def train_models(context_train_features, context_train_labels, seed, context_train_weights=None):
     def train_model(context, context_train_features, context_train_labels):
         features = context_train_features[context]
         tqdm.write(f"Training on: {len(features)} queries")
-        return context, Model().fit(features, context_train_labels[context], seed)
+        sample_weight = None if context_train_weights is None else context_train_weights[context]
+        return context, Model().fit(features, context_train_labels[context], seed, sample_weight)
 
     models_with_contexts = (Parallel(n_jobs=-1, prefer="threads")(
         delayed(train_model)
@@ -212,8 +188,8 @@ def run():
     parser.add_argument("-o", "--output", default=None, help="<Output/path.csv>")
     parser.add_argument("-c", "--config", default=None, help="<Database_config_path/>")
     parser.add_argument("-db", "--database", choices=["imdb", "stack_overflow"], help="Database that was used.")
-    parser.add_argument("-a", "--archive", default=None, help="<Path/to/archive.csv>. The archive is retrieved "
-                                                              "through labeling.")
+    parser.add_argument("-a", "--archive", default=None, help="<Path/to/archive.csv> or an indexed archive "
+                                                              "directory. The archive is retrieved through labeling.")
     parser.add_argument("-exec", "--execute-queries", action="store_true", help="Unused right now.")
     parser.add_argument("-uc", "--use-contexts", action="store_true", help="Use FG contextualization. "
                                                                            "If disabled, one global context is used.")
@@ -223,6 +199,19 @@ def run():
     parser.add_argument("-stats", "--statistics", default=None, help="<Path/to/statistics/>")
     parser.add_argument("-ecp", "--encoded-query-path", default=None, help="Optional: <path/to/pre-encoded/"
                                                                            "queries.json")
+    parser.add_argument("-qc", "--query-cache", default=None, help="Optional: <path/to/cache.pkl> of parsed queries "
+                                                                   "that is created if missing and updated for "
+                                                                   "changed queries.")
+    parser.add_argument("-wm", "--workload-manifest", default=None, help="Optional: <path/to/manifest.json> of the "
+                                                                         "query directory that is rescanned "
+                                                                         "incrementally and serves query texts from "
+                                                                         "one packed file.")
+    parser.add_argument("-tw", "--training-weights", default=None, choices=["calls", "total_time"],
+                        help="Optional: weight training queries by their captured calls or total time, see "
+                             "capture.py.")
+    parser.add_argument("-sm", "--save-models", default=None, help="Optional: <path/to/models.joblib> to save the "
+                                                                   "trained context models to, e.g., for seeding "
+                                                                   "the heuristic labeling.")
     args = parser.parse_args()
 
     if not os.path.exists(args.config):
@@ -237,6 +226,8 @@ def run():
         raise ValueError(f"Database statistic path: {args.statistics} does not exist.")
     if args.encoded_query_path is not None and not os.path.exists(args.encoded_query_path):
         raise ValueError(f"Encoded query path: {args.encoded_query_path} does not exist.")
+    if args.save_models is not None and os.path.exists(args.save_models):
+        raise ValueError(f"Model save path: {args.save_models} already exists.")
 
     '''Set all seeds for reproducibility'''
     set_seeds(args.seed)
@@ -244,7 +235,8 @@ def run():
     '''Set arguments for easier access'''
     fastgres_settings = FastgresSettings(args.queries, args.output, args.config, args.archive, args.database,
                                          args.train_size, args.execute_queries, args.use_contexts, args.seed,
-                                         args.statistics, args.encoded_query_path)
+                                         args.statistics, args.encoded_query_path, args.query_cache,
+                                         args.workload_manifest)
 
     '''Preparation Phase'''
     t0 = time.time_ns()
@@ -256,9 +248,17 @@ def run():
 
     '''Training Phase'''
     t0 = time.time_ns()
-    trained_models = train_models(context_train_features, context_train_labels, fastgres_settings.seed)
+    context_train_weights = None
+    if args.training_weights is not None:
+        context_train_weights = {context: [fastgres_settings.workload.get_weight(query.name, args.training_weights)
+                                           for query in context_train_queries[context]]
+                                 for context in context_train_queries}
+    trained_models = train_models(context_train_features, context_train_labels, fastgres_settings.seed,
+                                  context_train_weights)
     train_time = (time.time_ns() - t0) / 1_000_000
     print(f"Finished training in: {train_time / 1_000}s")
+    if args.save_models is not None:
+        save_models(trained_models, args.save_models)
 
     '''Testing Phase'''
     t0 = time.time_ns()
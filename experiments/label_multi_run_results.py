@@ -50,7 +50,7 @@ class LabelConfig:
 
 
 def label_results(config: LabelConfig):
-    default_hint_set_int = 2 ** config.used_hints_count - 1
+    default_hint_set_int = config.hs_factory.default_hint_set().hint_set_int
     config.logger.info(f"Default hint set: {default_hint_set_int}")
     result_df = pd.read_csv(config.archive_path)
     to_label_df = result_df[result_df["test_query"] == True]
@@ -32,17 +32,20 @@ class Result:
     split: int
 
 
-def merge(config: Config):
-    dfs = list()
+def merge(config: Config, chunk_size: int = 100_000):
+    """
+    Appends all runs chunk-wise to the save path, so memory does not grow with the number of runs.
+    """
+    header = True
     for split in config.splits:
         for seed in config.seeds:
             path = config.base_path + f"_split_{split}_seed_{seed}.csv"
             check_path_exists(path)
-            run_df = pd.read_csv(path)
-            run_df["seed"] = seed
-            run_df["split"] = split
-            dfs.append(run_df)
-    return pd.concat(dfs, ignore_index=True)
+            for run_df in pd.read_csv(path, chunksize=chunk_size):
+                run_df["seed"] = seed
+                run_df["split"] = split
+                run_df.to_csv(config.save_path, mode="w" if header else "a", header=header, index=False)
+                header = False
 
 
 def run():
@@ -51,14 +54,14 @@ def run():
     parser.add_argument("-o", "--output", default=None, help="")
     parser.add_argument("-s", "--seeds", type=int, nargs='+', help="")
     parser.add_argument("-ts", "--test-sizes", type=int, nargs='+', help="")
+    parser.add_argument("-cs", "--chunk-size", type=int, default=100_000, help="Rows read at once.")
     args = parser.parse_args()
 
     if os.path.exists(args.output):
         raise argparse.ArgumentError(args.output, "Save path already exists.")
 
     config = Config(args.output, args.base, args.seeds, args.test_sizes)
-    merged = merge(config)
-    merged.to_csv(config.save_path, index=False)
+    merge(config, args.chunk_size)
 
 
 if __name__ == "__main__":
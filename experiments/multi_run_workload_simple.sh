@@ -9,6 +9,10 @@ archive_path="<archive_path>.csv"
 statistics="<statistic_path/>"
 use_contexts=true
 encoded_query_path="<path_to_pre_encoded_queries>.json"
+# parsed queries are cached across runs and reparsed only if their file changed
+query_cache="<path_to_query_cache>.pkl"
+# query files are rescanned incrementally and read from one packed file next to the manifest
+workload_manifest="<path_to_workload_manifest>.json"
 
 # Loop over seeds
 for i in "${integers[@]}"; do
@@ -21,7 +25,7 @@ for i in "${integers[@]}"; do
         # leave -ecp if no queries were pre-encoded -> note this might take longer for more combinations
         python evaluate_workload_simple.py "$query_path" -o "$save_name" -c "$config_path" -db "$db_name" \
         -a "$archive_path" "$([ $use_contexts = true ] && echo "-uc")" -ts "$j" -stats "$statistics" \
-        -ecp "$encoded_query_path" -s "$i"
+        -ecp "$encoded_query_path" -qc "$query_cache" -wm "$workload_manifest" -s "$i"
 
         if [ $? -ne 0 ]; then
           echo "FAILED FASTgres eval on split: $j_int, seed: $i"
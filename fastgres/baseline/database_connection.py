@@ -4,7 +4,7 @@ import time
 import re
 import psycopg2 as pg
 
-from fastgres.hinting import HintSet, Hint
+from fastgres.hinting import HintSet, Hint, RUNTIME_KNOB_INSTRUCTIONS
 from tqdm import tqdm
 from typing import Optional
 
@@ -54,9 +54,11 @@ def startup_aware(retry_time: float, retries: int = 3):
 
 class DatabaseConnection:
 
-    def __init__(self, psycopg_connection_string: str, name: str = ''):
+    def __init__(self, psycopg_connection_string: str, name: str = '', search_path: Optional[str] = None):
         self.connection_string = psycopg_connection_string
         self.name = name
+        # e.g., the schema of a sampled replica that shadows the public tables
+        self.search_path = search_path
         self._connection = None
         self._cursor = None
         self._schema = None
@@ -125,7 +127,10 @@ class DatabaseConnection:
 
     def establish_connection(self):
         try:
-            connection = pg.connect(self.connection_string)
+            if self.search_path is not None:
+                connection = pg.connect(self.connection_string, options=f"-c search_path={self.search_path}")
+            else:
+                connection = pg.connect(self.connection_string)
             # https://www.psycopg.org/psycopg3/docs/basic/transactions.html#transactions
             connection.autocommit = True
         except ConnectionError:
@@ -201,23 +206,45 @@ class DatabaseConnection:
         self.cursor.execute("SET geqo = false;")
         self.close_cursor()
 
+    @staticmethod
+    def _format_hint_value(value) -> str:
+        # memory sizes and similar units need quoting, booleans and numbers do not
+        if isinstance(value, str):
+            return f"'{value}'"
+        return str(value)
+
     @staticmethod
     def _get_hint_statements(hint_set: HintSet):
         statement = ""
         for i in range(hint_set.collection.collection_size):
             name = hint_set.get_hint(i).database_instruction
-            value = hint_set.get(i)
+            value = DatabaseConnection._format_hint_value(hint_set.get(i))
             statement += f"SET {name}={value};\n"
         return statement
 
-    def _build_pre_statement(self, hint_set: HintSet, timeout: Optional[float]):
+    @staticmethod
+    def _get_changed_hint_statements(hint_set: HintSet, previous_hint_set: HintSet):
+        statement = ""
+        for i in range(hint_set.collection.collection_size):
+            if hint_set.get(i) == previous_hint_set.get(i):
+                continue
+            name = hint_set.get_hint(i).database_instruction
+            value = DatabaseConnection._format_hint_value(hint_set.get(i))
+            statement += f"SET {name}={value};\n"
+        return statement
+
+    def _build_pre_statement(self, hint_set: HintSet, timeout: Optional[float],
+                             previous_hint_set: Optional[HintSet] = None):
         statement = ""
         if timeout is not None and timeout > 0.0:
             adjusted_timeout = max(int(timeout), 500)
             statement += f"SET LOCAL statement_timeout = '{adjusted_timeout}ms';\n"
         elif timeout == 0.0:
             statement += "SET LOCAL statement_timeout = '0ms';\n"
-        statement += self._get_hint_statements(hint_set)
+        if previous_hint_set is None:
+            statement += self._get_hint_statements(hint_set)
+        else:
+            statement += self._get_changed_hint_statements(hint_set, previous_hint_set)
         return statement
 
     def evaluate_hinted_query(self, query: str, hint_set: HintSet, timeout: float = None,
@@ -230,9 +257,10 @@ class DatabaseConnection:
         if pre_warm:
             self.evaluate_hinted_query(query, hint_set, timeout)
         statement = self._build_pre_statement(hint_set, timeout)
-        statement += query
+        # only one execution is timed, either plain or instrumented
         if explain_analyze:
-            statement += "EXPLAIN (ANALYZE, FORMAT JSON, BUFFERS, SETTINGS) " + query
+            statement += "EXPLAIN (ANALYZE, FORMAT JSON, BUFFERS, SETTINGS) "
+        statement += query
         try:
             start = time.perf_counter_ns()
             self.cursor.execute(statement)
@@ -245,7 +273,7 @@ class DatabaseConnection:
                 self.connection.cancel()
             else:
                 raise
-        query_plan = self.cursor.fetchall() if explain_analyze else dict()
+        query_plan = self.cursor.fetchall()[0][0][0] if explain_analyze and result_time is not None else dict()
         query_result = QueryResult(query=query, hint_set_int=hint_set.hint_set_int,
                                    time=timeout if result_time is None else result_time, timeout_used=timeout,
                                    timed_out=True if result_time is None else False, pre_warmed=pre_warm,
@@ -253,12 +281,26 @@ class DatabaseConnection:
         self.close_cursor()
         return query_result
 
-    def explain_query(self, query: str, hint_set: HintSet) -> dict:
-        statement = self._build_pre_statement(hint_set, 0)
+    def explain_query(self, query: str, hint_set: HintSet, previous_hint_set: Optional[HintSet] = None) -> dict:
+        """
+        Retrieves the estimated query plan of a hinted query.
+        :param query: query to explain
+        :param hint_set: hint set to apply before explaining
+        :param previous_hint_set: hint set that was last applied on this connection. If given, only differing hints are
+        set, which is only valid if no other statement changed the session settings in between.
+        :return: json plan of the query
+        """
+        statement = self._build_pre_statement(hint_set, 0, previous_hint_set)
         statement += "EXPLAIN (FORMAT JSON) " + query
         self.cursor.execute(statement)
         query_plan = self.cursor.fetchall()[0][0][0]["Plan"]
         self.close_cursor()
+        runtime_settings = {hint_set.get_hint(i).database_instruction: hint_set.get(i)
+                            for i in range(hint_set.collection.collection_size)
+                            if hint_set.get_hint(i).database_instruction in RUNTIME_KNOB_INSTRUCTIONS}
+        if runtime_settings:
+            # knobs like jit or work_mem change runtimes of equal plans, which must therefore not be deduplicated
+            query_plan["Runtime Settings"] = runtime_settings
         return query_plan
 
     @staticmethod
@@ -271,6 +313,27 @@ class DatabaseConnection:
         self.close_cursor()
         return res
 
+    def get_settings(self, names: list[str]) -> dict[str, str]:
+        """
+        :return: current values of the given settings as reported by SHOW
+        """
+        settings = dict()
+        for name in names:
+            self.cursor.execute(f"SHOW {name};")
+            settings[name] = self.cursor.fetchall()[0][0]
+        self.close_cursor()
+        return settings
+
+    def get_active_backends(self) -> int:
+        """
+        :return: number of other client backends that are currently running a statement
+        """
+        self.cursor.execute("SELECT count(*) FROM pg_stat_activity "
+                            "WHERE state = 'active' AND backend_type = 'client backend' AND pid <> pg_backend_pid();")
+        res = self.cursor.fetchall()[0][0]
+        self.close_cursor()
+        return res
+
     def reset_statement_timeout(self):
         self.cursor.execute("SET statement_timeout to default;")
         self.close_cursor()
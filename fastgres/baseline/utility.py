@@ -1,3 +1,4 @@
+import hashlib
 import itertools
 import json
 import pickle
@@ -7,12 +8,15 @@ import math
 import numpy as np
 import random
 
-from typing import Any
+from typing import Any, Optional
+from fastgres.hinting.hint_library import get_weights, int_to_digits, digits_to_int
 
 
 class OperationMode(enum.Enum):
     SUB = 1
     ADD = 0
+    # labeling only, neighborhoods are always calculated in one direction
+    BOTH = 2
 
 
 def load_json(path: str) -> Any:
@@ -57,6 +61,23 @@ def int_to_binary(integer: int, bin_size: int) -> list[int]:
     return list(reversed([int(i) for i in bin(integer)[2:].zfill(bin_size)]))
 
 
+def gray_code(rank: int, radices: Optional[list[int]] = None) -> int:
+    """
+    Reflected gray code. Consecutive ranks map to integers that differ in exactly one (mixed radix) digit.
+    :param rank: position in the gray code sequence
+    :param radices: number of values per digit, binary if not given
+    :return: integer at the given position
+    """
+    if radices is None:
+        return rank ^ (rank >> 1)
+    weights = get_weights(radices)
+    digits = int_to_digits(rank, radices)
+    # a digit runs backwards whenever the count of all more significant digits is odd
+    gray_digits = [radix - 1 - digit if (rank // (weight * radix)) % 2 else digit
+                   for digit, radix, weight in zip(digits, radices, weights)]
+    return digits_to_int(gray_digits, radices)
+
+
 # https://stackoverflow.com/a/312464
 def chunks(lst, n):
     """Yield successive n-sized chunks from lst."""
@@ -65,16 +86,20 @@ def chunks(lst, n):
 
 
 def get_one_ring_of_hint_set(hint_set_int: int, hints_count: int, op_mode: OperationMode = OperationMode.SUB,
-                             hint_restrictions: set[int] = None) -> list[int]:
+                             hint_restrictions: set[int] = None, radices: Optional[list[int]] = None) -> list[int]:
     """
     Calculates the neighborhood of a hint set that is reachable by switching off/on one hint
     :param hint_set_int: integer from which to spread from
     :param hints_count: amount of hints used. this variable is used to transform into proper binary representations
     :param op_mode: operation method, which steers if hints should be added or deleted to obtain the neighborhood
     :param hint_restrictions: hints to not use when considering one rings
+    :param radices: number of values per hint for libraries containing non-boolean hints
     :return: hint set integers, representing the neighborhood sorted ascending
     """
 
+    if radices is not None and any(radix != 2 for radix in radices):
+        return get_mixed_radix_one_ring_of_hint_set(hint_set_int, radices, op_mode, hint_restrictions)
+
     if hint_set_int > 2 ** hints_count - 1:
         raise ValueError(f"hint set integer is bigger than value: {2 ** hints_count - 1} defined by hint set count")
     if hint_set_int < 0:
@@ -107,6 +132,43 @@ def get_one_ring_of_hint_set(hint_set_int: int, hints_count: int, op_mode: Opera
     return one_ring_sorted
 
 
+def get_mixed_radix_one_ring_of_hint_set(hint_set_int: int, radices: list[int],
+                                         op_mode: OperationMode = OperationMode.SUB,
+                                         hint_restrictions: set[int] = None) -> list[int]:
+    """
+    Generalization of get_one_ring_of_hint_set to hints with more than two values. The highest digit of each hint is
+    its default. Subtracting moves a single hint to any lower value, adding moves it to any higher one. Like in the
+    binary case, the returned offsets are subtracted from or added to the hint set integer.
+    :param hint_set_int: integer from which to spread from
+    :param radices: number of values per hint
+    :param op_mode: operation method, which steers if hints should be moved away from or towards their defaults
+    :param hint_restrictions: offsets of previous neighborhoods whose hints should not be used anymore
+    :return: offsets to the neighboring hint set integers sorted ascending
+    """
+    weights = get_weights(radices)
+    max_value = weights[-1] * radices[-1] - 1
+    if hint_set_int > max_value:
+        raise ValueError(f"hint set integer is bigger than value: {max_value} defined by hint radices")
+    if hint_set_int < 0:
+        raise ValueError(f"Hint set value: {hint_set_int} is negative")
+
+    restricted_indices = set()
+    for hint_restriction in hint_restrictions if hint_restrictions is not None else set():
+        # an offset k * w_i always lies in [w_i, w_(i+1)) since k < r_i
+        index = max([i for i in range(len(weights)) if weights[i] <= hint_restriction], default=None)
+        if index is None or hint_restriction % weights[index] != 0:
+            raise ValueError(f"Hint Restrictions: {hint_restrictions} are not valid")
+        restricted_indices.add(index)
+
+    one_ring = list()
+    for index, (digit, radix, weight) in enumerate(zip(int_to_digits(hint_set_int, radices), radices, weights)):
+        if index in restricted_indices:
+            continue
+        steps = range(1, digit + 1) if op_mode == OperationMode.SUB else range(1, radix - digit)
+        one_ring.extend(step * weight for step in steps)
+    return sorted(one_ring)
+
+
 class ExplainNode:
     """
     Based on: https://github.com/rbergm/PostBOUND/
@@ -141,6 +203,8 @@ class ExplainNode:
         self.temp_blocks_written = explain_data.get("Temp Written Blocks", math.nan)
 
         self.children = [ExplainNode(child) for child in explain_data.get("Plans", [])]
+        # only set on root nodes of hint sets with runtime knobs, other plans keep their previous fingerprints
+        self.runtime_settings = tuple(sorted(explain_data.get("Runtime Settings", dict()).items()))
 
         self.explain_data = explain_data
         self._hash_val = hash((self.node_type,
@@ -149,11 +213,32 @@ class ExplainNode:
                                self.filter_condition, self.index_condition, self.join_filter, self.hash_condition,
                                self.recheck_condition,
                                self.parent_relationship, self.parallel_workers,
-                               tuple(self.children)))
+                               tuple(self.children)) + ((self.runtime_settings,) if self.runtime_settings else ()))
+        self._fingerprint = None
 
     def __hash__(self):
         return self._hash_val
 
+    @property
+    def fingerprint(self) -> str:
+        """
+        Stable counterpart of the plan hash. Python salts string hashes per interpreter, so only the fingerprint can be
+        compared across processes or persisted next to labels.
+        :return: hexadecimal digest over the same plan attributes that are used for hashing
+        """
+        if self._fingerprint is None:
+            plan_attributes = (self.node_type,
+                               self.relation_name, self.relation_alias, self.index_name, self.subplan_name,
+                               self.cte_name,
+                               self.filter_condition, self.index_condition, self.join_filter, self.hash_condition,
+                               self.recheck_condition,
+                               self.parent_relationship, self.parallel_workers,
+                               tuple(child.fingerprint for child in self.children))
+            if self.runtime_settings:
+                plan_attributes += (self.runtime_settings,)
+            self._fingerprint = hashlib.sha1(repr(plan_attributes).encode("utf-8")).hexdigest()[:16]
+        return self._fingerprint
+
     def __eq__(self, other):
         return self._hash_val == other._hash_val
 
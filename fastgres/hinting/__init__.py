@@ -5,8 +5,9 @@ from .hint_library import HintLibrary
 from .hint_set import HintSet
 from .hint_set_factory import HintSetFactory
 from .pre_built_libraries import (PG_12_LIBRARY, PG_13_LIBRARY, PG_14_LIBRARY, PG_15_LIBRARY, PG_16_LIBRARY,
-                                  get_default_library, get_available_library)
+                                  KNOB_INSTRUCTIONS, RUNTIME_KNOB_INSTRUCTIONS, get_default_library,
+                                  get_available_library)
 
 __all__ = ["Hint", "HintLibrary", "HintSet", "HintSetFactory",
            "PG_12_LIBRARY", "PG_13_LIBRARY", "PG_14_LIBRARY", "PG_15_LIBRARY", "PG_16_LIBRARY",
-           "get_default_library", "get_available_library"]
+           "KNOB_INSTRUCTIONS", "RUNTIME_KNOB_INSTRUCTIONS", "get_default_library", "get_available_library"]
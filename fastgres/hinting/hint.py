@@ -1,18 +1,36 @@
 
 from __future__ import annotations
+from typing import Optional, Sequence, Union
 
 
 class Hint:
-    def __init__(self, name: str, index: int, database_instruction: str, instruction_value: bool):
+    def __init__(self, name: str, index: int, database_instruction: str, instruction_value: Union[bool, int, str],
+                 domain: Optional[Sequence[Union[int, str]]] = None):
+        """
+        :param name: name of the hint
+        :param index: position of the hint in its library
+        :param database_instruction: setting that is changed by this hint
+        :param instruction_value: default value of the setting
+        :param domain: discrete values the setting can take for non-boolean hints. Boolean hints leave this empty.
+        """
         self.name = name
         self.index = index
         self.database_instruction = database_instruction
         self.database_instruction_value = instruction_value
-        self.integer_representation = 2 ** self.index
+        self.is_boolean = domain is None
+        # the default is always placed last, such that the all-default hint set is the largest hint set integer
+        if self.is_boolean:
+            self.domain = (not instruction_value, instruction_value)
+        else:
+            if instruction_value not in domain:
+                raise ValueError(f"Default value: {instruction_value} of hint {name} is not in its domain {domain}")
+            self.domain = tuple(value for value in domain if value != instruction_value) + (instruction_value,)
+        self.radix = len(self.domain)
 
     @property
     def tuple(self):
-        return self.name, self.index, self.database_instruction, self.database_instruction_value
+        return (self.name, self.index, self.database_instruction, self.database_instruction_value,
+                None if self.is_boolean else list(self.domain))
 
     @property
     def instruction_tuple(self):
@@ -25,7 +43,8 @@ class Hint:
         return (self.name == other.name and
                 self.index == other.index and
                 self.database_instruction == other.database_instruction and
-                self.database_instruction_value == other.database_instruction_value)
+                self.database_instruction_value == other.database_instruction_value and
+                self.domain == other.domain)
 
     def __lt__(self, other: Hint):
         return self.index < other.index
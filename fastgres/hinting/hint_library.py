@@ -4,6 +4,37 @@ from typing import Optional
 from fastgres.hinting import Hint
 
 
+def get_weights(radices: list[int]) -> list[int]:
+    """
+    :param radices: number of values per digit, least significant digit first
+    :return: integer value of a single unit per digit in mixed radix notation
+    """
+    weights = list()
+    weight = 1
+    for radix in radices:
+        weights.append(weight)
+        weight *= radix
+    return weights
+
+
+def int_to_digits(integer: int, radices: list[int]) -> list[int]:
+    """
+    Mixed radix counterpart to utility.int_to_binary.
+    :param integer: integer to decompose
+    :param radices: number of values per digit, least significant digit first
+    :return: digits in the same order as the radices
+    """
+    digits = list()
+    for radix in radices:
+        integer, digit = divmod(integer, radix)
+        digits.append(digit)
+    return digits
+
+
+def digits_to_int(digits: list[int], radices: list[int]) -> int:
+    return sum(digit * weight for digit, weight in zip(digits, get_weights(radices)))
+
+
 class HintLibrary:
     def __init__(self, hint_list: Optional[list[Hint]]):
         self.hints = dict()
@@ -19,6 +50,31 @@ class HintLibrary:
     def collection_size(self) -> int:
         return self._collection_size
 
+    @property
+    def radices(self) -> list[int]:
+        return [self.hints[idx].radix for idx in sorted(self.hints.keys(), reverse=False)]
+
+    @property
+    def is_binary(self) -> bool:
+        return all(radix == 2 for radix in self.radices)
+
+    @property
+    def search_space_size(self) -> int:
+        """
+        Number of distinct hint sets. Hint set integers are mixed radix numbers, which for boolean hints reduces to
+        2 ** collection_size.
+        """
+        size = 1
+        for radix in self.radices:
+            size *= radix
+        return size
+
+    def get_digits(self, hint_set_int: int) -> list[int]:
+        return int_to_digits(hint_set_int, self.radices)
+
+    def get_hint_set_int(self, digits: list[int]) -> int:
+        return digits_to_int(digits, self.radices)
+
     def add_hints(self, hints: list[Hint]):
         for hint in hints:
             self.add_hint(hint)
@@ -50,7 +106,8 @@ class HintLibrary:
         return [self.hints[idx].name for idx in sorted(self.hints.keys(), reverse=False)]
 
     def get_values(self) -> list[int]:
-        return [self.hints[idx].integer_representation for idx in sorted(self.hints.keys(), reverse=False)]
+        # integer value of moving a hint by one step, which is 2 ** index for boolean hints
+        return get_weights(self.radices)
 
     def get_instructions(self) -> list[str]:
         return [self.hints[idx].database_instruction for idx in sorted(self.hints.keys(), reverse=False)]
@@ -61,6 +118,13 @@ class HintLibrary:
     def get_tuples(self) -> list[tuple]:
         return [self.hints[idx].tuple for idx in sorted(self.hints.keys(), reverse=False)]
 
+    def to_dict(self) -> dict:
+        return {"hints": [list(hint_tuple) for hint_tuple in self.get_tuples()]}
+
+    @classmethod
+    def from_dict(cls, library_dict: dict) -> HintLibrary:
+        return cls([Hint(*hint_tuple) for hint_tuple in library_dict["hints"]])
+
     def verify_integrity(self, verbose=False) -> bool:
         """
         Verifies different aspects needed in hint collections like continuous hint value order,
@@ -79,8 +143,9 @@ class HintLibrary:
         ascending_hint_integrity = ascending_hint_integrity and (self.collection_size == max_index + 1)
         overlapping_instructions = True if len(instructions) == self.collection_size else False
 
-        _default_instruction_integrity = [True if entry in [True, False] else False
-                                          for entry in default_instruction_values]
+        _default_instruction_integrity = [True if (hint.is_boolean and value in [True, False])
+                                          or (not hint.is_boolean and hint.radix >= 2) else False
+                                          for hint, value in zip(self.get_hints(), default_instruction_values)]
         default_value_integrity = False if False in _default_instruction_integrity else True
 
         if verbose:
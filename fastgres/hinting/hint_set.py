@@ -1,5 +1,6 @@
 
 import numpy as np
+from typing import Union
 from fastgres.hinting import HintLibrary, Hint
 
 
@@ -16,7 +17,7 @@ class HintSet:
         self.hints_used = self.collection.collection_size
         self.instructions = self.collection.get_instructions()
 
-        if not 0 <= hint_set_int < 2**self.hints_used:
+        if not 0 <= hint_set_int < self.collection.search_space_size:
             raise ValueError(f"Hint Set Integer: {hint_set_int} out of bounds for {self.hints_used} hints")
 
         [self.__setattr__(hint.name, hint.database_instruction_value) for hint in self.collection.get_hints()]
@@ -36,8 +37,8 @@ class HintSet:
         return
 
     def hint_set_from_int(self):
-        binary = self.get_binary()
-        self.hint_set_from_int_list(binary)
+        digits = self.get_digits()
+        self.hint_set_from_digits(digits)
 
     def hint_set_from_int_list(self, binary: list[int]):
         uniques = np.unique(binary)
@@ -45,16 +46,34 @@ class HintSet:
             raise ValueError(f"Trying to set hint from non binary int list {binary}")
         [self._flip_hint(index) for index in range(self.hints_used) if binary[index] == 0]
 
+    def hint_set_from_digits(self, digits: list[int]):
+        hints = self.collection.get_hints()
+        if not all(0 <= digit < hint.radix for digit, hint in zip(digits, hints)):
+            raise ValueError(f"Trying to set hint from invalid digits {digits} for radices {self.collection.radices}")
+        [self._set_hint_i(hint.index, hint.domain[digit]) for digit, hint in zip(digits, hints)
+         if digit != hint.radix - 1]
+
     def _flip_hint(self, index: int):
+        if not self.get_hint(index).is_boolean:
+            raise ValueError(f"Trying to flip non-boolean hint {self.get_hint(index).name}")
         self._set_hint_i(index, not self.get(index))
 
     def get_boolean_representation(self) -> list[int]:
         return [self.get(i) for i in range(self.hints_used)]
 
     def get_binary(self) -> list[int]:
+        if not self.collection.is_binary:
+            return self.get_digits()
         value = self.hint_set_int
         return list(reversed([int(i) for i in bin(value)[2:].zfill(self.hints_used)]))
 
+    def get_digits(self) -> list[int]:
+        """
+        Mixed radix representation of the hint set, in which the highest digit of a hint is its default. For boolean
+        hints, this equals the binary representation.
+        """
+        return self.collection.get_digits(self.hint_set_int)
+
     def get_hint(self, index: int) -> Hint:
         try:
             return self.collection.hints[index]
@@ -62,20 +81,23 @@ class HintSet:
             raise KeyError(f"Trying to access hint index: {index} "
                            f"that is not in collection with indices: {self.collection.hints.keys()}")
 
-    def get(self, index: int) -> bool:
+    def get(self, index: int) -> Union[bool, int, str]:
         try:
             return self.__getattribute__(self.collection.hints[index].name)
         except KeyError:
             raise KeyError(f"Trying to access attribute index: {index} "
                            f"that is not in collection with indices: {self.collection.hints.keys()}")
 
-    def _set_hint_i(self, index: int, value: bool):
-        if value not in [True, False]:
-            raise ValueError('Trying to set hint set from non boolean')
+    def _set_hint_i(self, index: int, value: Union[bool, int, str]):
         if index not in range(len(self.instructions)):
             raise ValueError(f'Index {index} is out of bounds for {len(self.instructions)} operators')
         if index not in self.collection.hints.keys():
             raise ValueError(f'Index {index} is not a valid hint index in collection '
                              f'with indices: {self.collection.hints.keys()}')
+        if self.get_hint(index).is_boolean and value not in [True, False]:
+            raise ValueError('Trying to set hint set from non boolean')
+        if value not in self.get_hint(index).domain:
+            raise ValueError(f'Value {value} is not in the domain {self.get_hint(index).domain} '
+                             f'of hint {self.get_hint(index).name}')
         self.__setattr__(self.get_hint(index).name, value)
         return
@@ -15,4 +15,4 @@ class HintSetFactory:
         return HintSet(hint_set_int, self.hint_library)
 
     def default_hint_set(self):
-        return self.hint_set(2**self.hint_library.collection_size-1)
+        return self.hint_set(self.hint_library.search_space_size-1)
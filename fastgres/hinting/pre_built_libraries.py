@@ -1,17 +1,19 @@
 from __future__ import annotations
 from collections import namedtuple
+from typing import Optional
 from fastgres.hinting import HintLibrary, Hint
 
 
 def reindex(input_tuples: list[PostgresHint]):
     new_input = list()
     for idx in range(len(input_tuples)):
-        name, index, instruction, value = input_tuples[idx]
-        new_input.append(PostgresHint(name, idx, instruction, value))
+        name, index, instruction, value, domain = input_tuples[idx]
+        new_input.append(PostgresHint(name, idx, instruction, value, domain))
     return new_input
 
 
-PostgresHint = namedtuple('PostgresHint', ['name', 'index', 'instruction', 'value'])
+# domain is only given for non-boolean hints, whose values are encoded in mixed radix
+PostgresHint = namedtuple('PostgresHint', ['name', 'index', 'instruction', 'value', 'domain'], defaults=(None,))
 
 # pg12
 INDEX_ONLY_SCAN = PostgresHint("INDEX_ONLY_SCAN", 0, "enable_indexonlyscan", True)
@@ -50,6 +52,14 @@ ASYNC_APPEND = PostgresHint("ASYNC_APPEND", 16, "enable_async_append", True)
 # GEQO
 GEQO = PostgresHint("GEQO", 21, "geqo", True)
 
+# planner knobs
+# The values are applied as part of every hint set. The listed defaults are those of PostgreSQL, libraries should be
+# built from the settings of the server instead, see get_knob_hint_tuples.
+JIT = PostgresHint("JIT", 22, "jit", True)
+JOIN_COLLAPSE_LIMIT = PostgresHint("JOIN_COLLAPSE", 23, "join_collapse_limit", 8, (1, 4, 8))
+PARALLEL_WORKERS = PostgresHint("PARA_WORKERS", 24, "max_parallel_workers_per_gather", 2, (0, 2, 4))
+WORK_MEM = PostgresHint("WORK_MEM", 25, "work_mem", "4MB", ("1MB", "4MB", "64MB", "256MB"))
+
 CORE_HINT_TUPLES = [
     INDEX_ONLY_SCAN,
     SEQ_SCAN,
@@ -79,6 +89,10 @@ PG16_HINT_TUPLES = reindex([*PG15_HINT_TUPLES, PRESORTED_AGGREGATION])
 PARTITION_HINT_TUPLES = [PARTITION_WISE_AGGREGATE, PARTITION_WISE_JOIN, PARTITION_PRUNING]
 BACKEND_HINT_TUPLES = [ASYNC_APPEND]
 MISC_HINT_TUPLES = [GEQO]
+KNOB_HINT_TUPLES = [JIT, JOIN_COLLAPSE_LIMIT, PARALLEL_WORKERS, WORK_MEM]
+KNOB_INSTRUCTIONS = [knob.instruction for knob in KNOB_HINT_TUPLES]
+# knobs that change the runtime of a query without necessarily changing its plan
+RUNTIME_KNOB_INSTRUCTIONS = {JIT.instruction, PARALLEL_WORKERS.instruction, WORK_MEM.instruction}
 
 CORE_HINT_LIBRARY = HintLibrary([Hint(*entry) for entry in CORE_HINT_TUPLES])
 PG_12_LIBRARY = HintLibrary([Hint(*entry) for entry in PG12_HINT_TUPLES])
@@ -88,10 +102,40 @@ PG_15_LIBRARY = HintLibrary([Hint(*entry) for entry in PG15_HINT_TUPLES])
 PG_16_LIBRARY = HintLibrary([Hint(*entry) for entry in PG16_HINT_TUPLES])
 
 
+def parse_setting(knob: PostgresHint, setting: str):
+    """
+    Converts a setting as reported by SHOW to the type of the knob value.
+    """
+    if isinstance(knob.value, bool):
+        return setting.lower() in ("on", "true", "yes", "1")
+    if isinstance(knob.value, int):
+        return int(setting)
+    return setting
+
+
+def get_knob_hint_tuples(knob_settings: Optional[dict[str, str]] = None) -> list[PostgresHint]:
+    """
+    :param knob_settings: current server settings by instruction, e.g., from DatabaseConnection.get_settings
+    :return: knob hints whose default is the server setting, which is added to the domain if it is not one of its tiers
+    """
+    if knob_settings is None:
+        return list(KNOB_HINT_TUPLES)
+    knobs = list()
+    for knob in KNOB_HINT_TUPLES:
+        value = parse_setting(knob, knob_settings[knob.instruction])
+        domain = knob.domain
+        if domain is not None and value not in domain:
+            domain = (*domain, value)
+        knobs.append(PostgresHint(knob.name, knob.index, knob.instruction, value, domain))
+    return knobs
+
+
 def get_available_library(postgres_version: str,
                           use_partition_hints: bool = False,
                           use_misc: bool = True,
-                          use_backend: bool = False) -> HintLibrary:
+                          use_backend: bool = False,
+                          use_knobs: bool = False,
+                          knob_settings: Optional[dict[str, str]] = None) -> HintLibrary:
     hints = []
     pg_v = None
     if "12" in postgres_version:
@@ -112,16 +156,23 @@ def get_available_library(postgres_version: str,
     if not hints or pg_v is None:
         raise ValueError(f"Unknown PostgreSQL version {postgres_version}")
 
+    # copy to not extend the module level hint lists
+    hints = list(hints)
     if use_partition_hints:
         hints.extend(PARTITION_HINT_TUPLES)
     if use_misc:
         hints.extend(MISC_HINT_TUPLES)
     if use_backend and pg_v > 13:
         hints.extend(BACKEND_HINT_TUPLES)
+    if use_knobs:
+        hints.extend(get_knob_hint_tuples(knob_settings))
 
     hints = reindex(hints)
     return HintLibrary([Hint(*entry) for entry in hints])
 
 
-def get_default_library() -> HintLibrary:
+def get_default_library(use_knobs: bool = False, knob_settings: Optional[dict[str, str]] = None) -> HintLibrary:
+    if use_knobs:
+        return HintLibrary([Hint(*entry) for entry in reindex([*CORE_HINT_TUPLES,
+                                                                *get_knob_hint_tuples(knob_settings)])])
     return CORE_HINT_LIBRARY
@@ -0,0 +1,218 @@
+import argparse
+import dataclasses
+import math
+import os
+import random
+import time
+import numpy as np
+import pandas as pd
+
+from typing import Optional
+from tqdm import tqdm
+from fastgres.baseline.utility import ExplainNode
+from fastgres.labeling.archive import DataframeArchive
+from fastgres.labeling.heuristic_labeling import HeuristicLabelingSettings, Labeling
+from fastgres.model.context import Context
+from fastgres.model.model import IntegerModel, Model, save_models
+from fastgres.query_encoding.encoded_query import EncodedQuery
+from fastgres.query_encoding.feature_extractor import EncodingInformation
+from fastgres.query_encoding.query import Query
+
+
+@dataclasses.dataclass
+class ActiveLearningRound:
+    round: int
+    labeled_queries: int
+    batch_size: int
+    batch_accuracy: Optional[float]
+    mean_uncertainty: float
+    labeling_time: float
+
+
+class ActiveLearning:
+    """
+    Labels only the queries the current context models are least sure about. Each round trains the models on all
+    labels so far and scores unlabeled queries by their uncertainty, i.e., one minus the highest class probability,
+    weighted by the log planner cost of their default plan as stake of a wrong prediction. Before a batch is labeled,
+    the models' predictions for it are checked against the new labels, which gives a pessimistic accuracy estimate.
+    """
+
+    def __init__(self, settings: HeuristicLabelingSettings, statistics_path: str, use_contexts: bool, seed: int,
+                 archive_path: Optional[str] = None):
+        self.settings = settings
+        self.seed = seed
+        self.labeling = Labeling(settings)
+        self.encoding_info = EncodingInformation(self.settings.dbc, statistics_path, self.settings.workload)
+        self.default_hint_set = self.settings.hs_factory.default_hint_set()
+
+        queries = [Query.from_workload(query_name, self.settings.workload)
+                   for query_name in tqdm(self.settings.workload.query_names, desc="Parsing Queries")]
+        if use_contexts:
+            contexts = {query.context: Context(query.context) for query in queries}
+            self.query_contexts = {query.name: contexts[query.context] for query in queries}
+        else:
+            merged_context = Context()
+            for query in queries:
+                if query.context not in merged_context.covered_contexts:
+                    merged_context.add_context(query.context)
+            self.query_contexts = {query.name: merged_context for query in queries}
+        self.features = {query.name: EncodedQuery(self.query_contexts[query.name], query,
+                                                  self.encoding_info).encoded_query
+                         for query in tqdm(queries, desc="Featurizing Queries")}
+
+        # query name -> optimal hint set integer
+        self.labels = dict()
+        if archive_path is not None:
+            archive = DataframeArchive(archive_path)
+            for query_name in np.unique(archive.archive["query_name"]):
+                if query_name in self.features:
+                    self.labels[query_name] = int(archive.get_opt(query_name))
+            self.settings.logger.info(f"Loaded {len(self.labels)} labels from archive: {archive_path}")
+        self._stakes = dict()
+
+    def get_stake(self, query_name: str) -> float:
+        if query_name not in self._stakes:
+            query = self.settings.workload.read_query(query_name)
+            cost = ExplainNode(self.settings.dbc.explain_query(query, self.default_hint_set)).cost
+            self._stakes[query_name] = math.log1p(cost) if cost > 0.0 else 1.0
+        return self._stakes[query_name]
+
+    def train_models(self) -> dict[Context, object]:
+        context_queries = dict()
+        for query_name in self.labels:
+            try:
+                context_queries[self.query_contexts[query_name]].append(query_name)
+            except KeyError:
+                context_queries[self.query_contexts[query_name]] = [query_name]
+        return {context: Model().fit([self.features[query_name] for query_name in query_names],
+                                     [self.labels[query_name] for query_name in query_names], self.seed)
+                for context, query_names in context_queries.items()}
+
+    def predict(self, models: dict[Context, object], query_name: str) -> tuple[Optional[int], float]:
+        """
+        :return: predicted hint set integer and uncertainty, which is maximal for contexts without labels
+        """
+        context = self.query_contexts[query_name]
+        if context not in models:
+            return None, 1.0
+        model = models[context]
+        if isinstance(model, IntegerModel):
+            # a single label seen so far says little about the remaining queries of a context
+            return int(model.predict([self.features[query_name]])[0]), 0.5
+        probabilities = model.predict_proba(np.reshape(self.features[query_name], (1, -1)))[0]
+        best = int(np.argmax(probabilities))
+        return int(model.classes_[best]), 1.0 - float(probabilities[best])
+
+    def select(self, models: dict[Context, object], batch_size: int) -> tuple[list[str], dict[str, Optional[int]],
+                                                                             float]:
+        unlabeled = [query_name for query_name in self.settings.workload.query_names if query_name not in self.labels]
+        predictions, scores, uncertainties = dict(), dict(), list()
+        for query_name in tqdm(unlabeled, desc="Scoring Queries"):
+            prediction, uncertainty = self.predict(models, query_name)
+            predictions[query_name] = prediction
+            uncertainties.append(uncertainty)
+            scores[query_name] = uncertainty * self.get_stake(query_name)
+        batch = sorted(unlabeled, key=lambda query_name: (-scores[query_name], query_name))[:batch_size]
+        return batch, {query_name: predictions[query_name] for query_name in batch}, \
+            float(np.mean(uncertainties)) if uncertainties else 0.0
+
+    def label_batch(self, batch: list[str]) -> None:
+        for query_name in batch:
+            self.settings.logger.info(f"Labeling selected query: {query_name}")
+            rows = self.labeling.label_query_rows(query_name)
+            self.labels[query_name] = self.labeling.results.get(self.labeling.get_opt_row(rows), "hint_set_int")
+            self.labeling.results.to_csv(self.settings.save_path, rows.start, rows.stop,
+                                         append=os.path.exists(self.settings.save_path))
+            self.labeling.results.clear()
+
+    def run(self, initial_size: int, batch_size: int, target_accuracy: float,
+            max_queries: Optional[int] = None) -> list[ActiveLearningRound]:
+        rounds = list()
+        max_queries = len(self.features) if max_queries is None else min(max_queries, len(self.features))
+        save_stem = self.settings.save_path[:-4]
+        unlabeled = sorted(query_name for query_name in self.features if query_name not in self.labels)
+        initial_batch = random.Random(self.seed).sample(unlabeled, min(initial_size, len(unlabeled)))
+
+        t0 = time.time()
+        self.label_batch(initial_batch)
+        rounds.append(ActiveLearningRound(0, len(self.labels), len(initial_batch), None, 1.0, time.time() - t0))
+        while len(self.labels) < max_queries:
+            models = self.train_models()
+            batch, predictions, mean_uncertainty = self.select(models, min(batch_size, max_queries - len(self.labels)))
+            if not batch:
+                break
+            t0 = time.time()
+            self.label_batch(batch)
+            accuracy = float(np.mean([predictions[query_name] == self.labels[query_name] for query_name in batch]))
+            rounds.append(ActiveLearningRound(len(rounds), len(self.labels), len(batch), accuracy, mean_uncertainty,
+                                              time.time() - t0))
+            self.settings.logger.info(f"Round {len(rounds) - 1}: {len(self.labels)} labeled queries, batch accuracy: "
+                                      f"{round(accuracy, 4)}, mean uncertainty: {round(mean_uncertainty, 4)}")
+
+            pd.DataFrame([entry.__dict__ for entry in rounds]).to_csv(save_stem + "_rounds.csv", index=False)
+            if accuracy >= target_accuracy:
+                self.settings.logger.info(f"Reached target accuracy: {target_accuracy}")
+                break
+        pd.DataFrame([entry.__dict__ for entry in rounds]).to_csv(save_stem + "_rounds.csv", index=False)
+        return rounds
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Iteratively label the queries whose optimal hint sets the current "
+                                                 "context models are least sure about")
+    parser.add_argument("queries", help="Directory in which .sql-queries are located")
+    parser.add_argument("-o", "--output", required=True, help="Output csv save name")
+    parser.add_argument("-c", "--config", required=True, help="Path to config file.")
+    parser.add_argument("-db", "--database", required=True, choices=["imdb", "stack_overflow"], help="")
+    parser.add_argument("-stats", "--statistics", required=True, help="<Path/to/statistics/>")
+    parser.add_argument("-ud", "--use-default", action="store_true", help="Whether or not to use default (six) hints.")
+    parser.add_argument("-ue", "--use-experience", action="store_true", help="Whether or not to use experience.")
+    parser.add_argument("-ues", "--use-early-stopping", action="store_true", help="Whether or not to use "
+                                                                                  "early stopping.")
+    parser.add_argument("-uhr", "--use-hint-removal", action="store_true", help="Whether or not to use hint removal.")
+    parser.add_argument("-ulr", "--use-level-restriction", action="store_true", help="Whether or not to use "
+                                                                                     "level restriction.")
+    parser.add_argument("-m", "--mode", default="sub", choices=["sub", "add", "both"],
+                        help="Which mode (adding/subtracting) of hints to use. This refers to enabling and disabling.")
+    parser.add_argument("-uc", "--use-contexts", action="store_true", help="Use FG contextualization. "
+                                                                           "If disabled, one global context is used.")
+    parser.add_argument("-a", "--archive", default=None, help="Optional: <path/to/archive.csv> of already labeled "
+                                                              "queries.")
+    parser.add_argument("-s", "--seed", type=int, default=47, help="Seed to use for reproducibility.")
+    parser.add_argument("-is", "--initial-size", type=int, default=10, help="Number of randomly labeled queries.")
+    parser.add_argument("-bs", "--batch-size", type=int, default=10, help="Number of queries labeled per round.")
+    parser.add_argument("-ta", "--target-accuracy", type=float, default=0.8, help="Batch accuracy to stop at.")
+    parser.add_argument("-mq", "--max-queries", type=int, default=None, help="Optional: labeling budget in queries.")
+    parser.add_argument("-sm", "--save-models", default=None, help="Optional: <path/to/models.joblib> to save the "
+                                                                   "final context models to.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.queries):
+        raise ValueError(f"Invalid query path: {args.queries}.")
+    if os.path.exists(args.output):
+        raise ValueError(f"Save path: {args.output} already exists.")
+    if not os.path.exists(args.config):
+        raise ValueError(f"Invalid config path: {args.config}.")
+    if not os.path.exists(args.statistics):
+        raise ValueError(f"Database statistic path: {args.statistics} does not exist.")
+    if args.archive is not None and not os.path.exists(args.archive):
+        raise ValueError(f"Invalid archive path: {args.archive}.")
+    if args.batch_size < 1:
+        raise ValueError(f"Batch size: {args.batch_size} is smaller than one.")
+
+    settings = HeuristicLabelingSettings(args.queries, args.output, args.config, args.database, False,
+                                         args.use_default, args.use_experience, args.use_early_stopping,
+                                         args.use_hint_removal, args.use_level_restriction, args.mode)
+    settings.dbc.disable_geqo()
+
+    active_learning = ActiveLearning(settings, args.statistics, args.use_contexts, args.seed, args.archive)
+    rounds = active_learning.run(args.initial_size, args.batch_size, args.target_accuracy, args.max_queries)
+    settings.logger.info(f"Finished active learning after {len(rounds)} rounds with {len(active_learning.labels)} / "
+                         f"{len(active_learning.features)} labeled queries in "
+                         f"{round(sum(entry.labeling_time for entry in rounds), 2)}s of labeling")
+    if args.save_models is not None:
+        save_models(active_learning.train_models(), args.save_models)
+
+
+if __name__ == "__main__":
+    run()
@@ -1,9 +1,15 @@
 
 import abc
+import argparse
+import os
 import numpy as np
 import pandas as pd
 import fastgres.baseline.utility as u
 
+from itertools import chain
+from typing import Optional
+from fastgres.hinting import HintLibrary
+
 
 class Archive(abc.ABC):
 
@@ -14,6 +20,9 @@ class Archive(abc.ABC):
     def get_opt(self, query_name: str):
         raise NotImplementedError
 
+    def get_opts(self, query_names: list[str]) -> np.ndarray:
+        return np.array([self.get_opt(query_name) for query_name in query_names])
+
 
 class JsonArchive(Archive):
 
@@ -41,22 +50,21 @@ class JsonArchive(Archive):
               - opt - hint set int
         :return: dataframe with columns query_name: str, hint_set_int: int, time: float, opt: bool
         """
-        entries = list()
-        for query_name in self.archive.keys():
-            opt_hint_set_int = int(self.archive[query_name]["opt"])
-            for hint_set_int in self.archive[query_name].keys():
-                if "opt" in hint_set_int:
-                    continue
-                entry = dict()
-                entry["query_name"] = query_name
-                entry["hint_set_int"] = hint_set_int
-                entry["time"] = self.archive[query_name][str(hint_set_int)]
-                if int(hint_set_int) == opt_hint_set_int:
-                    entry["opt"] = True
-                else:
-                    entry["opt"] = False
-                entries.append(entry)
-        return pd.DataFrame.from_dict(entries)
+        query_names = list(self.archive.keys())
+        # rows are flattened per query, the remaining work is vectorized
+        lengths = np.array([len(self.archive[query_name]) for query_name in query_names], dtype=np.int64)
+        keys = np.array(list(chain.from_iterable(self.archive[query_name].keys() for query_name in query_names)),
+                        dtype=object)
+        values = np.array(list(chain.from_iterable(self.archive[query_name].values() for query_name in query_names)),
+                          dtype=object)
+        row_query_names = np.repeat(np.array(query_names, dtype=object), lengths)
+        is_opt_key = np.char.find(keys.astype(str), "opt") >= 0
+        opt_hint_set_ints = pd.Series(values[keys == "opt"].astype(np.int64), index=row_query_names[keys == "opt"])
+
+        keys, values, row_query_names = keys[~is_opt_key], values[~is_opt_key], row_query_names[~is_opt_key]
+        opts = keys.astype(np.int64) == opt_hint_set_ints.reindex(row_query_names).to_numpy()
+        return pd.DataFrame({"query_name": row_query_names, "hint_set_int": keys.astype(str),
+                             "time": values.astype(np.float64), "opt": opts})
 
     def get_opt(self, query_name: str):
         return self.archive[query_name]["opt"]
@@ -64,10 +72,12 @@ class JsonArchive(Archive):
 
 class DataframeArchive(Archive):
 
-    def __init__(self, archive_path: str):
+    def __init__(self, archive_path: str, hint_library: Optional[HintLibrary] = None):
         super().__init__(archive_path)
         self._archive = None
         self._hints_used = None
+        # needed to find default hint sets of libraries with non-boolean hints
+        self.hint_library = hint_library
         self._archive_dict = {key: dict() for key in np.unique(self.archive["query_name"])}
 
     @property
@@ -77,6 +87,12 @@ class DataframeArchive(Archive):
             self._hints_used = int(np.log2(max_hint_set_int+1))
         return self._hints_used
 
+    @property
+    def default_hint_set_int(self):
+        if self.hint_library is not None:
+            return self.hint_library.search_space_size - 1
+        return 2**self.hints_used-1
+
     @property
     def archive(self):
         if self._archive is None:
@@ -86,16 +102,19 @@ class DataframeArchive(Archive):
     def to_json(self):
         json_cols = ["query_name", "hint_set_int", "time", "opt"]
         reduced_df = self.archive[json_cols]
-        query_names = np.unique(reduced_df["query_name"].to_list())
-
-        archive_dict = {query_name: dict() for query_name in query_names}
-        opts = dict()
-        for entry in reduced_df.to_numpy():
-            query_name, hint_set, time, opt = entry
-            if opt:
-                opts[query_name] = hint_set
-            archive_dict[query_name][str(hint_set)] = time
-        for query_name, hint_set in opts.items():
+        query_names = np.unique(reduced_df["query_name"].to_numpy())
+        # a stable sort groups the entries by query in their original order, so later duplicates win as before
+        order = np.argsort(reduced_df["query_name"].to_numpy(), kind="stable")
+        sorted_query_names = reduced_df["query_name"].to_numpy()[order]
+        hint_set_ints = reduced_df["hint_set_int"].to_numpy()[order]
+        times = reduced_df["time"].to_numpy()[order].tolist()
+        offsets = np.searchsorted(sorted_query_names, query_names, side="left").tolist() + [len(order)]
+        keys = hint_set_ints.astype(str).tolist()
+
+        archive_dict = {query_name: dict(zip(keys[offsets[idx]:offsets[idx + 1]], times[offsets[idx]:offsets[idx + 1]]))
+                        for idx, query_name in enumerate(query_names)}
+        opts = reduced_df["opt"].to_numpy(dtype=bool)[order]
+        for query_name, hint_set in zip(sorted_query_names[opts].tolist(), hint_set_ints[opts].tolist()):
             archive_dict[query_name]["opt"] = hint_set
 
         return archive_dict
@@ -120,9 +139,137 @@ class DataframeArchive(Archive):
         try:
             return self._archive_dict[query_name]["def_time"]
         except KeyError:
-            for key, value in self.archive[self.archive["hint_set_int"] == 2**self.hints_used-1][["query_name", "time"]].to_numpy():
+            for key, value in self.archive[self.archive["hint_set_int"] == self.default_hint_set_int][["query_name", "time"]].to_numpy():
                 self._archive_dict[key]["def_time"] = value
         return self._archive_dict[query_name]["def_time"]
 
     def get_query_entries(self, query_name: str):
         return self.archive[(self.archive["query_name"] == query_name) & (self.archive["timeout"] == False)]
+
+
+class IndexedArchive(Archive):
+    """
+    Directory store of a labeling archive. Rows are sorted by query and every column is a memory-mapped .npy file, so
+    loading only reads the query names and lookups touch the rows of the requested queries. Optimal and default
+    results are precomputed per query.
+    """
+
+    ROW_COLUMNS = ["hint_set_int", "time", "opt", "timeout"]
+    QUERY_COLUMNS = ["offsets", "opt_hint_set_int", "opt_time", "default_time"]
+
+    def __init__(self, archive_path: str):
+        if not os.path.isdir(archive_path):
+            raise ValueError(f"Given archive path: {archive_path} is not an indexed archive directory")
+        super().__init__(archive_path)
+        meta = u.load_json(os.path.join(self.archive_path, "meta.json"))
+        self.query_names = meta["query_names"]
+        self.default_hint_set_int = meta["default_hint_set_int"]
+        self._query_index = {query_name: idx for idx, query_name in enumerate(self.query_names)}
+        self._columns = dict()
+
+    def __contains__(self, query_name: str) -> bool:
+        return query_name in self._query_index
+
+    def _column(self, column: str) -> np.ndarray:
+        if column not in self._columns:
+            self._columns[column] = np.load(os.path.join(self.archive_path, f"{column}.npy"), mmap_mode="r")
+        return self._columns[column]
+
+    def get_query_indices(self, query_names: list[str]) -> np.ndarray:
+        return np.array([self._query_index[query_name] for query_name in query_names], dtype=np.int64)
+
+    @classmethod
+    def build(cls, archive: DataframeArchive, archive_path: str):
+        """
+        Writes an indexed archive from a csv archive.
+        :param archive: csv archive, whose hint library determines the default hint set
+        :param archive_path: directory to write to
+        :return: the indexed archive
+        """
+        df = archive.archive
+        timeouts = df["timeout"].to_numpy(dtype=bool) if "timeout" in df.columns else np.zeros(len(df), dtype=bool)
+        codes, query_names = pd.factorize(df["query_name"], sort=True)
+        order = np.argsort(codes, kind="stable")
+        codes = codes[order]
+        hint_set_ints = df["hint_set_int"].to_numpy(dtype=np.int64)[order]
+        times = df["time"].to_numpy(dtype=np.float64)[order]
+        opts = df["opt"].to_numpy(dtype=bool)[order]
+        offsets = np.searchsorted(codes, np.arange(len(query_names) + 1))
+
+        # the last optimal and default row of each query win, as in DataframeArchive
+        opt_hint_set_ints = np.full(len(query_names), -1, dtype=np.int64)
+        opt_times = np.full(len(query_names), np.nan)
+        default_times = np.full(len(query_names), np.nan)
+        opt_hint_set_ints[codes[opts]] = hint_set_ints[opts]
+        opt_times[codes[opts]] = times[opts]
+        is_default = hint_set_ints == archive.default_hint_set_int
+        default_times[codes[is_default]] = times[is_default]
+
+        os.makedirs(archive_path, exist_ok=True)
+        columns = {"hint_set_int": hint_set_ints, "time": times, "opt": opts, "timeout": timeouts[order],
+                   "offsets": offsets, "opt_hint_set_int": opt_hint_set_ints, "opt_time": opt_times,
+                   "default_time": default_times}
+        for column, values in columns.items():
+            np.save(os.path.join(archive_path, f"{column}.npy"), values)
+        u.save_json({"query_names": [str(query_name) for query_name in query_names],
+                     "default_hint_set_int": int(archive.default_hint_set_int)},
+                    os.path.join(archive_path, "meta.json"))
+        return cls(archive_path)
+
+    def get_opts(self, query_names: list[str]) -> np.ndarray:
+        return np.asarray(self._column("opt_hint_set_int")[self.get_query_indices(query_names)])
+
+    def get_opt_times(self, query_names: list[str]) -> np.ndarray:
+        return np.asarray(self._column("opt_time")[self.get_query_indices(query_names)])
+
+    def get_default_times(self, query_names: list[str]) -> np.ndarray:
+        return np.asarray(self._column("default_time")[self.get_query_indices(query_names)])
+
+    def get_opt(self, query_name: str):
+        return int(self._column("opt_hint_set_int")[self._query_index[query_name]])
+
+    def get_opt_time(self, query_name: str):
+        return float(self._column("opt_time")[self._query_index[query_name]])
+
+    def get_default_time(self, query_name: str):
+        return float(self._column("default_time")[self._query_index[query_name]])
+
+    def get_query_entries(self, query_name: str):
+        query_index = self._query_index[query_name]
+        start, stop = self._column("offsets")[query_index:query_index + 2]
+        entries = pd.DataFrame({column: np.asarray(self._column(column)[start:stop]) for column in self.ROW_COLUMNS})
+        entries.insert(0, "query_name", query_name)
+        return entries[~entries["timeout"]]
+
+
+def load_archive(archive_path: str, hint_library: Optional[HintLibrary] = None):
+    """
+    :return: indexed archive for directories, csv archive otherwise
+    """
+    if os.path.isdir(archive_path):
+        return IndexedArchive(archive_path)
+    return DataframeArchive(archive_path, hint_library)
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Build an indexed archive from a csv archive")
+    parser.add_argument("archive", help="<Path/to/archive.csv>")
+    parser.add_argument("-o", "--output", required=True, help="Output directory of the indexed archive")
+    parser.add_argument("-hl", "--hint-library", default=None, help="Optional: <path/to/library.json> the archive was "
+                                                                    "labeled with, needed for non-boolean hints.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.archive):
+        raise ValueError(f"Invalid archive path: {args.archive}.")
+    if os.path.exists(args.output):
+        raise ValueError(f"Save path: {args.output} already exists.")
+    if args.hint_library is not None and not os.path.exists(args.hint_library):
+        raise ValueError(f"Invalid hint library path: {args.hint_library}.")
+
+    hint_library = HintLibrary.from_dict(u.load_json(args.hint_library)) if args.hint_library is not None else None
+    archive = IndexedArchive.build(DataframeArchive(args.archive, hint_library), args.output)
+    print(f"Indexed {len(archive.query_names)} queries into: {args.output}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,219 @@
+import argparse
+import dataclasses
+import itertools
+import os
+import queue
+import signal
+import threading
+import time
+import pandas as pd
+import psycopg2 as pg
+
+from typing import Optional
+from fastgres.labeling.heuristic_labeling import HeuristicLabelingSettings, Labeling
+
+
+class LabelingInterrupted(Exception):
+    """
+    Raised between two executions of a search when the daemon is stopped.
+    """
+
+
+@dataclasses.dataclass
+class DaemonEntry:
+    query_name: str
+    labeled: bool
+    rows: int
+    labeling_time: float
+    backoff_time: float
+    active_backends: int
+
+
+class LabelingDaemon:
+    """
+    Labels queries as they arrive in the query directory or are submitted, and appends their results to the archive
+    csv. Queries with the highest captured total time are labeled first, ties in arrival order. Before every execution
+    of a search, the daemon waits with exponential backoff while more than a threshold of other backends are active.
+    """
+
+    def __init__(self, settings: HeuristicLabelingSettings, backend_threshold: int, poll_interval: float = 5.0,
+                 min_backoff: float = 1.0, max_backoff: float = 60.0, settle_time: float = 1.0):
+        self.settings = settings
+        self.backend_threshold = backend_threshold
+        self.poll_interval = poll_interval
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        # files younger than this may still be written
+        self.settle_time = settle_time
+        self.labeling = Labeling(settings)
+        self.labeling.before_execution = self._before_execution
+        # backoff of the query that is currently labeled
+        self._backoff_time = 0.0
+        self._active_backends = 0
+        self.pending = queue.PriorityQueue()
+        self._arrivals = itertools.count()
+        self._stop = threading.Event()
+        self.known = set()
+        if os.path.exists(self.settings.save_path):
+            self.known.update(pd.read_csv(self.settings.save_path, usecols=["query_name"])["query_name"])
+        self.settings.logger.info(f"Daemon resumes with {len(self.known)} labeled queries")
+
+    @property
+    def log_path(self) -> str:
+        return self.settings.save_path[:-4] + "_daemon.csv"
+
+    def submit(self, query_name: str) -> bool:
+        """
+        Queues a query of the query directory unless it is already labeled or queued.
+        :return: whether the query was queued
+        """
+        if query_name in self.known:
+            return False
+        self.known.add(query_name)
+        self.pending.put((-self.settings.workload.get_weight(query_name, "total_time"), next(self._arrivals),
+                          query_name))
+        return True
+
+    def scan(self) -> int:
+        """
+        :return: number of newly queued queries
+        """
+        now = time.time()
+        arrived = list()
+        with os.scandir(self.settings.query_path) as inbox:
+            for entry in inbox:
+                if entry.name.endswith("sql") and entry.name not in self.known and entry.is_file() and \
+                        now - entry.stat().st_mtime >= self.settle_time:
+                    arrived.append((entry.stat().st_mtime, entry.name))
+        return sum(self.submit(query_name) for _, query_name in sorted(arrived))
+
+    def wait_for_capacity(self) -> tuple[float, int]:
+        """
+        Sleeps with exponential backoff while the foreground load is above the threshold.
+        :return: time spent waiting and the last observed number of active backends
+        """
+        waited, backoff = 0.0, self.min_backoff
+        active_backends = self.settings.dbc.get_active_backends()
+        while active_backends > self.backend_threshold and not self._stop.is_set():
+            self.settings.logger.info(f"Backing off for {backoff}s with {active_backends} active backends")
+            self._stop.wait(backoff)
+            waited += backoff
+            backoff = min(2 * backoff, self.max_backoff)
+            active_backends = self.settings.dbc.get_active_backends()
+        return waited, active_backends
+
+    def _before_execution(self) -> None:
+        backoff_time, self._active_backends = self.wait_for_capacity()
+        self._backoff_time += backoff_time
+        if self._stop.is_set():
+            raise LabelingInterrupted()
+
+    def label_next(self) -> Optional[DaemonEntry]:
+        if self.pending.empty():
+            return None
+        priority, arrival, query_name = self.pending.get()
+        self.settings.logger.info(f"Daemon labels query: {query_name}, {self.pending.qsize()} pending")
+        self._backoff_time, self._active_backends = 0.0, 0
+        t0 = time.time()
+        try:
+            rows = self.labeling.label_query_rows(query_name)
+        except LabelingInterrupted:
+            # the query is not in the archive yet, so a restarted daemon labels it again
+            self.labeling.results.clear()
+            self.pending.put((priority, arrival, query_name))
+            return None
+        except (pg.Error, ValueError, OSError) as error:
+            # the query stays known so a broken query is not retried forever
+            self.settings.logger.info(f"Failed to label query: {query_name}: {error}")
+            self.labeling.results.clear()
+            connection = self.settings.dbc._connection
+            if connection is not None and connection.closed:
+                self.settings.dbc.close_connection()
+                self.settings.dbc.disable_geqo()
+            return DaemonEntry(query_name, False, 0, time.time() - t0, self._backoff_time, self._active_backends)
+        self.labeling.results.to_csv(self.settings.save_path, rows.start, rows.stop,
+                                     append=os.path.exists(self.settings.save_path))
+        # the results are on disk, a long running daemon should not keep them
+        self.labeling.results.clear()
+        self.settings.save_timeout_history()
+        return DaemonEntry(query_name, True, len(rows), time.time() - t0, self._backoff_time, self._active_backends)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def run(self, exit_when_idle: bool = False) -> None:
+        while not self._stop.is_set():
+            self.scan()
+            entry = self.label_next()
+            if entry is not None:
+                new_log = not os.path.exists(self.log_path)
+                pd.DataFrame([entry.__dict__]).to_csv(self.log_path, mode="a", header=new_log, index=False)
+                continue
+            if exit_when_idle and self.pending.empty():
+                break
+            self._stop.wait(self.poll_interval)
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Continuously label queries arriving in a directory and back off "
+                                                 "under foreground load")
+    parser.add_argument("queries", help="Inbox directory in which new .sql-queries arrive")
+    parser.add_argument("-o", "--output", required=True, help="Archive csv to append to, labeled queries in it are "
+                                                              "skipped")
+    parser.add_argument("-c", "--config", required=True, help="Path to config file.")
+    parser.add_argument("-db", "--database", required=True, choices=["imdb", "stack_overflow"], help="")
+    parser.add_argument("-ud", "--use-default", action="store_true", help="Whether or not to use default (six) hints.")
+    parser.add_argument("-ue", "--use-experience", action="store_true", help="Whether or not to use experience.")
+    parser.add_argument("-ues", "--use-early-stopping", action="store_true", help="Whether or not to use "
+                                                                                  "early stopping.")
+    parser.add_argument("-uhr", "--use-hint-removal", action="store_true", help="Whether or not to use hint removal.")
+    parser.add_argument("-ulr", "--use-level-restriction", action="store_true", help="Whether or not to use "
+                                                                                     "level restriction.")
+    parser.add_argument("-m", "--mode", default="sub", choices=["sub", "add", "both"],
+                        help="Which mode (adding/subtracting) of hints to use. This refers to enabling and disabling.")
+    parser.add_argument("-hl", "--hint-library", default=None, help="Optional: <path/to/library.json> of a reduced "
+                                                                    "hint library to use instead of the full one.")
+    parser.add_argument("-lt", "--learned-timeouts", action="store_true",
+                        help="Whether or not to learn timeouts from past wins per level and hint.")
+    parser.add_argument("-th", "--timeout-history", default=None, help="Optional: <path/to/history.json> of learned "
+                                                                       "timeouts that is kept up to date.")
+    parser.add_argument("-bt", "--backend-threshold", type=int, default=2, help="Maximum number of other active "
+                                                                                "backends to label under.")
+    parser.add_argument("-pi", "--poll-interval", type=float, default=5.0, help="Seconds between inbox scans when "
+                                                                                "idle.")
+    parser.add_argument("-mb", "--min-backoff", type=float, default=1.0, help="First backoff in seconds.")
+    parser.add_argument("-xb", "--max-backoff", type=float, default=60.0, help="Longest backoff in seconds.")
+    parser.add_argument("-st", "--settle-time", type=float, default=1.0, help="Seconds a query file must be unchanged "
+                                                                              "before it is labeled.")
+    parser.add_argument("-eo", "--exit-when-idle", action="store_true", help="Stop once the inbox is labeled instead "
+                                                                             "of waiting for new queries.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.queries):
+        raise ValueError(f"Invalid query path: {args.queries}.")
+    if not os.path.exists(args.config):
+        raise ValueError(f"Invalid config path: {args.config}.")
+    if args.hint_library is not None and not os.path.exists(args.hint_library):
+        raise ValueError(f"Invalid hint library path: {args.hint_library}.")
+
+    settings = HeuristicLabelingSettings(args.queries, args.output, args.config, args.database, False,
+                                         args.use_default, args.use_experience, args.use_early_stopping,
+                                         args.use_hint_removal, args.use_level_restriction, args.mode,
+                                         args.hint_library, use_learned_timeouts=args.learned_timeouts,
+                                         timeout_history_path=args.timeout_history)
+    settings.dbc.disable_geqo()
+    settings.logger.info(f"\nRunning Labeling Daemon on:\n {settings.dbc.version()}.\n")
+
+    daemon = LabelingDaemon(settings, args.backend_threshold, args.poll_interval, args.min_backoff, args.max_backoff,
+                            args.settle_time)
+    signal.signal(signal.SIGTERM, lambda signum, frame: daemon.stop())
+    try:
+        daemon.run(args.exit_when_idle)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        settings.dbc.close_connection()
+
+
+if __name__ == "__main__":
+    run()
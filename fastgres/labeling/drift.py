@@ -0,0 +1,184 @@
+import argparse
+import dataclasses
+import os
+import time
+import pandas as pd
+
+from typing import Optional
+from tqdm import tqdm
+from fastgres.baseline.utility import ExplainNode
+from fastgres.labeling.heuristic_labeling import HeuristicLabelingSettings, Labeling
+
+
+@dataclasses.dataclass
+class DriftResult:
+    query_name: str
+    default_plan_changed: bool
+    opt_plan_changed: bool
+    status: str
+    default_time: Optional[float] = None
+    opt_time: Optional[float] = None
+
+
+class DriftCheck:
+    """
+    Relabels only queries whose plans drifted since labeling, e.g., after ANALYZE or data changes. Queries whose
+    default and optimal plans are unchanged keep their labels. Changed queries first re-measure their old label
+    against the default and only run a full search if the old label no longer wins.
+    """
+
+    UNCHANGED = "unchanged"
+    CONFIRMED = "confirmed"
+    RELABELED = "relabeled"
+
+    def __init__(self, settings: HeuristicLabelingSettings, archive_path: str):
+        self.settings = settings
+        self.archive_path = archive_path
+        self.archive = pd.read_csv(self.archive_path)
+        if "plan_fingerprint" not in self.archive.columns:
+            self.settings.logger.info("Archive does not contain plan fingerprints, all queries count as drifted")
+            self.archive["plan_fingerprint"] = None
+        self.labeling = Labeling(settings)
+        self.default_hint_set = self.settings.hs_factory.default_hint_set()
+
+    def _get_stored_fingerprint(self, query_entries: pd.DataFrame, hint_set_int: int) -> Optional[str]:
+        fingerprints = query_entries[query_entries["hint_set_int"] == hint_set_int]["plan_fingerprint"].dropna()
+        return None if fingerprints.empty else str(fingerprints.iloc[0])
+
+    def _plan_changed(self, query: str, query_entries: pd.DataFrame, hint_set_int: int) -> bool:
+        stored_fingerprint = self._get_stored_fingerprint(query_entries, hint_set_int)
+        hint_set = self.settings.hs_factory.hint_set(hint_set_int)
+        current_fingerprint = ExplainNode(self.settings.dbc.explain_query(query, hint_set)).fingerprint
+        return stored_fingerprint is None or stored_fingerprint != current_fingerprint
+
+    def _update_entry(self, query_entries: pd.DataFrame, hint_set_int: int, measured_time: float, timed_out: bool,
+                      fingerprint: str) -> pd.DataFrame:
+        mask = query_entries["hint_set_int"] == hint_set_int
+        query_entries.loc[mask, "time"] = measured_time
+        query_entries.loc[mask, "timeout"] = timed_out
+        query_entries.loc[mask, "plan_fingerprint"] = fingerprint
+        return query_entries
+
+    def _confirm(self, query: str, query_entries: pd.DataFrame,
+                 opt_int: int) -> Optional[tuple[pd.DataFrame, float, float]]:
+        """
+        Executes the default and the old optimal hint set once.
+        :return: updated query entries with the default and optimal time if the old label still wins, None otherwise.
+        Archives without a default entry, e.g., of the add mode, only get their optimal entry updated.
+        """
+        opt_hint_set = self.settings.hs_factory.hint_set(opt_int)
+        default_result = self.settings.dbc.evaluate_hinted_query(query, self.default_hint_set,
+                                                                 timeout=self.labeling.base_timeout)
+        opt_result = self.settings.dbc.evaluate_hinted_query(query, opt_hint_set,
+                                                             timeout=self.settings.get_timeout(default_result.time))
+        if opt_result.timed_out or opt_result.time >= default_result.time:
+            return None
+        default_fingerprint = ExplainNode(self.settings.dbc.explain_query(query, self.default_hint_set)).fingerprint
+        opt_fingerprint = ExplainNode(self.settings.dbc.explain_query(query, opt_hint_set)).fingerprint
+        query_entries = self._update_entry(query_entries, self.default_hint_set.hint_set_int, default_result.time,
+                                           default_result.timed_out, default_fingerprint)
+        query_entries = self._update_entry(query_entries, opt_int, opt_result.time, opt_result.timed_out,
+                                           opt_fingerprint)
+        return query_entries, default_result.time, opt_result.time
+
+    def _relabel(self, query_name: str, default_changed: bool, opt_changed: bool) -> tuple[pd.DataFrame, DriftResult]:
+        self.settings.logger.info(f"Relabeling drifted query: {query_name}")
+        default_int = self.default_hint_set.hint_set_int
+        rows = self.labeling.label_query_rows(query_name)
+        relabeled_entries = self.labeling.results.to_dataframe(rows.start, rows.stop)
+        opt_time = self.labeling.results.get(self.labeling.get_opt_row(rows), "time")
+        # the add mode starts from hint set 0 and may never evaluate the default
+        default_times = relabeled_entries[relabeled_entries["hint_set_int"] == default_int]["time"]
+        # the entries hold the results, the buffer is not needed for the next query
+        self.labeling.results.clear()
+        return relabeled_entries, DriftResult(query_name, default_changed, opt_changed, self.RELABELED,
+                                              float(default_times.iloc[0]) if not default_times.empty else None,
+                                              opt_time)
+
+    def check_query(self, query_name: str, query_entries: pd.DataFrame) -> tuple[pd.DataFrame, DriftResult]:
+        query = self.settings.workload.read_query(query_name)
+        query_entries = query_entries.copy()
+        default_int = self.default_hint_set.hint_set_int
+        opt_entries = query_entries[query_entries["opt"].astype(bool)]
+        if opt_entries.empty:
+            # without a stored label there is nothing to confirm, e.g., for interrupted or hand edited archives
+            self.settings.logger.info(f"Archive does not contain an optimal entry for query: {query_name}")
+            return self._relabel(query_name, self._plan_changed(query, query_entries, default_int), True)
+        opt_int = int(opt_entries["hint_set_int"].iloc[0])
+
+        default_changed = self._plan_changed(query, query_entries, default_int)
+        opt_changed = default_changed if opt_int == default_int else self._plan_changed(query, query_entries, opt_int)
+        if not default_changed and not opt_changed:
+            return query_entries, DriftResult(query_name, False, False, self.UNCHANGED)
+
+        # a default label can not be confirmed without searching for better hint sets
+        if opt_int != default_int:
+            confirmation = self._confirm(query, query_entries, opt_int)
+            if confirmation is not None:
+                confirmed_entries, default_time, opt_time = confirmation
+                return confirmed_entries, DriftResult(query_name, default_changed, opt_changed, self.CONFIRMED,
+                                                      default_time, opt_time)
+        return self._relabel(query_name, default_changed, opt_changed)
+
+    def check(self) -> tuple[pd.DataFrame, list[DriftResult]]:
+        checked_entries = list()
+        drift_results = list()
+        for query_name, query_entries in tqdm(self.archive.groupby("query_name", sort=True), desc="Checking Drift"):
+            entries, drift_result = self.check_query(query_name, query_entries)
+            checked_entries.append(entries)
+            drift_results.append(drift_result)
+            self.settings.logger.info(f"Drift check for query: {query_name}: {drift_result.status}")
+        return pd.concat(checked_entries, ignore_index=True), drift_results
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Re-explain labeled queries and relabel only those whose plans "
+                                                 "changed since labeling")
+    parser.add_argument("queries", help="Directory in which .sql-queries are located")
+    parser.add_argument("-a", "--archive", required=True, help="<Path/to/labeling/output.csv> to check.")
+    parser.add_argument("-o", "--output", required=True, help="Output csv save name of the updated archive")
+    parser.add_argument("-c", "--config", required=True, help="Path to config file.")
+    parser.add_argument("-db", "--database", required=True, choices=["imdb", "stack_overflow"], help="")
+    parser.add_argument("-ud", "--use-default", action="store_true", help="Whether or not to use default (six) hints.")
+    parser.add_argument("-ue", "--use-experience", action="store_true", help="Whether or not to use experience.")
+    parser.add_argument("-ues", "--use-early-stopping", action="store_true", help="Whether or not to use "
+                                                                                  "early stopping.")
+    parser.add_argument("-uhr", "--use-hint-removal", action="store_true", help="Whether or not to use hint removal.")
+    parser.add_argument("-ulr", "--use-level-restriction", action="store_true", help="Whether or not to use "
+                                                                                     "level restriction.")
+    parser.add_argument("-m", "--mode", default="sub", choices=["sub", "add"],
+                        help="Which mode (adding/subtracting) of hints to use. This refers to enabling and disabling.")
+    parser.add_argument("-hl", "--hint-library", default=None, help="Optional: <path/to/library.json> the archive "
+                                                                    "was labeled with.")
+    parser.add_argument("-uk", "--use-knobs", action="store_true", help="Whether or not the archive was labeled "
+                                                                        "with non-boolean planner knobs.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.queries):
+        raise ValueError(f"Invalid query path: {args.queries}.")
+    if not os.path.exists(args.archive):
+        raise ValueError(f"Invalid archive path: {args.archive}.")
+    if os.path.exists(args.output):
+        raise ValueError(f"Save path: {args.output} already exists.")
+    if not os.path.exists(args.config):
+        raise ValueError(f"Invalid config path: {args.config}.")
+
+    settings = HeuristicLabelingSettings(args.queries, args.output, args.config, args.database, False,
+                                         args.use_default, args.use_experience, args.use_early_stopping,
+                                         args.use_hint_removal, args.use_level_restriction, args.mode,
+                                         args.hint_library, args.use_knobs)
+    settings.dbc.disable_geqo()
+
+    t0 = time.time()
+    drift_check = DriftCheck(settings, args.archive)
+    checked_archive, drift_results = drift_check.check()
+    checked_archive.to_csv(settings.save_path, index=False)
+    report_path = settings.save_path[:-4] + "_drift.csv"
+    pd.DataFrame([drift_result.__dict__ for drift_result in drift_results]).to_csv(report_path, index=False)
+    relabeled = sum(drift_result.status == DriftCheck.RELABELED for drift_result in drift_results)
+    settings.logger.info(f"Finished drift check of {len(drift_results)} queries with {relabeled} relabeled queries "
+                         f"in {round(time.time() - t0, 2)}s")
+
+
+if __name__ == "__main__":
+    run()
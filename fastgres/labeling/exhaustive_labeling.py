@@ -0,0 +1,221 @@
+import argparse
+import os
+import time
+import pandas as pd
+
+from typing import Optional
+from tqdm import trange
+from fastgres.baseline import utility as u
+from joblib.parallel import Parallel, delayed
+from fastgres.baseline.database_connection import DatabaseConnection
+from fastgres.definitions import PathConfig
+from fastgres.workload.workload import Workload
+from fastgres.baseline.log_utils import Logger, get_logger
+from fastgres.baseline.utility import ExplainNode, chunks, gray_code
+from fastgres.hinting import HintSetFactory, HintLibrary, KNOB_INSTRUCTIONS, get_default_library, get_available_library
+from fastgres.labeling.heuristic_labeling import LabelingResult
+
+
+class ExhaustiveLabelingSettings:
+
+    def __init__(self, query_path: str, save_path: str, config_path: str, database_string: str,
+                 use_default_hints: bool, connections: int, hint_library_path: Optional[str] = None,
+                 use_knobs: bool = False):
+
+        # static settings
+        self.base_timeout: float = 300_000.0  # ms
+        self._absolute_timeout: float = 500.0  # ms
+        self._relative_timeout: float = 1.2  # factor
+
+        if connections < 1:
+            raise ValueError(f"At least one connection is needed, got: {connections}")
+
+        self.query_path = query_path
+        self.save_path = save_path
+        self.config_path = config_path
+        self.database_string = database_string
+        self.use_default_hints = use_default_hints
+        self.connections = connections
+        self.hint_library_path = hint_library_path
+        self.use_knobs = use_knobs
+
+        self.workload = Workload(self.query_path)
+        self.path_config = PathConfig(self.config_path)
+        connection_string = self.path_config.get_db_connection(self.database_string)
+        self.dbcs = [DatabaseConnection(connection_string, f"{self.database_string}_{i}") for i in range(connections)]
+        # the first connection is the only one executing queries
+        self.dbc = self.dbcs[0]
+        _ = Logger(self.path_config, f"{os.path.basename(self.save_path)[:-4]}.log")
+        self.logger = get_logger()
+
+        if self.hint_library_path is not None:
+            used_hint_library = HintLibrary.from_dict(u.load_json(self.hint_library_path))
+        elif self.use_default_hints:
+            used_hint_library = get_default_library(self.use_knobs, self.get_knob_settings())
+        else:
+            used_hint_library = get_available_library(self.dbc.version(), False, False, False, self.use_knobs,
+                                                      self.get_knob_settings())
+        self.hs_factory = HintSetFactory(used_hint_library)
+        self.hints_in_use_count = self.hs_factory.hint_library.collection_size
+        self.hint_radices = self.hs_factory.hint_library.radices
+
+    def get_knob_settings(self) -> Optional[dict[str, str]]:
+        # knob defaults are taken from the server so that the default hint set does not change its configuration
+        return self.dbc.get_settings(KNOB_INSTRUCTIONS) if self.use_knobs else None
+
+    def get_timeout(self, best_time: float):
+        return max(self._absolute_timeout, best_time * self._relative_timeout)
+
+
+class ExhaustiveLabeling:
+    """
+    FASTgres-style labeling of the complete hint set space. Hint sets are only explained until their plans are known.
+    Each distinct plan is then executed once and its time is assigned to all hint sets producing it.
+    """
+
+    def __init__(self, settings: ExhaustiveLabelingSettings):
+        self.settings = settings
+        self.default_hint_set_int = self.settings.hs_factory.default_hint_set().hint_set_int
+
+    def _explain_ranks(self, dbc: DatabaseConnection, query: str, ranks: range) -> list[tuple[int, ExplainNode]]:
+        # walking in gray code order only changes one setting between two consecutive explains
+        plans = list()
+        previous_hint_set = None
+        for rank in ranks:
+            hint_set = self.settings.hs_factory.hint_set(gray_code(rank, self.settings.hint_radices))
+            plan = ExplainNode(dbc.explain_query(query, hint_set, previous_hint_set))
+            plans.append((hint_set.hint_set_int, plan))
+            previous_hint_set = hint_set
+        return plans
+
+    def explain_hint_sets(self, query: str) -> dict[int, ExplainNode]:
+        """
+        Explains all hint sets of the used library in parallel.
+        :param query: query to explain
+        :return: query plan nodes by hint set integer
+        """
+        search_space = range(self.settings.hs_factory.hint_library.search_space_size)
+        chunk_size = -(-len(search_space) // len(self.settings.dbcs))
+        rank_chunks = list(chunks(search_space, chunk_size))
+        results = Parallel(n_jobs=len(rank_chunks), prefer="threads")(
+            delayed(self._explain_ranks)(dbc, query, rank_chunk)
+            for dbc, rank_chunk in zip(self.settings.dbcs, rank_chunks)
+        )
+        return {hint_set_int: plan for chunk_result in results for hint_set_int, plan in chunk_result}
+
+    @staticmethod
+    def group_by_plan(plans: dict[int, ExplainNode]) -> dict[str, list[int]]:
+        groups = dict()
+        for hint_set_int, plan in plans.items():
+            try:
+                groups[plan.fingerprint].append(hint_set_int)
+            except KeyError:
+                groups[plan.fingerprint] = [hint_set_int]
+        return groups
+
+    def label_query(self, query_name: str) -> list[LabelingResult]:
+        query = self.settings.workload.read_query(query_name)
+        hint_names = self.settings.hs_factory.hint_library.get_hint_names()
+
+        t0 = time.time()
+        plans = self.explain_hint_sets(query)
+        plan_groups = self.group_by_plan(plans)
+        self.settings.logger.info(f"Explained {len(plans)} hint sets for query: {query_name} in "
+                                  f"{round(time.time() - t0, 2)}s resulting in {len(plan_groups)} distinct plans")
+
+        # cheapest estimated plans first to obtain a tight timeout early on
+        ordered_groups = sorted(plan_groups.values(), key=lambda group: plans[group[0]].cost)
+        best_time = None
+        query_results = list()
+        for group in ordered_groups:
+            representative = self.default_hint_set_int if self.default_hint_set_int in group else min(group)
+            timeout = self.settings.base_timeout if best_time is None else self.settings.get_timeout(best_time)
+            self.settings.logger.info(f"Evaluating Hint Set: {representative} representing {len(group)} hint sets")
+            hint_set = self.settings.hs_factory.hint_set(representative)
+            q_result = self.settings.dbc.evaluate_hinted_query(query, hint_set, timeout=timeout)
+            if not q_result.timed_out and (best_time is None or q_result.time < best_time):
+                best_time = q_result.time
+
+            for hint_set_int in sorted(group):
+                group_hint_set = self.settings.hs_factory.hint_set(hint_set_int)
+                digits = group_hint_set.get_digits()
+                # the level is the amount of hints deviating from their default
+                level = sum(digit != radix - 1 for digit, radix in zip(digits, self.settings.hint_radices))
+                labeling_result = LabelingResult(
+                    query_name=query_name, hint_set_int=hint_set_int, binary_rep=digits,
+                    measured_time=q_result.time, occurred_level=level, is_opt=False,
+                    had_timeout=q_result.timed_out, chosen_in_level=False, removed=False,
+                    seen_plan=hint_set_int != representative, hint_names=hint_names,
+                    plan_fingerprint=plans[hint_set_int].fingerprint
+                )
+                query_results.append(labeling_result)
+
+        # prefer executed representatives and the default among equally fast hint sets
+        opt = min(query_results, key=lambda result: (result.measured_time, result.seen_plan,
+                                                     result.hint_set_int != self.default_hint_set_int))
+        opt.is_opt = True
+        opt.chosen_in_level = True
+        return sorted(query_results, key=lambda result: result.hint_set_int)
+
+    def label_queries(self):
+        all_results = list()
+        t0 = time.time()
+        for query_index in trange(len(self.settings.workload.query_names)):
+            query_name = self.settings.workload.query_names[query_index]
+            self.settings.logger.info('Evaluating query: {}, {} / {}'.format(query_name, query_index + 1,
+                                                                             len(self.settings.workload.query_names)))
+            query_results = self.label_query(query_name)
+            all_results.extend(query_results)
+            df = pd.DataFrame([result.to_dict() for result in all_results])
+            df.to_csv(self.settings.save_path, index=False)
+        t1 = time.time() - t0
+        self.settings.logger.info(f'Finished labeling {len(self.settings.workload.query_names)} '
+                                  f'queries in {int(t1 / 60)}min {int(t1 % 60)}s.')
+        return
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Generate exhaustive labels for input queries by executing each "
+                                                 "distinct query plan once and save to csv")
+
+    parser.add_argument("queries", help="Directory in which .sql-queries are located")
+    parser.add_argument("-o", "--output", required=True, help="Output csv save name")
+    parser.add_argument("-c", "--config", required=True, help="Path to config file.")
+
+    parser.add_argument("-db", "--database", required=True, choices=["imdb", "stack_overflow"], help="")
+    parser.add_argument("-ud", "--use-default", action="store_true", help="Whether or not to use default (six) hints.")
+    parser.add_argument("-j", "--connections", type=int, default=4, help="Number of connections used to explain "
+                                                                         "hint sets in parallel.")
+    parser.add_argument("-hl", "--hint-library", default=None, help="Optional: <path/to/library.json> of a reduced "
+                                                                    "hint library to use instead of the full one.")
+    parser.add_argument("-uk", "--use-knobs", action="store_true", help="Whether or not to add non-boolean planner "
+                                                                        "knobs like join_collapse_limit to the hints.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.queries):
+        raise ValueError(f"Invalid query path: {args.queries}.")
+    if os.path.exists(args.output):
+        raise ValueError(f"Save path: {args.output} already exists.")
+    if not os.path.exists(args.config):
+        raise ValueError(f"Invalid config path: {args.config}.")
+    if args.hint_library is not None and not os.path.exists(args.hint_library):
+        raise ValueError(f"Invalid hint library path: {args.hint_library}.")
+
+    settings = ExhaustiveLabelingSettings(args.queries, args.output, args.config, args.database, args.use_default,
+                                          args.connections, args.hint_library, args.use_knobs)
+    # initial considerations, geqo would render plan fingerprints unstable
+    [dbc.disable_geqo() for dbc in settings.dbcs]
+    settings.logger.info(f"\nRunning Exhaustive Labeling on:\n {settings.dbc.version()}.\n")
+
+    try:
+        labeling = ExhaustiveLabeling(settings)
+        t0 = time.time()
+        labeling.label_queries()
+        labeling_time = time.time() - t0
+        settings.logger.info(f"Finished Label Generation in: {round(labeling_time, 2)}s")
+    except KeyboardInterrupt:
+        [dbc.close_connection() for dbc in settings.dbcs]
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,262 @@
+import argparse
+import dataclasses
+import math
+import os
+import random
+import time
+import pandas as pd
+
+from typing import Optional
+from tqdm import tqdm
+from fastgres.baseline.utility import ExplainNode, OperationMode as OpMode, get_one_ring_of_hint_set
+from fastgres.labeling.heuristic_labeling import HeuristicLabelingSettings, Labeling, LabelingResult
+from fastgres.labeling.surrogate import PlanSurrogate
+
+
+@dataclasses.dataclass
+class ExplainCandidate:
+    query_name: str
+    rank: int
+    hint_set_int: int
+    level: int
+    cost: float
+    score: float
+    predicted_time: Optional[float]
+    risky_nested_loops: int
+    plan_fingerprint: str
+
+
+@dataclasses.dataclass
+class CalibrationSample:
+    query_name: str
+    hint_set_int: int
+    cost: float
+    time: float
+    timed_out: bool
+
+
+def get_risky_nested_loops(plan: ExplainNode, row_threshold: float) -> int:
+    """
+    :return: number of nested loops whose outer input is estimated above the threshold, whose runtime grows fastest
+    with underestimated cardinalities
+    """
+    risky, nodes = 0, [plan]
+    while nodes:
+        node = nodes.pop()
+        if node.node_type == "Nested Loop" and node.children and node.children[0].cardinality_estimate > row_threshold:
+            risky += 1
+        nodes.extend(node.children)
+    return risky
+
+
+class ExplainLabeling:
+    """
+    Walks the neighborhood search of the heuristic labeling without executing any hint set. Candidates are scored by
+    their log planner cost, or by a cost-to-time model calibrated on a few executed queries, plus a penalty for risky
+    nested loops. The best scored distinct plans of each query are written as top-k candidates.
+    """
+
+    def __init__(self, settings: HeuristicLabelingSettings, top_k: int, calibration_queries: int = 0,
+                 calibration_candidates: int = 3, nested_loop_rows: float = 1000.0,
+                 nested_loop_penalty: float = math.log(2.0), seed: int = 47):
+        self.settings = settings
+        self.top_k = top_k
+        self.calibration_queries = calibration_queries
+        self.calibration_candidates = calibration_candidates
+        self.nested_loop_rows = nested_loop_rows
+        self.nested_loop_penalty = nested_loop_penalty
+        self.seed = seed
+        self.labeling = Labeling(settings)
+        # one model over all calibration queries, fitted once enough executions are observed
+        self.calibration = None
+        self.calibration_samples = list()
+
+    def score(self, plan: ExplainNode) -> tuple[float, Optional[float]]:
+        """
+        :return: score in log space, lower is better, and the calibrated runtime prediction in ms if available
+        """
+        prediction = None if self.calibration is None else self.calibration.predict(plan)
+        penalty = self.nested_loop_penalty * get_risky_nested_loops(plan, self.nested_loop_rows)
+        if prediction is None:
+            return math.log1p(max(plan.cost, 0.0)) + penalty, None
+        return prediction[0] + penalty, math.exp(prediction[0])
+
+    def _get_op_modes(self) -> list[OpMode]:
+        return [OpMode.SUB, OpMode.ADD] if self.settings.op_mode == OpMode.BOTH else [self.settings.op_mode]
+
+    def search(self, query_name: str) -> list[ExplainCandidate]:
+        """
+        Explains the neighborhoods of the search and keeps the best scored hint set of every distinct plan.
+        :return: top-k candidates ordered by score
+        """
+        query = self.settings.workload.read_query(query_name)
+        # plan -> (score, hint set integer, level, predicted time)
+        best_by_plan = dict()
+        explained = dict()
+
+        def explain(hint_set_int: int, level: int) -> float:
+            if hint_set_int not in explained:
+                plan = ExplainNode(self.settings.dbc.explain_query(query, self.settings.hs_factory.hint_set(
+                    hint_set_int)))
+                score, predicted_time = self.score(plan)
+                explained[hint_set_int] = score
+                if plan not in best_by_plan or score < best_by_plan[plan][0]:
+                    best_by_plan[plan] = (score, hint_set_int, level, predicted_time)
+            return explained[hint_set_int]
+
+        for op_mode in self._get_op_modes():
+            # like the heuristic search, only the opposite frontier of both modes starts with all hints lowest
+            last_chosen = 0 if self.settings.op_mode == OpMode.BOTH and op_mode == OpMode.ADD \
+                else self.settings.hs_factory.default_hint_set().hint_set_int
+            best_score, best_level, level = explain(last_chosen, 0), 0, 1
+            while True:
+                offsets = get_one_ring_of_hint_set(last_chosen, self.settings.hints_in_use_count, op_mode,
+                                                   radices=self.settings.hint_radices)
+                if not offsets:
+                    break
+                hint_set_ints = [last_chosen - offset if op_mode == OpMode.SUB else last_chosen + offset
+                                 for offset in offsets]
+                scores = [explain(hint_set_int, level) for hint_set_int in hint_set_ints]
+                level_score = min(scores)
+                last_chosen = hint_set_ints[scores.index(level_score)]
+                if level_score < best_score:
+                    best_score, best_level = level_score, level
+                if self.settings.use_early_stopping and \
+                        level - best_level >= self.settings.early_stopping_threshold:
+                    break
+                if self.settings.use_level_restriction and level >= self.settings.stop_level:
+                    break
+                level += 1
+
+        ranked = sorted(best_by_plan.items(), key=lambda entry: (entry[1][0], entry[1][1]))[:self.top_k]
+        return [ExplainCandidate(query_name, rank, hint_set_int, level, plan.cost, score, predicted_time,
+                                 get_risky_nested_loops(plan, self.nested_loop_rows), plan.fingerprint)
+                for rank, (plan, (score, hint_set_int, level, predicted_time)) in enumerate(ranked)]
+
+    def calibrate(self) -> None:
+        """
+        Executes the default and the top cost candidates of a few sampled queries and fits the cost-to-time model.
+        """
+        query_names = random.Random(self.seed).sample(self.settings.workload.query_names,
+                                                      min(self.calibration_queries,
+                                                          len(self.settings.workload.query_names)))
+        calibration = PlanSurrogate(min_observations=max(5, len(query_names)))
+        default_hint_set_int = self.settings.hs_factory.default_hint_set().hint_set_int
+        for query_name in tqdm(query_names, desc="Calibrating Costs"):
+            candidates = [candidate.hint_set_int for candidate in self.search(query_name)]
+            candidates = [default_hint_set_int] + [hint_set_int for hint_set_int in candidates
+                                                   if hint_set_int != default_hint_set_int]
+            query = self.settings.workload.read_query(query_name)
+            for result in self.labeling.check_candidates(query_name, candidates[:self.calibration_candidates + 1]):
+                if result.seen_plan:
+                    continue
+                plan = ExplainNode(self.settings.dbc.explain_query(query, self.settings.hs_factory.hint_set(
+                    result.hint_set_int)))
+                calibration.observe(plan, result.measured_time, result.had_timeout)
+                self.calibration_samples.append(CalibrationSample(query_name, result.hint_set_int, plan.cost,
+                                                                  result.measured_time, result.had_timeout))
+        # the calibration is fixed from here on, so scoring only evaluates the fitted regression
+        self.calibration = calibration if calibration.fit() else None
+        self.settings.logger.info(f"Calibrated costs on {len(self.calibration_samples)} executions of "
+                                  f"{len(query_names)} queries")
+
+    def label_queries(self) -> list[ExplainCandidate]:
+        t0 = time.time()
+        save_stem = self.settings.save_path[:-4]
+        if self.calibration_queries > 0:
+            self.calibrate()
+            pd.DataFrame([sample.__dict__ for sample in self.calibration_samples]).to_csv(
+                save_stem + "_calibration.csv", index=False)
+        all_candidates = list()
+        for query_index, query_name in enumerate(tqdm(self.settings.get_query_names(), desc="Explaining Queries")):
+            query_candidates = self.search(query_name)
+            all_candidates.extend(query_candidates)
+            pd.DataFrame([candidate.__dict__ for candidate in query_candidates],
+                         columns=[candidate_field.name for candidate_field in dataclasses.fields(ExplainCandidate)]
+                         ).to_csv(self.settings.save_path, mode="a" if query_index > 0 else "w",
+                                  header=query_index == 0, index=False)
+        t1 = time.time() - t0
+        self.settings.logger.info(f"Finished explaining {len(self.settings.workload.query_names)} queries in "
+                                  f"{int(t1 / 60)}min {int(t1 % 60)}s.")
+        return all_candidates
+
+
+def verify_candidates(settings: HeuristicLabelingSettings, candidates_path: str) -> list[LabelingResult]:
+    """
+    Executes the default and the explain candidates of every query and stores them as labels.
+    """
+    labeling = Labeling(settings)
+    default_hint_set_int = settings.hs_factory.default_hint_set().hint_set_int
+    candidates = pd.read_csv(candidates_path).sort_values(["query_name", "rank"])
+    all_results = list()
+    for query_name, query_candidates in tqdm(candidates.groupby("query_name", sort=True), desc="Verifying Queries"):
+        hint_set_ints = [default_hint_set_int] + [int(hint_set_int) for hint_set_int in query_candidates["hint_set_int"]
+                                                  if hint_set_int != default_hint_set_int]
+        all_results.extend(labeling.check_candidates(query_name, hint_set_ints))
+        pd.DataFrame([result.to_dict() for result in all_results]).to_csv(settings.save_path, index=False)
+    return all_results
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Rank hint sets with EXPLAIN only and write the top-k candidates per "
+                                                 "query, or verify such candidates by execution")
+    parser.add_argument("queries", help="Directory in which .sql-queries are located")
+    parser.add_argument("-o", "--output", required=True, help="Output csv save name")
+    parser.add_argument("-c", "--config", required=True, help="Path to config file.")
+    parser.add_argument("-db", "--database", required=True, choices=["imdb", "stack_overflow"], help="")
+    parser.add_argument("-ud", "--use-default", action="store_true", help="Whether or not to use default (six) hints.")
+    parser.add_argument("-ues", "--use-early-stopping", action="store_true", help="Whether or not to use "
+                                                                                  "early stopping.")
+    parser.add_argument("-ulr", "--use-level-restriction", action="store_true", help="Whether or not to use "
+                                                                                     "level restriction.")
+    parser.add_argument("-m", "--mode", default="sub", choices=["sub", "add", "both"],
+                        help="Which mode (adding/subtracting) of hints to use. This refers to enabling and disabling.")
+    parser.add_argument("-hl", "--hint-library", default=None, help="Optional: <path/to/library.json> of a reduced "
+                                                                    "hint library to use instead of the full one.")
+    parser.add_argument("-k", "--top-k", type=int, default=3, help="Candidates with distinct plans per query.")
+    parser.add_argument("-cq", "--calibration-queries", type=int, default=0,
+                        help="Queries whose default and top candidates are executed to fit a cost-to-time model. "
+                             "Without them, candidates are ranked by planner cost.")
+    parser.add_argument("-cc", "--calibration-candidates", type=int, default=3,
+                        help="Executed candidates per calibration query next to the default.")
+    parser.add_argument("-nlr", "--nested-loop-rows", type=float, default=1000.0,
+                        help="Estimated outer rows above which a nested loop is penalized.")
+    parser.add_argument("-nlp", "--nested-loop-penalty", type=float, default=2.0,
+                        help="Factor on the cost or predicted time per risky nested loop.")
+    parser.add_argument("-vc", "--verify-candidates", default=None,
+                        help="Optional: <path/to/candidates.csv> whose candidates and defaults are executed and "
+                             "written as labels instead of explaining.")
+    parser.add_argument("-s", "--seed", type=int, default=47, help="Seed of the calibration sample.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.queries):
+        raise ValueError(f"Invalid query path: {args.queries}.")
+    if os.path.exists(args.output):
+        raise ValueError(f"Save path: {args.output} already exists.")
+    if not os.path.exists(args.config):
+        raise ValueError(f"Invalid config path: {args.config}.")
+    if args.hint_library is not None and not os.path.exists(args.hint_library):
+        raise ValueError(f"Invalid hint library path: {args.hint_library}.")
+    if args.verify_candidates is not None and not os.path.exists(args.verify_candidates):
+        raise ValueError(f"Invalid candidate path: {args.verify_candidates}.")
+    if args.nested_loop_penalty < 1.0:
+        raise ValueError(f"Nested loop penalty must be at least 1, got: {args.nested_loop_penalty}.")
+
+    settings = HeuristicLabelingSettings(args.queries, args.output, args.config, args.database, False,
+                                         args.use_default, False, args.use_early_stopping, False,
+                                         args.use_level_restriction, args.mode, args.hint_library)
+    settings.dbc.disable_geqo()
+    settings.logger.info(f"\nRunning Explain Labeling on:\n {settings.dbc.version()}.\n")
+
+    try:
+        if args.verify_candidates is not None:
+            verify_candidates(settings, args.verify_candidates)
+        else:
+            ExplainLabeling(settings, args.top_k, args.calibration_queries, args.calibration_candidates,
+                            args.nested_loop_rows, math.log(args.nested_loop_penalty), args.seed).label_queries()
+    except KeyboardInterrupt:
+        settings.dbc.close_connection()
+
+
+if __name__ == "__main__":
+    run()
@@ -5,8 +5,10 @@ import pandas as pd
 import numpy as np
 
 from dataclasses import dataclass
-from dataclasses import field
+from dataclasses import field, fields
+from typing import Optional
 from tqdm import trange
+from fastgres.baseline import utility as u
 from fastgres.baseline.database_connection import DatabaseConnection
 from fastgres.definitions import PathConfig
 from fastgres.workload.workload import Workload
@@ -14,7 +16,13 @@ from fastgres.baseline.log_utils import Logger, get_logger
 from fastgres.baseline.utility import OperationMode as OpMode, get_one_ring_of_hint_set
 from fastgres.baseline.utility import ExplainNode
 from fastgres.baseline.database_connection import QueryResult
-from fastgres.hinting import HintSet, HintSetFactory, get_default_library, get_available_library
+from fastgres.hinting import HintSet, HintSetFactory, HintLibrary, KNOB_INSTRUCTIONS, get_default_library, \
+    get_available_library
+from fastgres.labeling.timeout_policy import StaticTimeoutPolicy, LearnedTimeoutPolicy
+from fastgres.labeling.seeding import ModelSeeder, NeighborSeeder
+from fastgres.labeling.surrogate import PlanSurrogate, SkippedCandidate
+from fastgres.labeling.result_buffer import ResultBuffer
+from fastgres.query_encoding.feature_extractor import EncodingInformation
 
 
 @dataclass
@@ -66,7 +74,7 @@ class LabelingResult:
 
     def __init__(self, query_name: str, hint_set_int: int, binary_rep: list[int], measured_time: float,
                  occurred_level: int, is_opt: bool, had_timeout: bool, chosen_in_level: bool, removed: bool,
-                 seen_plan: bool, hint_names: list[str]):
+                 seen_plan: bool, hint_names: list[str], plan_fingerprint: Optional[str] = None):
         self.query_name = query_name
         self.hint_set_int = hint_set_int
         self.binary_rep = binary_rep
@@ -78,6 +86,18 @@ class LabelingResult:
         self.removed = removed
         self.seen_plan = seen_plan
         self.hint_names = hint_names
+        self.plan_fingerprint = plan_fingerprint
+
+    @classmethod
+    def from_buffer(cls, buffer: ResultBuffer, row: int):
+        hint_set_int = buffer.get(row, "hint_set_int")
+        return cls(query_name=buffer.get_query_name(row), hint_set_int=hint_set_int,
+                   binary_rep=buffer.hint_library.get_digits(hint_set_int), measured_time=buffer.get(row, "time"),
+                   occurred_level=buffer.get(row, "level"), is_opt=buffer.get(row, "opt"),
+                   had_timeout=buffer.get(row, "timeout"), chosen_in_level=buffer.get(row, "chosen"),
+                   removed=buffer.get(row, "removed"), seen_plan=buffer.get(row, "seen_plan"),
+                   hint_names=buffer.hint_library.get_hint_names(),
+                   plan_fingerprint=buffer.get_plan_fingerprint(row))
 
     def __eq__(self, other):
         return (self.query_name == other.query_name
@@ -97,6 +117,7 @@ class LabelingResult:
         return_dict["chosen"] = self.chosen_in_level
         return_dict["removed"] = self.removed
         return_dict["seen_plan"] = self.seen_plan
+        return_dict["plan_fingerprint"] = self.plan_fingerprint
         return return_dict
 
 
@@ -104,7 +125,13 @@ class HeuristicLabelingSettings:
 
     def __init__(self, query_path: str, save_path: str, config_path: str, database_string: str, use_extension: bool,
                  use_default_hints: bool, use_experience: bool, use_early_stopping: bool, use_hint_removal: bool,
-                 use_level_restriction: bool, op_mode: str):
+                 use_level_restriction: bool, op_mode: str, hint_library_path: Optional[str] = None,
+                 use_knobs: bool = False, use_learned_timeouts: bool = False,
+                 timeout_history_path: Optional[str] = None, model_path: Optional[str] = None,
+                 statistics_path: Optional[str] = None, seed_count: int = 3, use_neighbor_seeding: bool = False,
+                 neighbor_archive_path: Optional[str] = None, neighbor_count: int = 3, use_surrogate: bool = False,
+                 use_surrogate_analyze: bool = False, search_path: Optional[str] = None,
+                 weight_order: Optional[str] = None):
 
         # static settings
         self.stop_level: int = 4
@@ -124,25 +151,91 @@ class HeuristicLabelingSettings:
         self.use_early_stopping = use_early_stopping
         self.use_hint_removal = use_hint_removal
         self.use_level_restriction = use_level_restriction
-        self.op_mode = OpMode.SUB if op_mode == "sub" else OpMode.ADD
+        self.op_mode = {"sub": OpMode.SUB, "add": OpMode.ADD, "both": OpMode.BOTH}[op_mode]
+        self.hint_library_path = hint_library_path
+        self.use_knobs = use_knobs
+        self.use_learned_timeouts = use_learned_timeouts
+        self.timeout_history_path = timeout_history_path
+        self.model_path = model_path
+        self.statistics_path = statistics_path
+        self.seed_count = seed_count
+        self.use_neighbor_seeding = use_neighbor_seeding
+        self.neighbor_archive_path = neighbor_archive_path
+        self.neighbor_count = neighbor_count
+        self.use_surrogate = use_surrogate
+        self.use_surrogate_analyze = use_surrogate_analyze
+        self.search_path = search_path
+        self.weight_order = weight_order
 
         self.use_aggressive_timeout = self.use_experience
 
         self.workload = Workload(self.query_path)
         self.path_config = PathConfig(self.config_path)
-        self.dbc = DatabaseConnection(self.path_config.get_db_connection(self.database_string))
+        self.dbc = DatabaseConnection(self.path_config.get_db_connection(self.database_string),
+                                      search_path=self.search_path)
         _ = Logger(self.path_config, f"{os.path.basename(self.save_path)[:-4]}.log")
         self.logger = get_logger()
 
-        if self.use_default_hints:
-            used_hint_library = get_default_library()
+        if self.hint_library_path is not None:
+            used_hint_library = HintLibrary.from_dict(u.load_json(self.hint_library_path))
+        elif self.use_default_hints:
+            used_hint_library = get_default_library(self.use_knobs, self.get_knob_settings())
         else:
-            used_hint_library = get_available_library(self.dbc.version(), False, False, False)
+            used_hint_library = get_available_library(self.dbc.version(), False, False, False, self.use_knobs,
+                                                      self.get_knob_settings())
         self.hs_factory = HintSetFactory(used_hint_library)
         self.hints_in_use_count = self.hs_factory.hint_library.collection_size
+        self.hint_radices = self.hs_factory.hint_library.radices
 
-    def get_timeout(self, pg_default: float):
-        return max(self._absolute_timeout, pg_default * self._relative_timeout)
+        if self.use_learned_timeouts:
+            self.timeout_policy = LearnedTimeoutPolicy(self._absolute_timeout, self._relative_timeout)
+            if self.timeout_history_path is not None and os.path.exists(self.timeout_history_path):
+                self.timeout_policy.load_dict(u.load_json(self.timeout_history_path))
+        else:
+            self.timeout_policy = StaticTimeoutPolicy(self._absolute_timeout, self._relative_timeout)
+
+        self.seeders = list()
+        if self.model_path is not None or self.use_neighbor_seeding:
+            encoding_info = EncodingInformation(self.dbc, self.statistics_path, self.workload)
+            if self.model_path is not None:
+                self.seeders.append(ModelSeeder(self.model_path, self.workload, encoding_info, self.seed_count))
+            if self.use_neighbor_seeding:
+                self.seeders.append(NeighborSeeder(self.workload, encoding_info, self.neighbor_archive_path,
+                                                   self.neighbor_count))
+
+    def get_knob_settings(self) -> Optional[dict[str, str]]:
+        # knob defaults are taken from the server so that the default hint set does not change its configuration
+        return self.dbc.get_settings(KNOB_INSTRUCTIONS) if self.use_knobs else None
+
+    def get_timeout(self, pg_default: float, level: Optional[int] = None, hint: Optional[int] = None):
+        return self.timeout_policy.get_timeout(pg_default, level, hint)
+
+    def get_query_names(self) -> list[str]:
+        """
+        :return: query names in labeling order
+        """
+        if self.weight_order is None:
+            return self.workload.query_names
+        return self.workload.get_query_names_by_weight(self.weight_order)
+
+    def save_timeout_history(self):
+        if self.timeout_history_path is not None:
+            u.save_json(self.timeout_policy.to_dict(), self.timeout_history_path)
+
+
+@dataclass
+class Frontier:
+    op_mode: OpMode
+    experience: HintExperience
+    last_chosen: int
+    # time of the hint set the current neighborhood is compared against
+    timeout_baseline: float
+    level: int = 1
+    es_level: int = 0
+    share_incumbent: bool = False
+    learn_timeouts: bool = True
+    hint_restrictions: set = field(default_factory=set)
+    sorted_neighbors: list = field(default_factory=list)
 
 
 class Labeling:
@@ -150,141 +243,326 @@ class Labeling:
     def __init__(self, settings: HeuristicLabelingSettings):
         self.settings = settings
 
-        self.starting_hint_set_int = 2 ** self.settings.hints_in_use_count - 1 \
-            if self.settings.op_mode == OpMode.SUB else 0
+        self.starting_hint_set_int = 0 if self.settings.op_mode == OpMode.ADD \
+            else self.settings.hs_factory.default_hint_set().hint_set_int
         self.starting_hint_set = self.settings.hs_factory.hint_set(self.starting_hint_set_int)
 
         self.base_timeout = 300_000
-        self.level = 0
-        self.timeout = self.base_timeout
 
         self.experience = HintExperience()
-
-    def label_query(self, query_name: str):
-        query_results = list()
+        # hint offsets of the opposite direction have a different meaning, so bidirectional runs learn separately
+        self.opposite_experience = HintExperience()
+        # per query runtime model, reset for every query
+        self.surrogate = None
+        self.skipped_candidates = list()
+        self.results = ResultBuffer(self.settings.hs_factory.hint_library)
+        # optional callable invoked before every execution of a search, e.g., to wait for foreground load
+        self.before_execution = None
+
+    def _evaluate_hint_set(self, query: str, hint_set: HintSet, seen_plans: dict, timeout: float,
+                           hs_q_plan_node: Optional[ExplainNode] = None) -> tuple[QueryResult, ExplainNode, bool]:
+        """
+        Executes a hint set unless its query plan was already observed.
+        :param hs_q_plan_node: query plan node of the hint set if it was already explained
+        :return: query result, query plan node, and whether the plan was already observed
+        """
+        if hs_q_plan_node is None:
+            hs_q_plan_node = ExplainNode(self.settings.dbc.explain_query(query, hint_set))
+        if hs_q_plan_node in seen_plans:
+            hs_q_plan = seen_plans[hs_q_plan_node]
+            self.settings.logger.info(f"Observed matching hash. "
+                                      f"Adding time: {hs_q_plan.time} to already observed query plan")
+            hs_result = QueryResult(query, hint_set.hint_set_int, hs_q_plan.time, timeout_used=hs_q_plan.timeout_used,
+                                    timed_out=hs_q_plan.timed_out, pre_warmed=False, query_plan=dict())
+            return hs_result, hs_q_plan_node, True
+        if self.before_execution is not None:
+            self.before_execution()
+        hs_result = self.settings.dbc.evaluate_hinted_query(query, hint_set, timeout=timeout)
+        if self.surrogate is not None:
+            self._observe(query, hint_set, hs_q_plan_node, hs_result)
+        seen_plans[hs_q_plan_node] = hs_result
+        return hs_result, hs_q_plan_node, False
+
+    def _observe(self, query: str, hint_set: HintSet, q_plan_node: ExplainNode, q_result: QueryResult) -> None:
+        """
+        Adds a timed execution to the surrogate. Subtree times are collected by an additional, untimed EXPLAIN ANALYZE
+        execution, such that all measured times stay free of instrumentation overhead.
+        """
+        analyzed_plan = None
+        if self.settings.use_surrogate_analyze and not q_result.timed_out:
+            if self.before_execution is not None:
+                self.before_execution()
+            analyzed_plan = self.settings.dbc.evaluate_hinted_query(query, hint_set,
+                                                                    timeout=self.settings.get_timeout(q_result.time),
+                                                                    explain_analyze=True).query_plan
+        self.surrogate.observe(q_plan_node, q_result.time, q_result.timed_out, analyzed_plan)
+
+    def _get_seeds(self, query_name: str) -> list[int]:
+        seeds = list()
+        for seed in [seed for seeder in self.settings.seeders for seed in seeder.get_seeds(query_name)]:
+            if seed == self.starting_hint_set_int or seed in seeds:
+                continue
+            if not 0 <= seed < self.settings.hs_factory.hint_library.search_space_size:
+                self.settings.logger.info(f"Ignoring seed: {seed} that is not part of the used hint library")
+                continue
+            seeds.append(seed)
+        return seeds
+
+    def _get_neighbors(self, frontier: Frontier) -> list[int]:
+        neighbors = get_one_ring_of_hint_set(frontier.last_chosen, self.settings.hints_in_use_count, frontier.op_mode,
+                                             hint_restrictions=frontier.hint_restrictions,
+                                             radices=self.settings.hint_radices)
+        sorted_neighbors = list(sorted(neighbors))
+        return frontier.experience.order(frontier.level, sorted_neighbors) \
+            if frontier.experience is not None else sorted_neighbors
+
+    def _get_time(self, row: int) -> float:
+        return self.results.get(row, "time")
+
+    def _is_better(self, row: int, incumbent: Optional[int]) -> bool:
+        """
+        Timed out rows store their timeout as time, which is no measurement and never beats a finished row.
+        """
+        if incumbent is None:
+            return True
+        return (self.results.get(row, "timeout"), self._get_time(row)) < \
+            (self.results.get(incumbent, "timeout"), self._get_time(incumbent))
+
+    def _improves(self, row: int, incumbent: int) -> bool:
+        return not self.results.get(row, "timeout") and self._get_time(row) < self._get_time(incumbent)
+
+    def _label_level(self, query_name: str, query: str, frontier: Frontier, seen_plans: dict, evaluated: dict,
+                     current_opt: int) -> int:
+        """
+        Evaluates the neighborhood of a frontier and moves it to the best neighbor.
+        :param evaluated: result rows by hint set integer, shared by all frontiers of the query
+        :param current_opt: result row of the optimum of the query
+        :return: the result row of the possibly improved optimum of the query
+        """
+        sorted_neighbors = frontier.sorted_neighbors
+        hint_set_ints = [frontier.last_chosen - neighbor for neighbor in sorted_neighbors] \
+            if frontier.op_mode == OpMode.SUB else np.add(frontier.last_chosen, sorted_neighbors).tolist()
+        current_opt_time = self._get_time(current_opt)
+        neighborhood_opt, neighborhood_opt_time = None, None
+        new_hint_sets = 0
+        for idx in range(len(hint_set_ints)):
+            hint_set_int = hint_set_ints[idx]
+            if hint_set_int in evaluated:
+                # the other frontier already reached this hint set
+                row = evaluated[hint_set_int]
+                if self._is_better(row, neighborhood_opt):
+                    neighborhood_opt, neighborhood_opt_time = row, self._get_time(row)
+                continue
+            new_hint_sets += 1
+            hint_set = self.settings.hs_factory.hint_set(hint_set_int)
+            self.settings.logger.info(f"Evaluating Hint Set: {hint_set_int}")
+            timeout_baseline = min(frontier.timeout_baseline, current_opt_time) \
+                if frontier.share_incumbent else frontier.timeout_baseline
+            policy_hint = sorted_neighbors[idx] if frontier.learn_timeouts else None
+            timeout = self.settings.get_timeout(timeout_baseline, frontier.level, policy_hint)
+            hs_q_plan_node = ExplainNode(self.settings.dbc.explain_query(query, hint_set))
+            if self.surrogate is not None and hs_q_plan_node not in seen_plans:
+                dominated, predicted_time, lower_bound = self.surrogate.is_dominated(hs_q_plan_node, current_opt_time)
+                if dominated:
+                    self.settings.logger.info(f"Skipping Hint Set: {hint_set_int} predicted at: {predicted_time} "
+                                              f"with lower bound: {lower_bound} against: {current_opt_time}")
+                    self.skipped_candidates.append(SkippedCandidate(
+                        query_name, hint_set_int, frontier.level, current_opt_time, predicted_time,
+                        lower_bound, hs_q_plan_node.fingerprint))
+                    continue
+            hs_result, hs_q_plan_node, seen_plan = self._evaluate_hint_set(query, hint_set, seen_plans, timeout,
+                                                                           hs_q_plan_node)
+            if not seen_plan and frontier.learn_timeouts:
+                self.settings.timeout_policy.observe(frontier.level, policy_hint, timeout_baseline, hs_result.time,
+                                                     hs_result.timed_out)
+
+            if self.settings.use_aggressive_timeout and not hs_result.timed_out and hs_result.time < current_opt_time:
+                frontier.timeout_baseline = hs_result.time
+
+            remove_hint = self.settings.use_hint_removal and hs_result.timed_out
+            if remove_hint:
+                self.settings.logger.info(f"Added Hint: {sorted_neighbors[idx]} to ignored hints")
+                frontier.hint_restrictions.add(sorted_neighbors[idx])
+            row = self.results.append(query_name, hint_set_int, hs_result.time, frontier.level, hs_result.timed_out,
+                                      seen_plan, hs_q_plan_node.fingerprint, removed=remove_hint)
+            evaluated[hint_set_int] = row
+
+            if self._is_better(row, neighborhood_opt):
+                neighborhood_opt, neighborhood_opt_time = row, hs_result.time
+            if self._improves(row, current_opt):
+                if hs_result.time * self.settings.early_stopping_factor < current_opt_time:
+                    frontier.es_level = frontier.level
+                current_opt, current_opt_time = row, hs_result.time
+
+            if self.settings.use_experience:
+                if hs_result.timed_out:
+                    frontier.experience.sub(frontier.level, sorted_neighbors[idx])
+                    self.settings.logger.info(f"Added negative experience for query: {query_name}, "
+                                              f"level: {frontier.level}, "
+                                              f"hint: {sorted_neighbors[idx]}")
+                else:
+                    frontier.experience.add(frontier.level, sorted_neighbors[idx])
+
+        if neighborhood_opt is None:
+            self.settings.logger.info(f"All neighbors were skipped, stopping at level: {frontier.level}")
+            frontier.sorted_neighbors = list()
+            return current_opt
+        self.results.set(neighborhood_opt, "chosen", True)
+
+        if self.settings.use_early_stopping and frontier.level - frontier.es_level >= \
+                self.settings.early_stopping_threshold:
+            self.settings.logger.info(f"Using early stopping to break at level: {frontier.level}")
+            frontier.sorted_neighbors = list()
+            return current_opt
+        if self.settings.use_level_restriction and frontier.level >= self.settings.stop_level:
+            self.settings.logger.info(f"Using stop level to break: {frontier.level}")
+            frontier.sorted_neighbors = list()
+            return current_opt
+        if new_hint_sets == 0:
+            self.settings.logger.info(f"All neighbors were already evaluated, stopping at level: {frontier.level}")
+            frontier.sorted_neighbors = list()
+            return current_opt
+
+        frontier.last_chosen = self.results.get(neighborhood_opt, "hint_set_int")
+        frontier.timeout_baseline = neighborhood_opt_time  # set new level baseline
+        frontier.level += 1
+        frontier.sorted_neighbors = self._get_neighbors(frontier)
+        return current_opt
+
+    def label_query_rows(self, query_name: str) -> range:
+        """
+        Labels a query into the result buffer.
+        :return: rows of the query in the result buffer
+        """
+        start = len(self.results)
         seen_plans = dict()
-        es_level = 0
         query = self.settings.workload.read_query(query_name)
+        self.surrogate = PlanSurrogate() if self.settings.use_surrogate else None
         self.settings.logger.info(f"Evaluating Hint Set: {self.starting_hint_set_int}")
 
         # Adding query plans to seen plans
         q_plan_node = ExplainNode(self.settings.dbc.explain_query(query, self.starting_hint_set))
         self.settings.logger.info(f"Default Evaluation for query: {query_name}")
-        q_result = self.settings.dbc.evaluate_hinted_query(query, self.starting_hint_set, timeout=self.base_timeout,
+        default_timeout = self.settings.timeout_policy.get_default_timeout(q_plan_node.cost, self.base_timeout)
+        if self.before_execution is not None:
+            self.before_execution()
+        q_result = self.settings.dbc.evaluate_hinted_query(query, self.starting_hint_set, timeout=default_timeout,
                                                            pre_warm=False)
+        self.settings.timeout_policy.observe_default(q_plan_node.cost, q_result.time, q_result.timed_out)
+        if self.surrogate is not None:
+            self._observe(query, self.starting_hint_set, q_plan_node, q_result)
         seen_plans[q_plan_node] = q_result
 
-        labeling_result = LabelingResult(
-            query_name=query_name, hint_set_int=self.starting_hint_set.hint_set_int,
-            binary_rep=self.starting_hint_set.get_binary(), measured_time=q_result.time, occurred_level=self.level,
-            is_opt=False, had_timeout=q_result.timed_out, chosen_in_level=True, removed=False, seen_plan=False,
-            hint_names=self.settings.hs_factory.hint_library.get_hint_names()
-        )
-        query_results.append(labeling_result)
-        self.level += 1
-        current_opt = labeling_result
-        self.timeout = self.settings.get_timeout(q_result.time)
-        last_chosen = self.starting_hint_set_int
-
-        neighborhood_opt = None
-        neighbors = get_one_ring_of_hint_set(self.starting_hint_set_int, self.settings.hints_in_use_count,
-                                             self.settings.op_mode, hint_restrictions=None)
-        sorted_neighbors = list(sorted(neighbors))
-        sorted_neighbors = self.experience.order(self.level, sorted_neighbors) \
-            if self.experience is not None else sorted_neighbors
-        hint_restrictions = set()
-
-        while sorted_neighbors:
-            hint_set_ints = [last_chosen - neighbor for neighbor in sorted_neighbors] \
-                if self.settings.op_mode == self.settings.op_mode.SUB else np.add(last_chosen,
-                                                                                  sorted_neighbors).tolist()
-            for idx in range(len(hint_set_ints)):
-                seen_plan = False
-                hint_set_int = hint_set_ints[idx]
-                hint_set = self.settings.hs_factory.hint_set(hint_set_int)
-                self.settings.logger.info(f"Evaluating Hint Set: {hint_set_int}")
-                hs_q_plan_node = ExplainNode(self.settings.dbc.explain_query(query, hint_set))
-                if hs_q_plan_node in seen_plans:
-                    seen_plan = True
-                    hs_q_plan = seen_plans[hs_q_plan_node]
-                    self.settings.logger.info(f"Observed matching hash. "
-                                              f"Adding time: {hs_q_plan.time} to already observed query plan")
-                    hs_result = QueryResult(query, hint_set_int, hs_q_plan.time, timeout_used=hs_q_plan.timeout_used,
-                                            timed_out=hs_q_plan.timed_out, pre_warmed=False, query_plan=dict())
-                else:
-                    hs_result = self.settings.dbc.evaluate_hinted_query(query, hint_set, timeout=self.timeout)
-                    seen_plans[hs_q_plan_node] = hs_result
-
-                if self.settings.use_aggressive_timeout and hs_result.time < current_opt.measured_time:
-                    self.timeout = self.settings.get_timeout(hs_result.time)
-
-                remove_hint = self.settings.use_hint_removal and hs_result.timed_out
-                if remove_hint:
-                    self.settings.logger.info(f"Added Hint: {sorted_neighbors[idx]} to ignored hints")
-                    hint_restrictions.add(sorted_neighbors[idx])
-                labeling_result = LabelingResult(
-                    query_name=query_name, hint_set_int=hint_set.hint_set_int, binary_rep=hint_set.get_binary(),
-                    measured_time=hs_result.time, occurred_level=self.level, is_opt=False,
-                    had_timeout=hs_result.timed_out, chosen_in_level=False,  removed=True if remove_hint else False,
-                    seen_plan=seen_plan, hint_names=self.settings.hs_factory.hint_library.get_hint_names()
-                )
-                query_results.append(labeling_result)
-
-                if neighborhood_opt is None or labeling_result.measured_time < neighborhood_opt.measured_time:
-                    neighborhood_opt = labeling_result
-                if labeling_result.measured_time < current_opt.measured_time:
-                    current_opt = labeling_result
-                    if labeling_result.measured_time * self.settings.early_stopping_factor < current_opt.measured_time:
-                        es_level = self.level
-
-                if self.settings.use_experience:
-                    if hs_result.timed_out:
-                        self.experience.sub(self.level, sorted_neighbors[idx])
-                        self.settings.logger.info(f"Added negative experience for query: {query_name}, "
-                                                  f"level: {self.level}, "
-                                                  f"hint: {sorted_neighbors[idx]}")
-                    else:
-                        self.experience.add(self.level, sorted_neighbors[idx])
-
-            chosen_idx = query_results.index(neighborhood_opt)
-            query_results[chosen_idx].chosen_in_level = True
-
-            if self.settings.use_early_stopping and self.level - es_level >= self.settings.early_stopping_threshold:
-                self.settings.logger.info(f"Using early stopping to break at level: {self.level}")
-                break
-            if self.settings.use_level_restriction and self.level >= self.settings.stop_level:
-                self.settings.logger.info(f"Using stop level to break: {self.level}")
-                break
-
-            new_neighbors = get_one_ring_of_hint_set(query_results[chosen_idx].hint_set_int,
-                                                     self.settings.hints_in_use_count,
-                                                     self.settings.op_mode, hint_restrictions=hint_restrictions)
-            sorted_neighbors = list(sorted(new_neighbors))
-            sorted_neighbors = self.experience.order(self.level, sorted_neighbors) \
-                if self.experience is not None else sorted_neighbors
-            last_chosen = neighborhood_opt.hint_set_int
-            self.timeout = self.settings.get_timeout(neighborhood_opt.measured_time)  # set new level baseline
-
-            self.level += 1
-            neighborhood_opt = None
+        current_opt = self.results.append(query_name, self.starting_hint_set_int, q_result.time, 0, q_result.timed_out,
+                                          False, q_plan_node.fingerprint, chosen=True)
+        evaluated = {self.starting_hint_set_int: current_opt}
+
+        # predicted and neighboring hint sets are additional starting points, the search continues from the best one
+        for seed in self._get_seeds(query_name):
+            self.settings.logger.info(f"Evaluating seeded Hint Set: {seed}")
+            hint_set = self.settings.hs_factory.hint_set(seed)
+            hs_result, hs_q_plan_node, seen_plan = self._evaluate_hint_set(
+                query, hint_set, seen_plans, self.settings.get_timeout(self._get_time(current_opt)))
+            row = self.results.append(query_name, seed, hs_result.time, 0, hs_result.timed_out, seen_plan,
+                                      hs_q_plan_node.fingerprint)
+            evaluated[seed] = row
+            if self._improves(row, current_opt):
+                self.results.set(current_opt, "chosen", False)
+                self.results.set(row, "chosen", True)
+                current_opt = row
+
+        share_incumbent = self.settings.op_mode == OpMode.BOTH
+        frontiers = [Frontier(OpMode.SUB if share_incumbent else self.settings.op_mode, self.experience,
+                              self.results.get(current_opt, "hint_set_int"), self._get_time(current_opt),
+                              share_incumbent=share_incumbent)]
+        if share_incumbent:
+            # the opposite frontier starts with all hints at their lowest value
+            opposite_start = self.settings.hs_factory.hint_set(0)
+            self.settings.logger.info("Evaluating opposite starting Hint Set: 0")
+            hs_result, hs_q_plan_node, seen_plan = self._evaluate_hint_set(
+                query, opposite_start, seen_plans, self.settings.get_timeout(self._get_time(current_opt)))
+            row = self.results.append(query_name, 0, hs_result.time, 0, hs_result.timed_out, seen_plan,
+                                      hs_q_plan_node.fingerprint, chosen=True)
+            evaluated[0] = row
+            if self._improves(row, current_opt):
+                current_opt = row
+            frontiers.append(Frontier(OpMode.ADD, self.opposite_experience, 0, hs_result.time,
+                                      share_incumbent=True, learn_timeouts=False))
+        for frontier in frontiers:
+            frontier.sorted_neighbors = self._get_neighbors(frontier)
+
+        # frontiers advance one level at a time, an early stopped frontier has no neighbors left
+        while any(frontier.sorted_neighbors for frontier in frontiers):
+            frontier = min([frontier for frontier in frontiers if frontier.sorted_neighbors],
+                           key=lambda active: active.level)
+            current_opt = self._label_level(query_name, query, frontier, seen_plans, evaluated, current_opt)
 
         # set opt flag
-        idx = query_results.index(current_opt)
-        query_results[idx].is_opt = True
-        self.level = 0
+        self.results.set(current_opt, "opt", True)
+        for seeder in self.settings.seeders:
+            seeder.observe(query_name, self.results.get(current_opt, "hint_set_int"))
+        return range(start, len(self.results))
+
+    def label_query(self, query_name: str) -> list[LabelingResult]:
+        return [LabelingResult.from_buffer(self.results, row) for row in self.label_query_rows(query_name)]
+
+    def get_opt_row(self, rows: range) -> int:
+        """
+        :param rows: rows of a single labeled query in the result buffer
+        :return: result row of the optimum of the query
+        """
+        return next(row for row in rows if self.results.get(row, "opt"))
+
+    def check_candidates(self, query_name: str, candidates: list[int]) -> list[LabelingResult]:
+        """
+        Executes only the given hint sets instead of searching, hint sets with an already executed plan reuse its time.
+        """
+        query = self.settings.workload.read_query(query_name)
+        hint_names = self.settings.hs_factory.hint_library.get_hint_names()
+        seen_plans = dict()
+        best_time = None
+        query_results = list()
+        # candidates start with the default, which determines the timeout of the others
+        for hint_set_int in candidates:
+            hint_set = self.settings.hs_factory.hint_set(hint_set_int)
+            plan = ExplainNode(self.settings.dbc.explain_query(query, hint_set))
+            seen_plan = plan in seen_plans
+            if seen_plan:
+                q_result = seen_plans[plan]
+            else:
+                timeout = self.base_timeout if best_time is None else self.settings.get_timeout(best_time)
+                self.settings.logger.info(f"Checking Hint Set: {hint_set_int} for query: {query_name}")
+                q_result = self.settings.dbc.evaluate_hinted_query(query, hint_set, timeout=timeout)
+                seen_plans[plan] = q_result
+            if not q_result.timed_out and (best_time is None or q_result.time < best_time):
+                best_time = q_result.time
+            query_results.append(LabelingResult(
+                query_name=query_name, hint_set_int=hint_set_int, binary_rep=hint_set.get_digits(),
+                measured_time=q_result.time, occurred_level=0, is_opt=False, had_timeout=q_result.timed_out,
+                chosen_in_level=False, removed=False, seen_plan=seen_plan, hint_names=hint_names,
+                plan_fingerprint=plan.fingerprint
+            ))
+        opt = min(query_results, key=lambda result: (result.measured_time, result.had_timeout))
+        opt.is_opt = True
+        opt.chosen_in_level = True
         return query_results
 
     def label_queries(self):
-        all_results = list()
         t0 = time.time()
-        for query_index in trange(len(self.settings.workload.query_names)):
-            query_name = self.settings.workload.query_names[query_index]
+        query_names = self.settings.get_query_names()
+        for query_index in trange(len(query_names)):
+            query_name = query_names[query_index]
             self.settings.logger.info('Evaluating query: {}, {} / {}'.format(query_name, query_index + 1,
-                                                                             len(self.settings.workload.query_names)))
-            query_results = self.label_query(query_name)
-            all_results.extend(query_results)
-            df = pd.DataFrame([result.to_dict() for result in all_results])
-            df.to_csv(self.settings.save_path, index=False)
+                                                                             len(query_names)))
+            rows = self.label_query_rows(query_name)
+            # only the rows of the new query are exported, afterwards they are not needed anymore
+            self.results.to_csv(self.settings.save_path, rows.start, rows.stop, append=query_index > 0)
+            self.results.clear()
+            self.settings.save_timeout_history()
+            if self.settings.use_surrogate:
+                pd.DataFrame([candidate.__dict__ for candidate in self.skipped_candidates],
+                             columns=[candidate_field.name for candidate_field in fields(SkippedCandidate)]).to_csv(
+                    self.settings.save_path[:-4] + "_skipped.csv", index=False)
         t1 = time.time() - t0
         self.settings.logger.info(f'Finished labeling {len(self.settings.workload.query_names)} '
                                   f'queries in {int(t1 / 60)}min {int(t1 % 60)}s.')
@@ -308,8 +586,35 @@ def run():
     parser.add_argument("-ulr", "--use-level-restriction", action="store_true", help="Whether or not to use "
                                                                                      "level restriction.")
 
-    parser.add_argument("-m", "--mode", default="sub", choices=["sub", "add"],
-                        help="Which mode (adding/subtracting) of hints to use. This refers to enabling and disabling.")
+    parser.add_argument("-m", "--mode", default="sub", choices=["sub", "add", "both"],
+                        help="Which mode (adding/subtracting) of hints to use. This refers to enabling and disabling. "
+                             "Both advances from the default and from all disabled hints until they meet.")
+    parser.add_argument("-hl", "--hint-library", default=None, help="Optional: <path/to/library.json> of a reduced "
+                                                                    "hint library to use instead of the full one.")
+    parser.add_argument("-uk", "--use-knobs", action="store_true", help="Whether or not to add non-boolean planner "
+                                                                        "knobs like join_collapse_limit to the hints.")
+    parser.add_argument("-lt", "--learned-timeouts", action="store_true",
+                        help="Whether or not to learn per level and hint timeouts from observed speedups.")
+    parser.add_argument("-th", "--timeout-history", default=None,
+                        help="Optional: <path/to/history.json> to continue learning timeouts from and save them to.")
+    parser.add_argument("-sm", "--seed-models", default=None,
+                        help="Optional: <path/to/models.joblib> saved by evaluate_workload_simple.py whose top "
+                             "predictions are evaluated as additional starting points.")
+    parser.add_argument("-stats", "--statistics", default=None, help="<Path/to/statistics/> used to encode queries "
+                                                                     "for seeding.")
+    parser.add_argument("-sc", "--seed-count", type=int, default=3, help="Number of predicted hint sets per query.")
+    parser.add_argument("-ns", "--neighbor-seeding", action="store_true",
+                        help="Whether or not to start from the optimal hint sets of the most similar labeled queries.")
+    parser.add_argument("-na", "--neighbor-archive", default=None,
+                        help="Optional: <path/to/archive.csv> of already labeled queries from the query directory.")
+    parser.add_argument("-nk", "--neighbor-count", type=int, default=3, help="Number of neighbors per query.")
+    parser.add_argument("-us", "--use-surrogate", action="store_true",
+                        help="Whether or not to skip neighbors that a per query runtime model predicts to lose.")
+    parser.add_argument("-usa", "--use-surrogate-analyze", action="store_true",
+                        help="Whether or not to additionally execute with EXPLAIN ANALYZE to reuse subtree times in "
+                             "the surrogate. Labeled times always stem from plain executions.")
+    parser.add_argument("-wo", "--weight-order", default=None, choices=["calls", "total_time"],
+                        help="Optional: label queries with the highest captured weight first, see capture.py.")
     args = parser.parse_args()
 
     if not os.path.exists(args.queries):
@@ -318,10 +623,24 @@ def run():
         raise ValueError(f"Save path: {args.output} already exists.")
     if not os.path.exists(args.config):
         raise ValueError(f"Invalid config path: {args.config}.")
+    if args.hint_library is not None and not os.path.exists(args.hint_library):
+        raise ValueError(f"Invalid hint library path: {args.hint_library}.")
+    if args.seed_models is not None and not os.path.exists(args.seed_models):
+        raise ValueError(f"Invalid seed model path: {args.seed_models}.")
+    if args.neighbor_archive is not None and not os.path.exists(args.neighbor_archive):
+        raise ValueError(f"Invalid neighbor archive path: {args.neighbor_archive}.")
+    if (args.seed_models is not None or args.neighbor_seeding) and \
+            (args.statistics is None or not os.path.exists(args.statistics)):
+        raise ValueError(f"Invalid database statistic path: {args.statistics}.")
 
     settings = HeuristicLabelingSettings(args.queries, args.output, args.config, args.database, args.use_extension,
                                          args.use_default, args.use_experience, args.use_early_stopping,
-                                         args.use_hint_removal, args.use_level_restriction, args.mode)
+                                         args.use_hint_removal, args.use_level_restriction, args.mode,
+                                         args.hint_library, args.use_knobs, args.learned_timeouts,
+                                         args.timeout_history, args.seed_models, args.statistics, args.seed_count,
+                                         args.neighbor_seeding, args.neighbor_archive, args.neighbor_count,
+                                         args.use_surrogate, args.use_surrogate_analyze,
+                                         weight_order=args.weight_order)
     # initial considerations
     settings.dbc.disable_geqo()
     settings.logger.info(f"\nRunning Labeling on:\n {settings.dbc.version()}.\n")
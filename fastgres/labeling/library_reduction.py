@@ -0,0 +1,231 @@
+import argparse
+import dataclasses
+import os
+import numpy as np
+import pandas as pd
+
+from tqdm import tqdm
+from fastgres.baseline import utility as u
+from fastgres.baseline.log_utils import Logger, get_logger
+from fastgres.definitions import PathConfig
+from fastgres.hinting import Hint, HintLibrary, get_default_library, get_available_library
+from fastgres.labeling.archive import JsonArchive
+from fastgres.query_encoding.query import Query
+from fastgres.workload.workload import Workload
+
+
+@dataclasses.dataclass
+class HintStatistic:
+    name: str
+    index: int
+    opt_share: float
+    near_opt_share: float
+    timeout_share: float
+    selected: bool = False
+
+
+def load_measurements(paths: list[str]) -> pd.DataFrame:
+    """
+    Loads labeling outputs or archives into one frame of measurements.
+    :param paths: csv labeling outputs, csv archives, or legacy json archives
+    :return: dataframe with columns query_name: str, hint_set_int: int, time: float, timeout: bool
+    """
+    frames = list()
+    for path in paths:
+        if path.endswith(".json"):
+            df = JsonArchive(path).to_dataframe()
+        else:
+            df = pd.read_csv(path)
+            df = df.rename(columns={"timed_out": "timeout"})
+        if "timeout" not in df:
+            df["timeout"] = False
+        frames.append(df[["query_name", "hint_set_int", "time", "timeout"]])
+    measurements = pd.concat(frames, ignore_index=True)
+    measurements["hint_set_int"] = measurements["hint_set_int"].astype(int)
+    measurements["timeout"] = measurements["timeout"].astype(bool)
+    return measurements
+
+
+def get_disabled_masks(hint_set_ints: np.ndarray, hint_library: HintLibrary) -> np.ndarray:
+    """
+    :return: bit masks in which bit i is set if hint i deviates from its default, i.e., is not at its highest digit
+    """
+    hint_set_ints = hint_set_ints.astype(np.int64)
+    masks = np.zeros(len(hint_set_ints), dtype=np.int64)
+    for index, (radix, weight) in enumerate(zip(hint_library.radices, hint_library.get_values())):
+        disabled = (hint_set_ints // weight) % radix != radix - 1
+        masks[disabled] |= 2 ** index
+    return masks
+
+
+def get_near_optimal(measurements: pd.DataFrame, tolerance: float) -> pd.DataFrame:
+    """
+    :param measurements: measurements as loaded by load_measurements
+    :param tolerance: relative slack to the optimal time of a query, e.g., 0.05 for 5%
+    :return: all not timed out measurements that are within the tolerance of their queries' optimum
+    """
+    finished = measurements[~measurements["timeout"]]
+    opt_times = finished.groupby("query_name")["time"].transform("min")
+    return finished[finished["time"] <= opt_times * (1.0 + tolerance)]
+
+
+def get_hint_statistics(measurements: pd.DataFrame, hint_library: HintLibrary,
+                        tolerance: float) -> list[HintStatistic]:
+    finished = measurements[~measurements["timeout"]]
+    opt_entries = finished.loc[finished.groupby("query_name")["time"].idxmin()]
+    near_opt_entries = get_near_optimal(measurements, tolerance)
+
+    opt_masks = get_disabled_masks(opt_entries["hint_set_int"].to_numpy(), hint_library)
+    near_opt_masks = get_disabled_masks(near_opt_entries["hint_set_int"].to_numpy(), hint_library)
+    all_masks = get_disabled_masks(measurements["hint_set_int"].to_numpy(), hint_library)
+    timeouts = measurements["timeout"].to_numpy()
+
+    statistics = list()
+    for hint in hint_library.get_hints():
+        bit = 2 ** hint.index
+        disabled = np.bitwise_and(all_masks, bit) > 0
+        statistics.append(HintStatistic(
+            name=hint.name, index=hint.index,
+            opt_share=float(np.mean(np.bitwise_and(opt_masks, bit) > 0)) if len(opt_masks) else 0.0,
+            near_opt_share=float(np.mean(np.bitwise_and(near_opt_masks, bit) > 0)) if len(near_opt_masks) else 0.0,
+            timeout_share=float(np.mean(timeouts[disabled])) if np.any(disabled) else 0.0
+        ))
+    return statistics
+
+
+def get_coverage(query_masks: dict[str, set[int]], selected_mask: int) -> float:
+    """
+    A query is covered if one of its near-optimal hint sets only disables selected hints.
+    :param query_masks: disabled hint masks of near-optimal hint sets per query
+    :param selected_mask: mask of selected hints
+    :return: share of covered queries
+    """
+    if not query_masks:
+        return 1.0
+    covered = [any(mask & ~selected_mask == 0 for mask in masks) for masks in query_masks.values()]
+    return sum(covered) / len(covered)
+
+
+def select_hints(measurements: pd.DataFrame, hint_library: HintLibrary, coverage_target: float,
+                 tolerance: float) -> tuple[list[int], float, list[HintStatistic]]:
+    """
+    Greedily selects hints until the share of queries that keep a near-optimal hint set reaches the coverage target.
+    Ties and stagnating selections, where only a combination of hints covers new queries, are resolved by the share
+    of near-optimal hint sets disabling a hint, penalized by the timeouts it causes.
+    :return: selected hint indices, reached coverage, and per-hint statistics
+    """
+    statistics = get_hint_statistics(measurements, hint_library, tolerance)
+    near_opt = get_near_optimal(measurements, tolerance)
+    masks = get_disabled_masks(near_opt["hint_set_int"].to_numpy(), hint_library)
+    query_masks = dict()
+    for query_name, mask in zip(near_opt["query_name"].to_list(), masks.tolist()):
+        try:
+            query_masks[query_name].add(mask)
+        except KeyError:
+            query_masks[query_name] = {mask}
+
+    scores = {statistic.index: statistic.near_opt_share - statistic.timeout_share for statistic in statistics}
+    selected = list()
+    selected_mask = 0
+    coverage = get_coverage(query_masks, selected_mask)
+    while (coverage < coverage_target or not selected) and len(selected) < hint_library.collection_size:
+        candidates = [index for index in scores if index not in selected]
+        gains = {index: get_coverage(query_masks, selected_mask | 2 ** index) for index in candidates}
+        best = max(candidates, key=lambda index: (gains[index], scores[index]))
+        selected.append(best)
+        selected_mask |= 2 ** best
+        coverage = gains[best]
+
+    for statistic in statistics:
+        statistic.selected = statistic.index in selected
+    return sorted(selected), coverage, statistics
+
+
+def build_reduced_library(hint_library: HintLibrary, selected: list[int]) -> HintLibrary:
+    hints = [hint_library.hints[index] for index in sorted(selected)]
+    return HintLibrary([Hint(hint.name, new_index, *hint.tuple[2:]) for new_index, hint in enumerate(hints)])
+
+
+def get_source_library(identifier: str) -> HintLibrary:
+    """
+    :param identifier: "default" for the six core hints, a path to a saved library, or a PostgreSQL version
+    :return: library the hint set integers of the measurements refer to
+    """
+    if identifier == "default":
+        return get_default_library()
+    if os.path.exists(identifier):
+        return HintLibrary.from_dict(u.load_json(identifier))
+    return get_available_library(identifier, False, False, False)
+
+
+def reduce_per_context(measurements: pd.DataFrame, hint_library: HintLibrary, workload: Workload,
+                       coverage_target: float, tolerance: float) -> list[dict]:
+    context_queries = dict()
+    for query_name in tqdm(np.unique(measurements["query_name"]), desc="Classifying Queries"):
+        context = Query.from_workload(query_name, workload).context
+        try:
+            context_queries[context].append(query_name)
+        except KeyError:
+            context_queries[context] = [query_name]
+
+    context_libraries = list()
+    for context, query_names in context_queries.items():
+        context_measurements = measurements[measurements["query_name"].isin(query_names)]
+        selected, coverage, _ = select_hints(context_measurements, hint_library, coverage_target, tolerance)
+        context_libraries.append({
+            "tables": sorted(context),
+            "queries": len(query_names),
+            "coverage": coverage,
+            "library": build_reduced_library(hint_library, selected).to_dict()
+        })
+    return context_libraries
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Mine a reduced hint library from existing labels")
+    parser.add_argument("inputs", nargs="+", help="Labeling outputs or archives (.csv or legacy .json)")
+    parser.add_argument("-o", "--output", required=True, help="Output json save name of the reduced library")
+    parser.add_argument("-c", "--config", required=True, help="Path to config file.")
+    parser.add_argument("-l", "--library", default="default",
+                        help="Library the inputs were labeled with: default, a PostgreSQL version like 16, "
+                             "or a path to a saved library.")
+    parser.add_argument("-ct", "--coverage-target", type=float, default=0.95,
+                        help="Share of queries that should keep a near-optimal hint set.")
+    parser.add_argument("-t", "--tolerance", type=float, default=0.05,
+                        help="Relative slack to the optimum for a hint set to count as near-optimal.")
+    parser.add_argument("-q", "--queries", default=None,
+                        help="Optional: <path/to/queries/> to additionally build one library per context.")
+    args = parser.parse_args()
+
+    for path in args.inputs:
+        if not os.path.exists(path):
+            raise ValueError(f"Input path: {path} does not exist.")
+    if os.path.exists(args.output):
+        raise ValueError(f"Save path: {args.output} already exists.")
+    if not os.path.exists(args.config):
+        raise ValueError(f"Invalid config path: {args.config}.")
+    if not 0.0 <= args.coverage_target <= 1.0:
+        raise ValueError(f"Coverage target: {args.coverage_target} is not in [0, 1].")
+
+    save_stem = args.output[:-5] if args.output.endswith(".json") else args.output
+    _ = Logger(PathConfig(args.config), f"{os.path.basename(save_stem)}.log")
+    logger = get_logger()
+    hint_library = get_source_library(args.library)
+    measurements = load_measurements(args.inputs)
+    selected, coverage, statistics = select_hints(measurements, hint_library, args.coverage_target, args.tolerance)
+    reduced_library = build_reduced_library(hint_library, selected)
+    logger.info(f"Reduced library to {reduced_library.collection_size} / {hint_library.collection_size} hints "
+                f"covering {round(coverage, 4)} of all queries")
+    print(f"Selected hints: {reduced_library.get_hint_names()} covering {round(coverage, 4)} of all queries")
+
+    u.save_json(reduced_library.to_dict(), args.output)
+    pd.DataFrame([statistic.__dict__ for statistic in statistics]).to_csv(save_stem + "_statistics.csv",
+                                                                          index=False)
+    if args.queries is not None:
+        context_libraries = reduce_per_context(measurements, hint_library, Workload(args.queries),
+                                               args.coverage_target, args.tolerance)
+        u.save_json(context_libraries, save_stem + "_contexts.json")
+
+
+if __name__ == "__main__":
+    run()
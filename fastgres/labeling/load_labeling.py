@@ -0,0 +1,264 @@
+import argparse
+import dataclasses
+import os
+import random
+import threading
+import time
+import numpy as np
+import pandas as pd
+import psycopg2 as pg
+
+from typing import Optional
+from tqdm import trange
+from fastgres.baseline.database_connection import DatabaseConnection
+from fastgres.hinting import HintSet
+from fastgres.labeling.heuristic_labeling import HeuristicLabelingSettings, Labeling
+from fastgres.workload.workload import Workload
+
+
+@dataclasses.dataclass
+class LoadLevelStatistics:
+    load_level: int
+    labeled_queries: int
+    background_queries: int
+    background_timeouts: int
+    failed_connections: int
+    labeling_time: float
+
+
+@dataclasses.dataclass
+class RobustLabel:
+    query_name: str
+    hint_set_int: int
+    max_slowdown: float
+    candidates: int
+
+
+class BackgroundLoad:
+    """
+    Replays a random mix of workload queries with the default hint set on extra connections until stopped. Every
+    connection runs in its own thread, and statements running at stop time are canceled. Failing connections back off
+    and give up after MAX_FAILURES consecutive failures.
+    """
+
+    # seconds to wait after the first failure, doubled with every consecutive failure
+    RETRY_DELAY = 0.5
+    MAX_FAILURES = 5
+
+    def __init__(self, connection_string: str, workload: Workload, query_names: list[str], default_hint_set: HintSet,
+                 connections: int, timeout: float, seed: int, search_path: Optional[str] = None):
+        self.connection_string = connection_string
+        self.workload = workload
+        self.query_names = query_names
+        self.default_hint_set = default_hint_set
+        self.connections = connections
+        self.timeout = timeout
+        self.seed = seed
+        self.search_path = search_path
+        self.executed = 0
+        self.timeouts = 0
+        self.failed_connections = 0
+        self._queries = {query_name: self.workload.read_query(query_name) for query_name in self.query_names}
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._threads = list()
+        self._dbcs = list()
+
+    def _replay(self, dbc: DatabaseConnection, thread_seed: int) -> None:
+        rng = random.Random(thread_seed)
+        failures = 0
+        while not self._stop.is_set():
+            query = self._queries[rng.choice(self.query_names)]
+            try:
+                q_result = dbc.evaluate_hinted_query(query, self.default_hint_set, timeout=self.timeout)
+            except pg.Error:
+                # canceled at stop time or failed, the connection is recreated if the load continues
+                dbc.close_connection()
+                failures += 1
+                if failures >= self.MAX_FAILURES:
+                    with self._lock:
+                        self.failed_connections += 1
+                    return
+                # returns immediately once the load is stopped
+                self._stop.wait(self.RETRY_DELAY * 2 ** (failures - 1))
+                continue
+            failures = 0
+            with self._lock:
+                self.executed += 1
+                self.timeouts += q_result.timed_out
+
+    def start(self, ramp_up: float = 1.0) -> None:
+        if self._threads:
+            raise ValueError("Background load is already running")
+        self._stop.clear()
+        self.executed, self.timeouts, self.failed_connections = 0, 0, 0
+        for idx in range(self.connections):
+            dbc = DatabaseConnection(self.connection_string, f"background_{idx}", search_path=self.search_path)
+            dbc.disable_geqo()
+            thread = threading.Thread(target=self._replay, args=(dbc, self.seed + idx), daemon=True)
+            self._dbcs.append(dbc)
+            self._threads.append(thread)
+            thread.start()
+        # lets all connections get busy before measurements begin
+        time.sleep(ramp_up if self.connections > 0 else 0.0)
+
+    def stop(self) -> None:
+        self._stop.set()
+        for dbc in self._dbcs:
+            connection = dbc._connection
+            if connection is not None and not connection.closed:
+                try:
+                    connection.cancel()
+                except pg.Error:
+                    pass
+        for thread in self._threads:
+            thread.join()
+        for dbc in self._dbcs:
+            dbc.close_connection()
+        self._threads, self._dbcs = list(), list()
+
+
+def get_robust_labels(results: pd.DataFrame) -> list[RobustLabel]:
+    """
+    Picks the hint set per query whose worst slowdown over the optimum of each load level is smallest. Only hint sets
+    measured on every load level are compared, timeouts count with their timeout as lower bound.
+    :param results: labels with a load_level column
+    :return: one label per query
+    """
+    robust_labels = list()
+    levels = np.unique(results["load_level"])
+    for query_name, query_results in results.groupby("query_name", sort=True):
+        times = query_results.pivot_table(index="hint_set_int", columns="load_level", values="time", aggfunc="min")
+        times = times.reindex(columns=levels).dropna()
+        if times.empty:
+            # searches did not overlap, fall back to the optimum under the highest load
+            highest = query_results[query_results["load_level"] == query_results["load_level"].max()]
+            robust_labels.append(RobustLabel(query_name, int(highest[highest["opt"]]["hint_set_int"].iloc[0]),
+                                             float("nan"), 0))
+            continue
+        level_opt = query_results.groupby("load_level")["time"].min().reindex(levels)
+        slowdowns = (times / level_opt).max(axis=1)
+        robust_labels.append(RobustLabel(query_name, int(slowdowns.idxmin()), float(slowdowns.min()), len(times)))
+    return robust_labels
+
+
+class LoadAwareLabeling:
+    """
+    Labels the workload once per load level while background connections replay workload queries. Labels of all levels
+    are stored together and the hint set that stays closest to the optimum on every level is chosen per query.
+    """
+
+    def __init__(self, settings: HeuristicLabelingSettings, load_levels: list[int], load_workload: Workload,
+                 load_timeout: float, ramp_up: float, seed: int):
+        if any(load_level < 0 for load_level in load_levels):
+            raise ValueError(f"Load levels must not be negative: {load_levels}")
+        self.settings = settings
+        self.load_levels = sorted(set(load_levels))
+        self.load_workload = load_workload
+        self.load_timeout = load_timeout
+        self.ramp_up = ramp_up
+        self.seed = seed
+
+    def label_load_level(self, load_level: int, append: bool) -> LoadLevelStatistics:
+        """
+        :param append: whether labels of previous load levels are already stored in the save path
+        """
+        # each level starts without experience of the others
+        labeling = Labeling(self.settings)
+        background_load = BackgroundLoad(self.settings.path_config.get_db_connection(self.settings.database_string),
+                                         self.load_workload, self.load_workload.query_names,
+                                         self.settings.hs_factory.default_hint_set(), load_level, self.load_timeout,
+                                         self.seed, self.settings.search_path)
+        t0 = time.time()
+        background_load.start(self.ramp_up)
+        try:
+            for query_index in trange(len(self.settings.workload.query_names), desc=f"Load Level {load_level}"):
+                query_name = self.settings.workload.query_names[query_index]
+                self.settings.logger.info(f"Evaluating query: {query_name} under {load_level} background connections")
+                rows = labeling.label_query_rows(query_name)
+                # only the rows of the new query are exported, afterwards they are not needed anymore
+                export_append = append or query_index > 0
+                labeling.results.to_dataframe(rows.start, rows.stop).assign(load_level=load_level).to_csv(
+                    self.settings.save_path, mode="a" if export_append else "w", header=not export_append,
+                    index=False)
+                labeling.results.clear()
+        finally:
+            background_load.stop()
+        statistics = LoadLevelStatistics(load_level, len(self.settings.workload.query_names), background_load.executed,
+                                         background_load.timeouts, background_load.failed_connections,
+                                         time.time() - t0)
+        if background_load.failed_connections > 0:
+            self.settings.logger.info(f"{background_load.failed_connections} of {load_level} background connections "
+                                      f"failed repeatedly and stopped early")
+        return statistics
+
+    def label_queries(self) -> list[RobustLabel]:
+        save_stem = self.settings.save_path[:-4]
+        level_statistics = list()
+        for level_index, load_level in enumerate(self.load_levels):
+            statistics = self.label_load_level(load_level, level_index > 0)
+            level_statistics.append(statistics)
+            self.settings.logger.info(f"Finished load level {load_level}: {statistics}")
+            pd.DataFrame([entry.__dict__ for entry in level_statistics]).to_csv(save_stem + "_load.csv", index=False)
+        robust_labels = get_robust_labels(pd.read_csv(self.settings.save_path))
+        pd.DataFrame([label.__dict__ for label in robust_labels]).to_csv(save_stem + "_robust.csv", index=False)
+        return robust_labels
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Label queries under synthetic background load of replayed workload "
+                                                 "queries and choose hint sets that are robust across load levels")
+    parser.add_argument("queries", help="Directory in which .sql-queries are located")
+    parser.add_argument("-o", "--output", required=True, help="Output csv save name")
+    parser.add_argument("-c", "--config", required=True, help="Path to config file.")
+    parser.add_argument("-db", "--database", required=True, choices=["imdb", "stack_overflow"], help="")
+    parser.add_argument("-ud", "--use-default", action="store_true", help="Whether or not to use default (six) hints.")
+    parser.add_argument("-ue", "--use-experience", action="store_true", help="Whether or not to use experience.")
+    parser.add_argument("-ues", "--use-early-stopping", action="store_true", help="Whether or not to use "
+                                                                                  "early stopping.")
+    parser.add_argument("-uhr", "--use-hint-removal", action="store_true", help="Whether or not to use hint removal.")
+    parser.add_argument("-ulr", "--use-level-restriction", action="store_true", help="Whether or not to use "
+                                                                                     "level restriction.")
+    parser.add_argument("-m", "--mode", default="sub", choices=["sub", "add", "both"],
+                        help="Which mode (adding/subtracting) of hints to use. This refers to enabling and disabling.")
+    parser.add_argument("-hl", "--hint-library", default=None, help="Optional: <path/to/library.json> of a reduced "
+                                                                    "hint library to use instead of the full one.")
+    parser.add_argument("-ll", "--load-levels", type=int, nargs="+", default=[0, 4],
+                        help="Numbers of background connections to label under.")
+    parser.add_argument("-lq", "--load-queries", default=None, help="Optional: directory of .sql-queries to replay. "
+                                                                    "Defaults to the labeled queries.")
+    parser.add_argument("-lto", "--load-timeout", type=float, default=10000.0, help="Timeout of replayed queries in "
+                                                                                     "ms.")
+    parser.add_argument("-ru", "--ramp-up", type=float, default=1.0, help="Seconds to wait for the background load "
+                                                                          "before labeling.")
+    parser.add_argument("-s", "--seed", type=int, default=47, help="Seed of the replayed query mix.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.queries):
+        raise ValueError(f"Invalid query path: {args.queries}.")
+    if os.path.exists(args.output):
+        raise ValueError(f"Save path: {args.output} already exists.")
+    if not os.path.exists(args.config):
+        raise ValueError(f"Invalid config path: {args.config}.")
+    if args.hint_library is not None and not os.path.exists(args.hint_library):
+        raise ValueError(f"Invalid hint library path: {args.hint_library}.")
+    if args.load_queries is not None and not os.path.exists(args.load_queries):
+        raise ValueError(f"Invalid load query path: {args.load_queries}.")
+
+    settings = HeuristicLabelingSettings(args.queries, args.output, args.config, args.database, False,
+                                         args.use_default, args.use_experience, args.use_early_stopping,
+                                         args.use_hint_removal, args.use_level_restriction, args.mode,
+                                         args.hint_library)
+    settings.dbc.disable_geqo()
+    settings.logger.info(f"\nRunning Load-Aware Labeling on:\n {settings.dbc.version()}.\n")
+
+    load_workload = settings.workload if args.load_queries is None else Workload(args.load_queries)
+    labeling = LoadAwareLabeling(settings, args.load_levels, load_workload, args.load_timeout, args.ramp_up, args.seed)
+    try:
+        labeling.label_queries()
+    except KeyboardInterrupt:
+        settings.dbc.close_connection()
+
+
+if __name__ == "__main__":
+    run()
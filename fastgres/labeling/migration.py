@@ -0,0 +1,206 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+
+from typing import Optional
+from tqdm import tqdm
+from fastgres.baseline.database_connection import DatabaseConnection
+from fastgres.baseline.log_utils import Logger, get_logger
+from fastgres.baseline.utility import ExplainNode
+from fastgres.definitions import PathConfig
+from fastgres.hinting import HintSet, HintLibrary, get_available_library
+from fastgres.labeling.archive import JsonArchive
+from fastgres.labeling.library_reduction import get_source_library
+from fastgres.workload.workload import Workload
+
+
+def remap_hint_set_int(hint_set_int: int, source_library: HintLibrary, target_library: HintLibrary) -> int:
+    """
+    Maps a hint set between two libraries by the database instructions of their hints. Hints that are unknown to the
+    source library are set to their default. Hints that are unknown to the target library are dropped.
+    :param hint_set_int: hint set integer in the source library
+    :param source_library: library the hint set integer was created with
+    :param target_library: library to map to
+    :return: hint set integer in the target library
+    """
+    source_hint_set = HintSet(hint_set_int, source_library)
+    values = {hint.database_instruction: source_hint_set.get(hint.index) for hint in source_library.get_hints()}
+    digits = list()
+    for hint in target_library.get_hints():
+        value = values.get(hint.database_instruction, hint.database_instruction_value)
+        if value not in hint.domain:
+            value = hint.database_instruction_value
+        digits.append(hint.domain.index(value))
+    return target_library.get_hint_set_int(digits)
+
+
+def read_archive_frame(archive_path: str) -> pd.DataFrame:
+    if archive_path.endswith(".json"):
+        archive_df = JsonArchive(archive_path).to_dataframe()
+    else:
+        archive_df = pd.read_csv(archive_path)
+    archive_df["hint_set_int"] = archive_df["hint_set_int"].astype(int)
+    return archive_df
+
+
+class MigrationSettings:
+
+    def __init__(self, query_path: str, archive_path: str, save_path: str, config_path: str, target_database: str,
+                 source_library: str, target_library: Optional[str], check_all_entries: bool):
+        self.query_path = query_path
+        self.archive_path = archive_path
+        self.save_path = save_path
+        self.config_path = config_path
+        self.check_all_entries = check_all_entries
+
+        self.workload = Workload(self.query_path)
+        self.path_config = PathConfig(self.config_path)
+        _ = Logger(self.path_config, f"{os.path.basename(self.save_path)[:-4]}.log")
+        self.logger = get_logger()
+        self.target_dbc = DatabaseConnection(self.path_config.get_db_connection(target_database), target_database)
+
+        self.source_library = get_source_library(source_library)
+        if target_library is None:
+            self.target_library = get_available_library(self.target_dbc.version(), False, False, False)
+        else:
+            self.target_library = get_source_library(target_library)
+
+
+class ArchiveMigration:
+    """
+    Moves labels between hint libraries, e.g., after a PostgreSQL upgrade. Mapped hint sets are only explained on the
+    new server, and those whose plan is no longer shared with the same labeled hint sets need to be measured again.
+    """
+
+    def __init__(self, settings: MigrationSettings):
+        self.settings = settings
+        self.source_default = self.settings.source_library.search_space_size - 1
+
+    def remap(self, archive_df: pd.DataFrame) -> pd.DataFrame:
+        source_ints = np.unique(archive_df["hint_set_int"])
+        mapping = {int(hint_set_int): remap_hint_set_int(int(hint_set_int), self.settings.source_library,
+                                                         self.settings.target_library)
+                   for hint_set_int in source_ints}
+        self.settings.logger.info(f"Mapped {len(mapping)} hint sets onto {len(set(mapping.values()))} hint sets")
+
+        migrated = archive_df.drop(columns=[name for name in self.settings.source_library.get_hint_names()
+                                            if name in archive_df.columns])
+        migrated = migrated.rename(columns={"hint_set_int": "source_hint_set_int"})
+        target_ints = migrated["source_hint_set_int"].map(mapping)
+        hint_names = self.settings.target_library.get_hint_names()
+        digits = np.array([self.settings.target_library.get_digits(hint_set_int)
+                           for hint_set_int in target_ints.to_list()]).reshape(-1, len(hint_names))
+        hint_columns = pd.DataFrame(digits, columns=hint_names, index=migrated.index)
+        migrated = pd.concat([migrated[["query_name"]], target_ints.rename("hint_set_int"), hint_columns,
+                              migrated.drop(columns=["query_name"])], axis=1)
+
+        # dropped hints can merge several hint sets, keep the optimal or fastest measurement
+        sort_columns = ["opt", "time"] if "opt" in migrated.columns else ["time"]
+        ascending = [False, True] if "opt" in migrated.columns else [True]
+        migrated = migrated.sort_values(sort_columns, ascending=ascending, kind="stable")
+        migrated = migrated.drop_duplicates(subset=["query_name", "hint_set_int"], keep="first")
+        return migrated.sort_index()
+
+    def get_entries_to_check(self, migrated: pd.DataFrame) -> pd.Series:
+        if self.settings.check_all_entries:
+            return pd.Series(True, index=migrated.index)
+        labels = migrated["source_hint_set_int"] == self.source_default
+        if "opt" in migrated.columns:
+            labels |= migrated["opt"].astype(bool)
+        return labels
+
+    @staticmethod
+    def get_archived_plan_keys(query_entries: pd.DataFrame) -> list:
+        """
+        :return: key per entry that is equal for entries that shared a plan when they were labeled. Archives without
+        fingerprints fall back to equal measured times, which are copied between hint sets of the same plan.
+        """
+        keys = list()
+        for index, entry in query_entries.iterrows():
+            fingerprint = entry.get("plan_fingerprint", None)
+            if isinstance(fingerprint, str):
+                keys.append(("plan", fingerprint))
+            elif "time" in entry and not bool(entry.get("timeout", False)):
+                keys.append(("time", entry["time"]))
+            else:
+                keys.append(("entry", index))
+        return keys
+
+    def flag_plan_changes(self, migrated: pd.DataFrame) -> pd.DataFrame:
+        """
+        Explains the mapped hint sets of each checked query and its new default on the target server. Plans are only
+        compared within the new version, since explain output differs between versions. An entry keeps its measurement
+        if it shares its new plan with exactly the checked hint sets it shared its archived plan with, and if it does
+        not newly share the plan of the default.
+        :param migrated: remapped archive entries
+        :return: entries with a needs_measurement column. Unchecked entries are always flagged since their plans are
+        unverified.
+        """
+        to_check = self.get_entries_to_check(migrated)
+        needs_measurement = pd.Series(True, index=migrated.index)
+        checked = migrated[to_check]
+        target_default = self.settings.target_library.search_space_size - 1
+        for query_name, query_entries in tqdm(checked.groupby("query_name"), desc="Comparing Plans"):
+            query = self.settings.workload.read_query(query_name)
+            target_ints = [int(target_int) for target_int in query_entries["hint_set_int"]]
+            new_keys = [ExplainNode(self.settings.target_dbc.explain_query(
+                query, HintSet(target_int, self.settings.target_library))).fingerprint for target_int in target_ints]
+            default_key = new_keys[target_ints.index(target_default)] if target_default in target_ints else \
+                ExplainNode(self.settings.target_dbc.explain_query(
+                    query, HintSet(target_default, self.settings.target_library))).fingerprint
+            old_keys = self.get_archived_plan_keys(query_entries)
+            for idx, index in enumerate(query_entries.index):
+                old_group = {target_ints[i] for i in range(len(target_ints)) if old_keys[i] == old_keys[idx]}
+                new_group = {target_ints[i] for i in range(len(target_ints)) if new_keys[i] == new_keys[idx]}
+                # without an archived default, a label that now plans like the default lost its difference to it
+                collapsed = target_default not in target_ints and target_ints[idx] != target_default and \
+                    new_keys[idx] == default_key
+                needs_measurement[index] = old_group != new_group or collapsed
+        self.settings.logger.info(f"{int(needs_measurement[to_check].sum())} / {int(to_check.sum())} checked entries "
+                                  f"changed their plans")
+        migrated["needs_measurement"] = needs_measurement
+        return migrated
+
+    def migrate(self) -> pd.DataFrame:
+        archive_df = read_archive_frame(self.settings.archive_path)
+        migrated = self.remap(archive_df)
+        return self.flag_plan_changes(migrated)
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Migrate labels between hint libraries of different PostgreSQL "
+                                                 "versions and flag entries whose plans changed")
+    parser.add_argument("queries", help="Directory in which .sql-queries are located")
+    parser.add_argument("-a", "--archive", required=True, help="<Path/to/archive.csv> or legacy json archive.")
+    parser.add_argument("-o", "--output", required=True, help="Output csv save name")
+    parser.add_argument("-c", "--config", required=True, help="Path to config file.")
+    parser.add_argument("-tdb", "--target-database", required=True, help="Config key of the new server.")
+    parser.add_argument("-sl", "--source-library", required=True,
+                        help="Library of the archive: default, a PostgreSQL version like 12, or a path to a library.")
+    parser.add_argument("-tl", "--target-library", default=None,
+                        help="Optional: library to migrate to. Defaults to the full library of the target server.")
+    parser.add_argument("-all", "--all-entries", action="store_true",
+                        help="Compare plans of all entries instead of only optimal and default hint sets.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.queries):
+        raise ValueError(f"Invalid query path: {args.queries}.")
+    if not os.path.exists(args.archive):
+        raise ValueError(f"Invalid archive path: {args.archive}.")
+    if os.path.exists(args.output):
+        raise ValueError(f"Save path: {args.output} already exists.")
+    if not os.path.exists(args.config):
+        raise ValueError(f"Invalid config path: {args.config}.")
+
+    settings = MigrationSettings(args.queries, args.archive, args.output, args.config, args.target_database,
+                                 args.source_library, args.target_library, args.all_entries)
+    settings.target_dbc.disable_geqo()
+    settings.logger.info(f"Migrating to {settings.target_dbc.version()}")
+
+    migrated = ArchiveMigration(settings).migrate()
+    migrated.to_csv(settings.save_path, index=False)
+
+
+if __name__ == "__main__":
+    run()
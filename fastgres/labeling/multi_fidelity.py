@@ -0,0 +1,240 @@
+import argparse
+import dataclasses
+import os
+import time
+import numpy as np
+import pandas as pd
+
+from typing import Optional
+from tqdm import trange
+from fastgres.baseline.database_connection import DatabaseConnection
+from fastgres.baseline.utility import ExplainNode
+from fastgres.labeling.heuristic_labeling import HeuristicLabelingSettings, Labeling, LabelingResult
+
+
+@dataclasses.dataclass
+class RankAgreement:
+    query_name: str
+    shortlist_size: int
+    spearman: Optional[float]
+    top_1_match: bool
+    replica_opt: int
+    full_opt: int
+    replica_opt_time: float
+    full_opt_time: float
+
+
+def build_sampled_replica(dbc: DatabaseConnection, schema: str, sample_percent: float, seed: int) -> None:
+    """
+    Copies a Bernoulli sample of every public table into the given schema and recreates the public indexes on it.
+    Connections using the schema as search path then plan and execute queries against the sample.
+    :param dbc: connection to the full database
+    :param schema: schema of the replica, existing tables in it are replaced
+    :param sample_percent: percentage of rows to keep per table
+    :param seed: seed of the repeatable sample
+    """
+    if not 0.0 < sample_percent <= 100.0:
+        raise ValueError(f"Sample percentage: {sample_percent} is not in (0, 100]")
+    tables = dbc.tables
+    dbc.cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {schema};")
+    for table in tables:
+        dbc.cursor.execute(f"DROP TABLE IF EXISTS {schema}.{table};")
+        dbc.cursor.execute(f"CREATE TABLE {schema}.{table} AS SELECT * FROM public.{table} "
+                           f"TABLESAMPLE BERNOULLI ({sample_percent}) REPEATABLE ({seed});")
+    dbc.cursor.execute("SELECT indexdef FROM pg_indexes WHERE schemaname = 'public';")
+    index_definitions = [row[0] for row in dbc.cursor.fetchall()]
+    for index_definition in index_definitions:
+        dbc.cursor.execute(index_definition.replace(" ON public.", f" ON {schema}.", 1) + ";")
+    for table in tables:
+        dbc.cursor.execute(f"ANALYZE {schema}.{table};")
+    dbc.close_cursor()
+
+
+def spearman_correlation(x: list[float], y: list[float]) -> Optional[float]:
+    if len(x) < 2:
+        return None
+    x_ranks, y_ranks = pd.Series(x).rank().to_numpy(), pd.Series(y).rank().to_numpy()
+    if np.std(x_ranks) == 0.0 or np.std(y_ranks) == 0.0:
+        return None
+    return float(np.corrcoef(x_ranks, y_ranks)[0, 1])
+
+
+class MultiFidelityLabeling:
+    """
+    Runs the heuristic search on a sampled replica and only executes a shortlist of the fastest distinct replica plans
+    on the full database. The rank agreement of both executions tells whether the replica can be trusted.
+    """
+
+    def __init__(self, settings: HeuristicLabelingSettings, shortlist_size: int):
+        if settings.search_path is None:
+            raise ValueError("Multi-fidelity labeling needs the replica schema as search path")
+        self.settings = settings
+        self.shortlist_size = shortlist_size
+        self.labeling = Labeling(settings)
+        self.full_dbc = DatabaseConnection(self.settings.path_config.get_db_connection(self.settings.database_string),
+                                           f"{self.settings.database_string}_full")
+        self.default_hint_set_int = self.settings.hs_factory.default_hint_set().hint_set_int
+
+    def get_shortlist(self, replica_results: pd.DataFrame) -> list[int]:
+        """
+        :param replica_results: results of the replica search in the column layout of LabelingResult.to_dict
+        :return: the default and the fastest hint sets of distinct replica plans, fastest first
+        """
+        finished = replica_results[~replica_results["timeout"]].sort_values("time", kind="stable")
+        shortlist = list()
+        fingerprints = set()
+        for hint_set_int, plan_fingerprint in zip(finished["hint_set_int"], finished["plan_fingerprint"]):
+            if len(shortlist) >= self.shortlist_size:
+                break
+            if plan_fingerprint in fingerprints:
+                continue
+            fingerprints.add(plan_fingerprint)
+            shortlist.append(int(hint_set_int))
+        if self.default_hint_set_int not in shortlist:
+            shortlist.append(self.default_hint_set_int)
+        return shortlist
+
+    def label_query(self, query_name: str) -> tuple[range, list[LabelingResult], RankAgreement]:
+        """
+        :return: rows of the replica search in the result buffer, results on the full database, and their agreement
+        """
+        rows = self.labeling.label_query_rows(query_name)
+        replica_results = self.labeling.results.to_dataframe(rows.start, rows.stop)
+        replica_times = dict(zip(replica_results["hint_set_int"].tolist(), replica_results["time"].tolist()))
+        replica_levels = dict(zip(replica_results["hint_set_int"].tolist(), replica_results["level"].tolist()))
+        shortlist = self.get_shortlist(replica_results)
+        query = self.settings.workload.read_query(query_name)
+        hint_names = self.settings.hs_factory.hint_library.get_hint_names()
+
+        # the default is executed first to obtain a timeout for the shortlist
+        execution_order = [self.default_hint_set_int] + [hint_set_int for hint_set_int in shortlist
+                                                         if hint_set_int != self.default_hint_set_int]
+        seen_plans = dict()
+        best_time = None
+        full_results = list()
+        for hint_set_int in execution_order:
+            hint_set = self.settings.hs_factory.hint_set(hint_set_int)
+            plan = ExplainNode(self.full_dbc.explain_query(query, hint_set))
+            seen_plan = plan in seen_plans
+            if seen_plan:
+                q_result = seen_plans[plan]
+            else:
+                timeout = self.labeling.base_timeout if best_time is None else self.settings.get_timeout(best_time)
+                self.settings.logger.info(f"Evaluating shortlisted Hint Set: {hint_set_int} on the full database")
+                q_result = self.full_dbc.evaluate_hinted_query(query, hint_set, timeout=timeout)
+                seen_plans[plan] = q_result
+            if not q_result.timed_out and (best_time is None or q_result.time < best_time):
+                best_time = q_result.time
+            level = replica_levels.get(hint_set_int, 0)
+            full_results.append(LabelingResult(
+                query_name=query_name, hint_set_int=hint_set_int, binary_rep=hint_set.get_digits(),
+                measured_time=q_result.time, occurred_level=level, is_opt=False, had_timeout=q_result.timed_out,
+                chosen_in_level=False, removed=False, seen_plan=seen_plan, hint_names=hint_names,
+                plan_fingerprint=plan.fingerprint
+            ))
+        full_opt = min(full_results, key=lambda result: (result.measured_time, result.had_timeout))
+        full_opt.is_opt = True
+        full_opt.chosen_in_level = True
+
+        replica_opt = self.labeling.get_opt_row(rows)
+        replica_opt_int = self.labeling.results.get(replica_opt, "hint_set_int")
+        # the default is not part of the replica search when adding hints
+        compared = [result for result in full_results if result.hint_set_int in replica_times]
+        agreement = RankAgreement(
+            query_name=query_name, shortlist_size=len(full_results),
+            spearman=spearman_correlation([replica_times[result.hint_set_int] for result in compared],
+                                          [result.measured_time for result in compared]),
+            top_1_match=replica_opt_int == full_opt.hint_set_int, replica_opt=replica_opt_int,
+            full_opt=full_opt.hint_set_int, replica_opt_time=self.labeling.results.get(replica_opt, "time"),
+            full_opt_time=full_opt.measured_time
+        )
+        return rows, full_results, agreement
+
+    def label_queries(self) -> list[RankAgreement]:
+        agreements = list()
+        save_stem = self.settings.save_path[:-4]
+        t0 = time.time()
+        for query_index in trange(len(self.settings.workload.query_names)):
+            query_name = self.settings.workload.query_names[query_index]
+            self.settings.logger.info('Evaluating query: {}, {} / {}'.format(query_name, query_index + 1,
+                                                                             len(self.settings.workload.query_names)))
+            rows, query_full_results, agreement = self.label_query(query_name)
+            agreements.append(agreement)
+            # only the results of the new query are exported
+            pd.DataFrame([result.to_dict() for result in query_full_results]).to_csv(
+                self.settings.save_path, mode="a" if query_index > 0 else "w", header=query_index == 0, index=False)
+            self.labeling.results.to_csv(save_stem + "_replica.csv", rows.start, rows.stop, append=query_index > 0)
+            self.labeling.results.clear()
+            pd.DataFrame([agreement.__dict__ for agreement in agreements]).to_csv(save_stem + "_agreement.csv",
+                                                                                  index=False)
+        t1 = time.time() - t0
+        correlations = [agreement.spearman for agreement in agreements if agreement.spearman is not None]
+        self.settings.logger.info(f"Finished labeling {len(agreements)} queries in {int(t1 / 60)}min {int(t1 % 60)}s "
+                                  f"with a mean rank correlation of "
+                                  f"{round(float(np.mean(correlations)), 4) if correlations else None} and "
+                                  f"{sum(agreement.top_1_match for agreement in agreements)} matching optima")
+        return agreements
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Label queries on a sampled replica and verify a shortlist of hint "
+                                                 "sets on the full database")
+    parser.add_argument("queries", help="Directory in which .sql-queries are located")
+    parser.add_argument("-o", "--output", required=True, help="Output csv save name of the full database labels")
+    parser.add_argument("-c", "--config", required=True, help="Path to config file.")
+    parser.add_argument("-db", "--database", required=True, choices=["imdb", "stack_overflow"], help="")
+    parser.add_argument("-ud", "--use-default", action="store_true", help="Whether or not to use default (six) hints.")
+    parser.add_argument("-ue", "--use-experience", action="store_true", help="Whether or not to use experience.")
+    parser.add_argument("-ues", "--use-early-stopping", action="store_true", help="Whether or not to use "
+                                                                                  "early stopping.")
+    parser.add_argument("-uhr", "--use-hint-removal", action="store_true", help="Whether or not to use hint removal.")
+    parser.add_argument("-ulr", "--use-level-restriction", action="store_true", help="Whether or not to use "
+                                                                                     "level restriction.")
+    parser.add_argument("-m", "--mode", default="sub", choices=["sub", "add", "both"],
+                        help="Which mode (adding/subtracting) of hints to use. This refers to enabling and disabling.")
+    parser.add_argument("-hl", "--hint-library", default=None, help="Optional: <path/to/library.json> of a reduced "
+                                                                    "hint library to use instead of the full one.")
+    parser.add_argument("-rs", "--replica-schema", default="fastgres_sample", help="Schema of the sampled replica.")
+    parser.add_argument("-br", "--build-replica", action="store_true",
+                        help="Whether or not to (re)build the replica schema before labeling.")
+    parser.add_argument("-sp", "--sample-percent", type=float, default=1.0, help="Percentage of rows per table "
+                                                                                 "copied to the replica.")
+    parser.add_argument("-s", "--seed", type=int, default=47, help="Seed of the replica sample.")
+    parser.add_argument("-k", "--shortlist-size", type=int, default=5, help="Number of distinct replica plans "
+                                                                            "executed on the full database.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.queries):
+        raise ValueError(f"Invalid query path: {args.queries}.")
+    if os.path.exists(args.output):
+        raise ValueError(f"Save path: {args.output} already exists.")
+    if not os.path.exists(args.config):
+        raise ValueError(f"Invalid config path: {args.config}.")
+    if args.hint_library is not None and not os.path.exists(args.hint_library):
+        raise ValueError(f"Invalid hint library path: {args.hint_library}.")
+    if args.shortlist_size < 1:
+        raise ValueError(f"Shortlist size: {args.shortlist_size} is smaller than one.")
+
+    settings = HeuristicLabelingSettings(args.queries, args.output, args.config, args.database, False,
+                                         args.use_default, args.use_experience, args.use_early_stopping,
+                                         args.use_hint_removal, args.use_level_restriction, args.mode,
+                                         args.hint_library, search_path=f"{args.replica_schema},public")
+    labeling = MultiFidelityLabeling(settings, args.shortlist_size)
+    if args.build_replica:
+        t0 = time.time()
+        build_sampled_replica(labeling.full_dbc, args.replica_schema, args.sample_percent, args.seed)
+        settings.logger.info(f"Built {args.sample_percent}% replica in schema: {args.replica_schema} in "
+                             f"{round(time.time() - t0, 2)}s")
+    settings.dbc.disable_geqo()
+    labeling.full_dbc.disable_geqo()
+    settings.logger.info(f"\nRunning Multi-Fidelity Labeling on:\n {settings.dbc.version()}.\n")
+
+    try:
+        labeling.label_queries()
+    except KeyboardInterrupt:
+        settings.dbc.close_connection()
+        labeling.full_dbc.close_connection()
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+
+from typing import Optional
+from fastgres.hinting import HintLibrary
+
+
+RESULT_DTYPE = np.dtype([
+    ("query", np.int32),
+    ("hint_set_int", np.int64),
+    ("time", np.float64),
+    ("level", np.int16),
+    ("opt", np.bool_),
+    ("timeout", np.bool_),
+    ("chosen", np.bool_),
+    ("removed", np.bool_),
+    ("seen_plan", np.bool_),
+    # index into the interned fingerprints, -1 if unknown
+    ("plan_fingerprint", np.int32),
+])
+
+
+class ResultBuffer:
+    """
+    Growable structured array of labeling results. Query names and plan fingerprints are interned and hint sets are
+    only stored as their integer, per hint columns are derived when exporting.
+    """
+
+    def __init__(self, hint_library: HintLibrary, capacity: int = 1024):
+        self.hint_library = hint_library
+        self._rows = np.zeros(max(capacity, 1), dtype=RESULT_DTYPE)
+        self._size = 0
+        self.query_names = list()
+        self._query_ids = dict()
+        self.fingerprints = list()
+        self._fingerprint_ids = dict()
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def rows(self) -> np.ndarray:
+        return self._rows[:self._size]
+
+    @staticmethod
+    def _intern(values: list, ids: dict, value) -> int:
+        try:
+            return ids[value]
+        except KeyError:
+            ids[value] = len(values)
+            values.append(value)
+            return ids[value]
+
+    def append(self, query_name: str, hint_set_int: int, time: float, level: int, timed_out: bool, seen_plan: bool,
+               plan_fingerprint: Optional[str] = None, chosen: bool = False, removed: bool = False) -> int:
+        """
+        :return: row index of the appended result
+        """
+        if self._size == len(self._rows):
+            grown = np.zeros(2 * len(self._rows), dtype=RESULT_DTYPE)
+            grown[:self._size] = self._rows
+            self._rows = grown
+        row = self._size
+        fingerprint_id = -1 if plan_fingerprint is None \
+            else self._intern(self.fingerprints, self._fingerprint_ids, plan_fingerprint)
+        self._rows[row] = (self._intern(self.query_names, self._query_ids, query_name), hint_set_int, time, level,
+                           False, timed_out, chosen, removed, seen_plan, fingerprint_id)
+        self._size += 1
+        return row
+
+    def clear(self) -> None:
+        """
+        Drops all rows and interned values but keeps the allocated capacity.
+        """
+        self._size = 0
+        self.query_names, self._query_ids = list(), dict()
+        self.fingerprints, self._fingerprint_ids = list(), dict()
+
+    def get(self, row: int, column: str):
+        return self._rows[column][row].item()
+
+    def set(self, row: int, column: str, value) -> None:
+        self._rows[column][row] = value
+
+    def get_query_name(self, row: int) -> str:
+        return self.query_names[self._rows["query"][row]]
+
+    def get_plan_fingerprint(self, row: int) -> Optional[str]:
+        fingerprint_id = self._rows["plan_fingerprint"][row]
+        return None if fingerprint_id < 0 else self.fingerprints[fingerprint_id]
+
+    def get_digits(self, hint_set_ints: np.ndarray) -> np.ndarray:
+        """
+        :return: mixed radix digits with one column per hint, equal to HintSet.get_digits row-wise
+        """
+        digits = np.empty((len(hint_set_ints), len(self.hint_library.radices)), dtype=np.int64)
+        for idx, (radix, value) in enumerate(zip(self.hint_library.radices, self.hint_library.get_values())):
+            digits[:, idx] = (hint_set_ints // value) % radix
+        return digits
+
+    def to_dataframe(self, start: int = 0, stop: Optional[int] = None) -> pd.DataFrame:
+        """
+        :return: results of the given rows in the column layout of LabelingResult.to_dict
+        """
+        rows = self.rows[start:stop]
+        columns = {"query_name": np.asarray(self.query_names, dtype=object)[rows["query"]]
+                   if self.query_names else np.empty(0, dtype=object),
+                   "hint_set_int": rows["hint_set_int"]}
+        digits = self.get_digits(rows["hint_set_int"])
+        for idx, hint_name in enumerate(self.hint_library.get_hint_names()):
+            columns[hint_name] = digits[:, idx]
+        columns["time"] = rows["time"]
+        columns["level"] = rows["level"]
+        for column in ["opt", "timeout", "chosen", "removed", "seen_plan"]:
+            columns[column] = rows[column]
+        fingerprints = np.asarray(self.fingerprints + [None], dtype=object)
+        # -1 selects the trailing None
+        columns["plan_fingerprint"] = fingerprints[rows["plan_fingerprint"]]
+        return pd.DataFrame(columns)
+
+    def to_csv(self, path: str, start: int = 0, stop: Optional[int] = None, append: bool = False) -> None:
+        self.to_dataframe(start, stop).to_csv(path, index=False, mode="a" if append else "w", header=not append)
@@ -0,0 +1,124 @@
+import abc
+import numpy as np
+
+from typing import Optional
+from sklearn.neighbors import KDTree
+from fastgres.labeling.archive import DataframeArchive
+from fastgres.model.context import Context
+from fastgres.model.model import load_models, predict_top_k
+from fastgres.query_encoding.encoded_query import EncodedQuery
+from fastgres.query_encoding.feature_extractor import EncodingInformation
+from fastgres.query_encoding.query import Query
+from fastgres.workload.workload import Workload
+
+
+class Seeder(abc.ABC):
+    """
+    Proposes hint sets that are evaluated as additional starting points before the neighborhood search of a query.
+    """
+
+    @abc.abstractmethod
+    def get_seeds(self, query_name: str) -> list[int]:
+        """
+        :param query_name: query to label
+        :return: hint set integers ordered by how promising they are
+        """
+        raise NotImplementedError
+
+    def observe(self, query_name: str, hint_set_int: int) -> None:
+        """
+        Called with the optimal hint set of each labeled query.
+        """
+        return
+
+
+class ModelSeeder(Seeder):
+    """
+    Asks trained FASTgres context models, as saved by evaluate_workload_simple.py, for their top predicted hint sets.
+    """
+
+    def __init__(self, model_path: str, workload: Workload, encoding_info: EncodingInformation, seed_count: int = 3):
+        self.context_models = load_models(model_path)
+        self.workload = workload
+        self.encoding_info = encoding_info
+        self.seed_count = seed_count
+
+    def get_context(self, table_set: frozenset) -> Optional[Context]:
+        """
+        :param table_set: tables of the query
+        :return: context the query was trained in, else the smallest context whose tables encompass the query
+        """
+        for context in self.context_models:
+            if table_set in context.covered_contexts:
+                return context
+        encompassing = [context for context in self.context_models if table_set.issubset(context.total_tables)]
+        if not encompassing:
+            return None
+        return min(encompassing, key=lambda context: len(context.total_tables))
+
+    def get_seeds(self, query_name: str) -> list[int]:
+        query = Query.from_workload(query_name, self.workload)
+        context = self.get_context(query.context)
+        if context is None:
+            return list()
+        features = EncodedQuery(context, query, self.encoding_info).encoded_query
+        return predict_top_k(self.context_models[context], features, self.seed_count)
+
+
+class NeighborSeeder(Seeder):
+    """
+    Proposes the optimal hint sets of the most similar already labeled queries. Queries are grouped into one context
+    per table set, each indexed by a KD-tree over their encodings. Queries labeled during the run are added online.
+    """
+
+    def __init__(self, workload: Workload, encoding_info: EncodingInformation, archive_path: Optional[str] = None,
+                 neighbor_count: int = 3):
+        self.workload = workload
+        self.encoding_info = encoding_info
+        self.neighbor_count = neighbor_count
+
+        # table set -> context, encoded queries, and optimal hint sets
+        self.contexts = dict()
+        self.features = dict()
+        self.labels = dict()
+        self._trees = dict()
+        self._encoded = dict()
+
+        if archive_path is not None:
+            archive = DataframeArchive(archive_path)
+            known_queries = set(self.workload.query_names)
+            for query_name in np.unique(archive.archive["query_name"]):
+                if query_name in known_queries:
+                    self.observe(query_name, int(archive.get_opt(query_name)))
+
+    def _encode(self, query_name: str) -> tuple[frozenset, list]:
+        try:
+            return self._encoded[query_name]
+        except KeyError:
+            query = Query.from_workload(query_name, self.workload)
+            if query.context not in self.contexts:
+                self.contexts[query.context] = Context(query.context)
+            encoded_query = EncodedQuery(self.contexts[query.context], query, self.encoding_info).encoded_query
+            self._encoded[query_name] = (query.context, encoded_query)
+        return self._encoded[query_name]
+
+    def observe(self, query_name: str, hint_set_int: int) -> None:
+        table_set, encoded_query = self._encode(query_name)
+        try:
+            self.features[table_set].append(encoded_query)
+            self.labels[table_set].append(hint_set_int)
+        except KeyError:
+            self.features[table_set] = [encoded_query]
+            self.labels[table_set] = [hint_set_int]
+        # rebuilt on the next lookup
+        self._trees.pop(table_set, None)
+
+    def get_seeds(self, query_name: str) -> list[int]:
+        table_set, encoded_query = self._encode(query_name)
+        if table_set not in self.features:
+            return list()
+        if table_set not in self._trees:
+            self._trees[table_set] = KDTree(np.array(self.features[table_set], dtype=float))
+        neighbor_count = min(self.neighbor_count, len(self.labels[table_set]))
+        _, indices = self._trees[table_set].query(np.reshape(encoded_query, (1, -1)), k=neighbor_count)
+        return [self.labels[table_set][idx] for idx in indices[0]]
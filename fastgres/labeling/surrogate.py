@@ -0,0 +1,157 @@
+import dataclasses
+import math
+import numpy as np
+
+from typing import Optional
+from fastgres.baseline.utility import ExplainNode
+
+
+# keys of analyzed plans that plain EXPLAIN lacks but that enter the plan fingerprint
+ANALYZE_ONLY_KEYS = {"Workers Launched"}
+
+
+def is_blocking(node: ExplainNode) -> bool:
+    """
+    :return: whether the node reads its whole input exactly once before returning its first row
+    """
+    return len(node.children) == 1 and (node.node_type == "Sort" or (
+        node.node_type == "Aggregate" and node.explain_data.get("Strategy", None) in ("Plain", "Hashed")))
+
+
+def strip_analyze_keys(plan: dict) -> dict:
+    stripped = {key: value for key, value in plan.items() if key not in ANALYZE_ONLY_KEYS}
+    if "Plans" in plan:
+        stripped["Plans"] = [strip_analyze_keys(child) for child in plan["Plans"]]
+    return stripped
+
+
+@dataclasses.dataclass
+class SkippedCandidate:
+    query_name: str
+    hint_set_int: int
+    level: int
+    incumbent_time: float
+    predicted_time: Optional[float]
+    lower_bound: Optional[float]
+    plan_fingerprint: str
+
+
+class PlanSurrogate:
+    """
+    Per-query runtime model fitted on the plans that were already executed for a query. Log runtimes are regressed on
+    node type counts and log estimated costs and rows. Times of analyzed executions are remembered by the fingerprint of
+    the plan and of subtrees below blocking sorts and aggregates only. Such subtrees run to completion exactly once, so
+    their time is a lower bound for any plan that contains them below blocking nodes as well. Elsewhere, a subtree may
+    run more often, partially, or not at all, depending on its parent.
+    """
+
+    def __init__(self, min_observations: int = 5, confidence: float = 2.0, regularization: float = 1.0,
+                 min_std: float = 0.25):
+        """
+        :param min_observations: executed plans needed before the regression is used
+        :param confidence: standard deviations of the residuals the prediction has to exceed the incumbent by
+        :param regularization: ridge penalty of the regression
+        :param min_std: lower bound of the residual deviation, few observations are easily overfitted
+        """
+        self.min_observations = min_observations
+        self.confidence = confidence
+        self.regularization = regularization
+        self.min_std = min_std
+
+        self.observed_features = list()
+        self.log_times = list()
+        # vocabulary, weights, and residual deviation, refitted after new observations
+        self._fit = None
+        # subtree fingerprint -> actual total time in ms
+        self.subtree_times = dict()
+
+    @staticmethod
+    def get_features(plan: ExplainNode) -> dict[str, float]:
+        features = {"bias": 1.0, "log_cost": math.log1p(max(plan.cost, 0.0)),
+                    "log_rows": math.log1p(max(plan.cardinality_estimate, 0.0))}
+        nodes = [plan]
+        while nodes:
+            node = nodes.pop()
+            features[f"count:{node.node_type}"] = features.get(f"count:{node.node_type}", 0.0) + 1.0
+            features[f"log_cost:{node.node_type}"] = features.get(f"log_cost:{node.node_type}", 0.0) \
+                + math.log1p(max(node.cost, 0.0))
+            nodes.extend(node.children)
+        # explain output lacks some values for some node types
+        return {key: 0.0 if math.isnan(value) else value for key, value in features.items()}
+
+    def get_lower_bound(self, plan: ExplainNode) -> Optional[float]:
+        lower_bound = None
+        node = plan
+        while node is not None:
+            if node.fingerprint in self.subtree_times:
+                subtree_time = self.subtree_times[node.fingerprint]
+                lower_bound = subtree_time if lower_bound is None else max(lower_bound, subtree_time)
+            node = node.children[0] if is_blocking(node) else None
+        return lower_bound
+
+    def observe(self, plan: ExplainNode, measured_time: float, timed_out: bool,
+                analyzed_plan: Optional[dict] = None) -> None:
+        """
+        :param plan: estimated plan of the executed hint set
+        :param measured_time: runtime in ms
+        :param timed_out: timed out runtimes are censored and not used for fitting
+        :param analyzed_plan: plan of an EXPLAIN ANALYZE execution, if available
+        """
+        if not timed_out and measured_time > 0.0:
+            self.observed_features.append(self.get_features(plan))
+            self.log_times.append(math.log(measured_time))
+            self._fit = None
+        if analyzed_plan:
+            # fingerprints have to match those of the estimated plans that are checked against them
+            node = ExplainNode(strip_analyze_keys(analyzed_plan["Plan"]))
+            while node is not None and node.loops == 1:
+                if not math.isnan(node.execution_time):
+                    # actual times are in seconds
+                    self.subtree_times[node.fingerprint] = node.execution_time * 1_000
+                node = node.children[0] if is_blocking(node) else None
+
+    def fit(self) -> bool:
+        """
+        Solves the regression unless it is fitted on the current observations already.
+        :return: whether enough plans were observed for a fit
+        """
+        if len(self.log_times) < self.min_observations:
+            return False
+        if self._fit is None:
+            vocabulary = sorted(set().union(*self.observed_features))
+            x = np.array([[features.get(key, 0.0) for key in vocabulary] for features in self.observed_features])
+            y = np.array(self.log_times)
+            weights = np.linalg.solve(x.T @ x + self.regularization * np.eye(len(vocabulary)), x.T @ y)
+            residual_std = max(self.min_std, float(np.std(y - x @ weights)))
+            self._fit = vocabulary, weights, residual_std
+        return True
+
+    def predict(self, plan: ExplainNode) -> Optional[tuple[float, float]]:
+        """
+        :return: predicted log runtime and standard deviation of the residuals, None if too few plans were observed
+        """
+        if not self.fit():
+            return None
+        vocabulary, weights, residual_std = self._fit
+        candidate_features = self.get_features(plan)
+        prediction = float(np.array([candidate_features.get(key, 0.0) for key in vocabulary]) @ weights)
+        return prediction, residual_std
+
+    def is_dominated(self, plan: ExplainNode, incumbent_time: float) -> tuple[bool, Optional[float], Optional[float]]:
+        """
+        :param plan: estimated plan of a candidate hint set
+        :param incumbent_time: best time of the query so far in ms
+        :return: whether the candidate very likely loses against the incumbent, its predicted runtime and lower bound
+        """
+        if incumbent_time <= 0.0:
+            return False, None, None
+        lower_bound = self.get_lower_bound(plan)
+        prediction = self.predict(plan)
+        predicted_time = None if prediction is None else math.exp(prediction[0])
+        if lower_bound is not None and lower_bound >= incumbent_time:
+            return True, predicted_time, lower_bound
+        if prediction is not None:
+            log_prediction, residual_std = prediction
+            if log_prediction - self.confidence * residual_std > math.log(incumbent_time):
+                return True, predicted_time, lower_bound
+        return False, predicted_time, lower_bound
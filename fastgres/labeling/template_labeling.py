@@ -0,0 +1,157 @@
+import argparse
+import dataclasses
+import os
+import time
+import numpy as np
+import pandas as pd
+
+from typing import Optional
+from tqdm import tqdm
+from fastgres.labeling.heuristic_labeling import HeuristicLabelingSettings, Labeling
+from fastgres.workload.templates import TemplateIndex
+
+
+@dataclasses.dataclass
+class TemplateAssignment:
+    query_name: str
+    template: str
+    role: str
+    source_query: Optional[str] = None
+
+
+class TemplateLabeling:
+    """
+    Labels only representatives of each query template in full. Other members of a template execute their default
+    and the top hint sets of the representatives, while exact duplicates copy the labels of their first occurrence.
+    """
+
+    REPRESENTATIVE = "representative"
+    MEMBER = "member"
+    DUPLICATE = "duplicate"
+
+    def __init__(self, settings: HeuristicLabelingSettings, representatives: int, top_k: int):
+        if representatives < 1:
+            raise ValueError(f"At least one representative per template is needed, got: {representatives}")
+        self.settings = settings
+        self.representatives = representatives
+        self.top_k = top_k
+        self.labeling = Labeling(settings)
+        self.template_index = TemplateIndex(self.settings.workload)
+        self.default_hint_set_int = self.settings.hs_factory.default_hint_set().hint_set_int
+
+    def get_representatives(self, members: list[str]) -> list[str]:
+        # evenly spread over the sorted members to cover varying literals
+        indices = np.unique(np.linspace(0, len(members) - 1, min(self.representatives, len(members))).astype(int))
+        return [members[idx] for idx in indices]
+
+    def get_candidates(self, representative_results: pd.DataFrame) -> list[int]:
+        """
+        :param representative_results: results of the representatives in the column layout of LabelingResult.to_dict
+        :return: the default and the fastest finished hint sets of the representatives with distinct plans
+        """
+        finished = representative_results[~representative_results["timeout"]].sort_values("time", kind="stable")
+        candidates = [self.default_hint_set_int]
+        fingerprints = set()
+        for hint_set_int, plan_fingerprint in zip(finished["hint_set_int"], finished["plan_fingerprint"]):
+            if len(candidates) > self.top_k:
+                break
+            if int(hint_set_int) in candidates or plan_fingerprint in fingerprints:
+                continue
+            fingerprints.add(plan_fingerprint)
+            candidates.append(int(hint_set_int))
+        return candidates
+
+    def label_queries(self) -> list[TemplateAssignment]:
+        duplicates = self.template_index.duplicates
+        templates = self.template_index.templates
+        self.settings.logger.info(f"Found {len(templates)} templates and {len(duplicates)} distinct queries among "
+                                  f"{len(self.settings.workload.query_names)} queries")
+        save_stem = self.settings.save_path[:-4]
+        assignments = list()
+        t0 = time.time()
+        for template_index, (template, members) in enumerate(tqdm(templates.items(), desc="Labeling Templates")):
+            representatives = self.get_representatives(members)
+            query_results = dict()
+            for query_name in representatives:
+                self.settings.logger.info(f"Labeling representative: {query_name} of template: {template}")
+                rows = self.labeling.label_query_rows(query_name)
+                query_results[query_name] = self.labeling.results.to_dataframe(rows.start, rows.stop)
+                assignments.append(TemplateAssignment(query_name, template, self.REPRESENTATIVE))
+            # the frames hold the representative results, the buffer is not needed for the next template
+            self.labeling.results.clear()
+            candidates = self.get_candidates(pd.concat(query_results.values(), ignore_index=True))
+            for query_name in members:
+                if query_name in query_results:
+                    continue
+                query_results[query_name] = pd.DataFrame([result.to_dict() for result in
+                                                          self.labeling.check_candidates(query_name, candidates)])
+                assignments.append(TemplateAssignment(query_name, template, self.MEMBER, representatives[0]))
+
+            template_results = list()
+            for query_name in members:
+                template_results.append(query_results[query_name])
+                for duplicate in duplicates[query_name][1:]:
+                    template_results.append(query_results[query_name].assign(query_name=duplicate))
+                    assignments.append(TemplateAssignment(duplicate, template, self.DUPLICATE, query_name))
+
+            # only the results of the new template are exported
+            pd.concat(template_results, ignore_index=True).to_csv(
+                self.settings.save_path, mode="a" if template_index > 0 else "w", header=template_index == 0,
+                index=False)
+            pd.DataFrame([assignment.__dict__ for assignment in assignments]).to_csv(save_stem + "_templates.csv",
+                                                                                     index=False)
+        t1 = time.time() - t0
+        labeled = sum(assignment.role == self.REPRESENTATIVE for assignment in assignments)
+        self.settings.logger.info(f"Finished labeling {len(assignments)} queries with {labeled} full searches in "
+                                  f"{int(t1 / 60)}min {int(t1 % 60)}s.")
+        return assignments
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Label only template representatives in full and reuse their labels "
+                                                 "for the remaining template members and exact duplicates")
+    parser.add_argument("queries", help="Directory in which .sql-queries are located")
+    parser.add_argument("-o", "--output", required=True, help="Output csv save name")
+    parser.add_argument("-c", "--config", required=True, help="Path to config file.")
+    parser.add_argument("-db", "--database", required=True, choices=["imdb", "stack_overflow"], help="")
+    parser.add_argument("-ud", "--use-default", action="store_true", help="Whether or not to use default (six) hints.")
+    parser.add_argument("-ue", "--use-experience", action="store_true", help="Whether or not to use experience.")
+    parser.add_argument("-ues", "--use-early-stopping", action="store_true", help="Whether or not to use "
+                                                                                  "early stopping.")
+    parser.add_argument("-uhr", "--use-hint-removal", action="store_true", help="Whether or not to use hint removal.")
+    parser.add_argument("-ulr", "--use-level-restriction", action="store_true", help="Whether or not to use "
+                                                                                     "level restriction.")
+    parser.add_argument("-m", "--mode", default="sub", choices=["sub", "add", "both"],
+                        help="Which mode (adding/subtracting) of hints to use. This refers to enabling and disabling.")
+    parser.add_argument("-hl", "--hint-library", default=None, help="Optional: <path/to/library.json> of a reduced "
+                                                                    "hint library to use instead of the full one.")
+    parser.add_argument("-r", "--representatives", type=int, default=1, help="Number of fully labeled queries per "
+                                                                             "template.")
+    parser.add_argument("-k", "--top-k", type=int, default=3, help="Number of representative hint sets checked "
+                                                                   "for the other template members.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.queries):
+        raise ValueError(f"Invalid query path: {args.queries}.")
+    if os.path.exists(args.output):
+        raise ValueError(f"Save path: {args.output} already exists.")
+    if not os.path.exists(args.config):
+        raise ValueError(f"Invalid config path: {args.config}.")
+    if args.hint_library is not None and not os.path.exists(args.hint_library):
+        raise ValueError(f"Invalid hint library path: {args.hint_library}.")
+
+    settings = HeuristicLabelingSettings(args.queries, args.output, args.config, args.database, False,
+                                         args.use_default, args.use_experience, args.use_early_stopping,
+                                         args.use_hint_removal, args.use_level_restriction, args.mode,
+                                         args.hint_library)
+    settings.dbc.disable_geqo()
+    settings.logger.info(f"\nRunning Template Labeling on:\n {settings.dbc.version()}.\n")
+
+    try:
+        TemplateLabeling(settings, args.representatives, args.top_k).label_queries()
+    except KeyboardInterrupt:
+        settings.dbc.close_connection()
+
+
+if __name__ == "__main__":
+    run()
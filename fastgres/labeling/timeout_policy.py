@@ -0,0 +1,133 @@
+import abc
+import numpy as np
+
+from typing import Optional
+
+
+class TimeoutPolicy(abc.ABC):
+    """
+    Decides how long hinted queries are allowed to run during labeling. Timeouts are given in ms.
+    """
+
+    @abc.abstractmethod
+    def get_timeout(self, baseline: float, level: Optional[int] = None, hint: Optional[int] = None) -> float:
+        """
+        :param baseline: time of the hint set the current neighborhood is compared against
+        :param level: labeling level of the candidate
+        :param hint: neighborhood offset, i.e., the hint that is toggled to obtain the candidate
+        :return: timeout for the candidate
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_default_timeout(self, cost: float, base_timeout: float) -> float:
+        """
+        :param cost: estimated planner cost of the starting hint set
+        :param base_timeout: upper bound for the starting hint set
+        :return: timeout for the starting hint set
+        """
+        raise NotImplementedError
+
+    def observe(self, level: int, hint: int, baseline: float, measured_time: float, timed_out: bool) -> None:
+        return
+
+    def observe_default(self, cost: float, measured_time: float, timed_out: bool) -> None:
+        return
+
+    def to_dict(self) -> dict:
+        return dict()
+
+
+class StaticTimeoutPolicy(TimeoutPolicy):
+
+    def __init__(self, absolute_timeout: float = 500.0, relative_timeout: float = 1.2):
+        self.absolute_timeout = absolute_timeout
+        self.relative_timeout = relative_timeout
+
+    def get_timeout(self, baseline: float, level: Optional[int] = None, hint: Optional[int] = None) -> float:
+        return max(self.absolute_timeout, baseline * self.relative_timeout)
+
+    def get_default_timeout(self, cost: float, base_timeout: float) -> float:
+        return base_timeout
+
+
+class LearnedTimeoutPolicy(StaticTimeoutPolicy):
+    """
+    Learns per level and toggled hint how much faster winning candidates were compared to their baseline. Once enough
+    candidates were observed, a candidate only gets the budget that a high percentile of historic wins needed. Hints
+    that never won get the smallest budget. Budgets never fall below the baseline itself, so every win still finishes
+    and is observed, otherwise the learned percentile could only shrink. The starting hint set is capped by its planner
+    cost, scaled by the highest observed time per cost unit.
+    """
+
+    def __init__(self, absolute_timeout: float = 500.0, relative_timeout: float = 1.2, percentile: float = 95.0,
+                 slack: float = 1.1, min_relative_timeout: float = 1.0, min_observations: int = 20,
+                 cost_percentile: float = 99.0, cost_slack: float = 10.0):
+        super().__init__(absolute_timeout, relative_timeout)
+        if min_relative_timeout < 1.0:
+            raise ValueError(f"Minimum relative timeout must be at least 1, got: {min_relative_timeout}.")
+        self.percentile = percentile
+        self.slack = slack
+        self.min_relative_timeout = min_relative_timeout
+        self.min_observations = min_observations
+        self.cost_percentile = cost_percentile
+        self.cost_slack = cost_slack
+
+        # (level, hint) -> number of observed candidates and relative times of winning ones
+        self.observations = dict()
+        self.winning_ratios = dict()
+        self.time_per_cost = list()
+
+    def get_relative_timeout(self, level: Optional[int], hint: Optional[int]) -> float:
+        key = (level, hint)
+        if level is None or hint is None or self.observations.get(key, 0) < self.min_observations:
+            return self.relative_timeout
+        ratios = self.winning_ratios.get(key, [])
+        if not ratios:
+            return self.min_relative_timeout
+        learned = float(np.percentile(ratios, self.percentile)) * self.slack
+        return min(self.relative_timeout, max(self.min_relative_timeout, learned))
+
+    def get_timeout(self, baseline: float, level: Optional[int] = None, hint: Optional[int] = None) -> float:
+        return max(self.absolute_timeout, baseline * self.get_relative_timeout(level, hint))
+
+    def get_default_timeout(self, cost: float, base_timeout: float) -> float:
+        if len(self.time_per_cost) < self.min_observations or not cost > 0.0:
+            return base_timeout
+        capped = float(np.percentile(self.time_per_cost, self.cost_percentile)) * self.cost_slack * cost
+        return min(base_timeout, max(self.absolute_timeout, capped))
+
+    def observe(self, level: int, hint: int, baseline: float, measured_time: float, timed_out: bool) -> None:
+        key = (level, hint)
+        self.observations[key] = self.observations.get(key, 0) + 1
+        if not timed_out and measured_time < baseline:
+            try:
+                self.winning_ratios[key].append(measured_time / baseline)
+            except KeyError:
+                self.winning_ratios[key] = [measured_time / baseline]
+
+    def observe_default(self, cost: float, measured_time: float, timed_out: bool) -> None:
+        if not timed_out and cost > 0.0:
+            self.time_per_cost.append(measured_time / cost)
+
+    def to_dict(self) -> dict:
+        return {
+            "observations": {f"{level}:{hint}": count for (level, hint), count in self.observations.items()},
+            "winning_ratios": {f"{level}:{hint}": ratios for (level, hint), ratios in self.winning_ratios.items()},
+            "time_per_cost": self.time_per_cost
+        }
+
+    def load_dict(self, history: dict) -> None:
+        """
+        Continues learning from the history of previous labeling runs.
+        :param history: dictionary as obtained by to_dict
+        """
+        def parse_key(key: str) -> tuple[int, int]:
+            level, hint = key.split(":")
+            return int(level), int(hint)
+
+        for key, count in history["observations"].items():
+            self.observations[parse_key(key)] = self.observations.get(parse_key(key), 0) + count
+        for key, ratios in history["winning_ratios"].items():
+            self.winning_ratios[parse_key(key)] = self.winning_ratios.get(parse_key(key), []) + ratios
+        self.time_per_cost.extend(history["time_per_cost"])
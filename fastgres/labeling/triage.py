@@ -0,0 +1,209 @@
+import argparse
+import dataclasses
+import math
+import os
+import time
+import pandas as pd
+
+from typing import Optional
+from tqdm import trange
+from fastgres.baseline.utility import ExplainNode, OperationMode, get_one_ring_of_hint_set
+from fastgres.labeling.heuristic_labeling import HeuristicLabelingSettings, Labeling
+
+
+JOIN_NODE_TYPES = {"Nested Loop", "Hash Join", "Merge Join"}
+
+
+@dataclasses.dataclass
+class TriageResult:
+    query_name: str
+    default_time: float
+    timed_out: bool
+    max_q_error: Optional[float]
+    misestimated_join_share: Optional[float]
+    distinct_plans: int
+    default_optimal: bool
+
+
+def get_q_error(node: ExplainNode) -> Optional[float]:
+    if node.loops == 0 or math.isnan(node.true_cardinality) or math.isnan(node.cardinality_estimate):
+        return None
+    estimate, actual = max(node.cardinality_estimate, 1.0), max(node.true_cardinality, 1.0)
+    return max(estimate / actual, actual / estimate)
+
+
+def get_max_q_error(plan: ExplainNode) -> Optional[float]:
+    q_errors = list()
+    nodes = [plan]
+    while nodes:
+        node = nodes.pop()
+        q_error = get_q_error(node)
+        if q_error is not None:
+            q_errors.append(q_error)
+        nodes.extend(node.children)
+    return max(q_errors) if q_errors else None
+
+
+def get_misestimated_join_share(plan: ExplainNode, q_error_threshold: float) -> Optional[float]:
+    """
+    :return: share of the execution time spent in the topmost joins whose q-error exceeds the threshold
+    """
+    total_time = plan.execution_time * plan.loops
+    if math.isnan(total_time) or total_time <= 0.0:
+        return None
+    misestimated_time = 0.0
+    nodes = [plan]
+    while nodes:
+        node = nodes.pop()
+        q_error = get_q_error(node)
+        if node.node_type in JOIN_NODE_TYPES and q_error is not None and q_error > q_error_threshold:
+            # inclusive times, so children of counted joins are skipped
+            misestimated_time += node.execution_time * node.loops
+        else:
+            nodes.extend(node.children)
+    return min(1.0, misestimated_time / total_time)
+
+
+class Triage:
+    """
+    Estimates the hinting headroom of queries from one analyzed default execution and a few explained probe hint sets.
+    Queries with accurate estimates or without alternative plans are considered default-optimal.
+    """
+
+    SKIP = "skip"
+    SHALLOW = "shallow"
+
+    def __init__(self, settings: HeuristicLabelingSettings, mode: str, probe_count: int = 6,
+                 q_error_threshold: float = 10.0, share_threshold: float = 0.1):
+        if mode not in (self.SKIP, self.SHALLOW):
+            raise ValueError(f"Unknown triage mode: {mode}")
+        self.settings = settings
+        self.mode = mode
+        self.probe_count = probe_count
+        self.q_error_threshold = q_error_threshold
+        self.share_threshold = share_threshold
+        self.labeling = Labeling(settings)
+        self.default_hint_set = self.settings.hs_factory.default_hint_set()
+
+    def get_probes(self) -> list[int]:
+        neighbors = get_one_ring_of_hint_set(self.default_hint_set.hint_set_int, self.settings.hints_in_use_count,
+                                             OperationMode.SUB, radices=self.settings.hint_radices)
+        step = max(1, len(neighbors) // self.probe_count) if self.probe_count > 0 else len(neighbors) + 1
+        return [self.default_hint_set.hint_set_int - neighbor for neighbor in neighbors[::step][:self.probe_count]]
+
+    def triage_query(self, query_name: str) -> TriageResult:
+        query = self.settings.workload.read_query(query_name)
+        q_result = self.settings.dbc.evaluate_hinted_query(query, self.default_hint_set,
+                                                           timeout=self.labeling.base_timeout, explain_analyze=True)
+        fingerprints = {ExplainNode(self.settings.dbc.explain_query(query, self.default_hint_set)).fingerprint}
+        for probe in self.get_probes():
+            probe_hint_set = self.settings.hs_factory.hint_set(probe)
+            fingerprints.add(ExplainNode(self.settings.dbc.explain_query(query, probe_hint_set)).fingerprint)
+
+        if q_result.timed_out:
+            # long running defaults are always worth labeling
+            return TriageResult(query_name, q_result.time, True, None, None, len(fingerprints), False)
+        analyzed_plan = ExplainNode(q_result.query_plan["Plan"])
+        max_q_error = get_max_q_error(analyzed_plan)
+        share = get_misestimated_join_share(analyzed_plan, self.q_error_threshold)
+        accurate = (max_q_error is None or max_q_error <= self.q_error_threshold) and \
+            (share is None or share <= self.share_threshold)
+        return TriageResult(query_name, q_result.time, False, max_q_error, share, len(fingerprints),
+                            len(fingerprints) <= 1 or accurate)
+
+    def label_default_optimal(self, query_name: str, triage_result: TriageResult) -> range:
+        """
+        :return: rows of the query in the result buffer of the labeling
+        """
+        if self.mode == self.SHALLOW:
+            use_level_restriction, stop_level = self.settings.use_level_restriction, self.settings.stop_level
+            self.settings.use_level_restriction, self.settings.stop_level = True, 1
+            try:
+                return self.labeling.label_query_rows(query_name)
+            finally:
+                self.settings.use_level_restriction, self.settings.stop_level = use_level_restriction, stop_level
+        # the analyzed triage execution includes instrumentation overhead, labels need a plain execution like any other
+        query = self.settings.workload.read_query(query_name)
+        fingerprint = ExplainNode(self.settings.dbc.explain_query(query, self.default_hint_set)).fingerprint
+        timeout = self.settings.get_timeout(triage_result.default_time)
+        q_result = self.settings.dbc.evaluate_hinted_query(query, self.default_hint_set, timeout=timeout)
+        row = self.labeling.results.append(query_name, self.default_hint_set.hint_set_int, q_result.time, 0,
+                                           q_result.timed_out, False, fingerprint, chosen=True)
+        self.labeling.results.set(row, "opt", True)
+        return range(row, row + 1)
+
+    def label_queries(self) -> list[TriageResult]:
+        triage_results = list()
+        t0 = time.time()
+        for query_index in trange(len(self.settings.workload.query_names)):
+            query_name = self.settings.workload.query_names[query_index]
+            triage_result = self.triage_query(query_name)
+            triage_results.append(triage_result)
+            self.settings.logger.info(f"Triage of query: {query_name}: {triage_result}")
+            if triage_result.default_optimal:
+                rows = self.label_default_optimal(query_name, triage_result)
+            else:
+                rows = self.labeling.label_query_rows(query_name)
+            # only the rows of the new query are exported, afterwards they are not needed anymore
+            self.labeling.results.to_csv(self.settings.save_path, rows.start, rows.stop, append=query_index > 0)
+            self.labeling.results.clear()
+            pd.DataFrame([result.__dict__ for result in triage_results]).to_csv(
+                self.settings.save_path[:-4] + "_triage.csv", index=False)
+        t1 = time.time() - t0
+        default_optimal = sum(result.default_optimal for result in triage_results)
+        self.settings.logger.info(f"Finished labeling {len(triage_results)} queries with {default_optimal} "
+                                  f"default-optimal queries in {int(t1 / 60)}min {int(t1 % 60)}s.")
+        return triage_results
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Triage queries by their hinting headroom and label only promising "
+                                                 "queries in full")
+    parser.add_argument("queries", help="Directory in which .sql-queries are located")
+    parser.add_argument("-o", "--output", required=True, help="Output csv save name")
+    parser.add_argument("-c", "--config", required=True, help="Path to config file.")
+    parser.add_argument("-db", "--database", required=True, choices=["imdb", "stack_overflow"], help="")
+    parser.add_argument("-ud", "--use-default", action="store_true", help="Whether or not to use default (six) hints.")
+    parser.add_argument("-ue", "--use-experience", action="store_true", help="Whether or not to use experience.")
+    parser.add_argument("-ues", "--use-early-stopping", action="store_true", help="Whether or not to use "
+                                                                                  "early stopping.")
+    parser.add_argument("-uhr", "--use-hint-removal", action="store_true", help="Whether or not to use hint removal.")
+    parser.add_argument("-ulr", "--use-level-restriction", action="store_true", help="Whether or not to use "
+                                                                                     "level restriction.")
+    parser.add_argument("-m", "--mode", default="sub", choices=["sub", "add", "both"],
+                        help="Which mode (adding/subtracting) of hints to use. This refers to enabling and disabling.")
+    parser.add_argument("-hl", "--hint-library", default=None, help="Optional: <path/to/library.json> of a reduced "
+                                                                    "hint library to use instead of the full one.")
+    parser.add_argument("-tm", "--triage-mode", default=Triage.SKIP, choices=[Triage.SKIP, Triage.SHALLOW],
+                        help="Whether default-optimal queries keep their default or only search one level.")
+    parser.add_argument("-p", "--probes", type=int, default=6, help="Number of explained probe hint sets.")
+    parser.add_argument("-qe", "--q-error", type=float, default=10.0, help="Q-error above which estimates count as "
+                                                                           "misestimated.")
+    parser.add_argument("-ts", "--time-share", type=float, default=0.1, help="Share of time in misestimated joins "
+                                                                             "above which queries are labeled in full.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.queries):
+        raise ValueError(f"Invalid query path: {args.queries}.")
+    if os.path.exists(args.output):
+        raise ValueError(f"Save path: {args.output} already exists.")
+    if not os.path.exists(args.config):
+        raise ValueError(f"Invalid config path: {args.config}.")
+    if args.hint_library is not None and not os.path.exists(args.hint_library):
+        raise ValueError(f"Invalid hint library path: {args.hint_library}.")
+
+    settings = HeuristicLabelingSettings(args.queries, args.output, args.config, args.database, False,
+                                         args.use_default, args.use_experience, args.use_early_stopping,
+                                         args.use_hint_removal, args.use_level_restriction, args.mode,
+                                         args.hint_library)
+    settings.dbc.disable_geqo()
+    settings.logger.info(f"\nRunning Triage Labeling on:\n {settings.dbc.version()}.\n")
+
+    try:
+        Triage(settings, args.triage_mode, args.probes, args.q_error, args.time_share).label_queries()
+    except KeyboardInterrupt:
+        settings.dbc.close_connection()
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,58 @@
+import joblib
+import numpy as np
+
+from sklearn.ensemble import GradientBoostingClassifier
+from fastgres.model.context import Context
+
+
+class IntegerModel:
+
+    def __init__(self):
+        self._model_integer = None
+
+    def fit(self, labels: list[int]):
+        self._model_integer = labels[0]
+        return self
+
+    def predict(self, features):
+        return [self._model_integer for _ in features]
+
+
+class Model:
+
+    def __init__(self):
+        self._model = None
+
+    def fit(self, features, labels, seed, sample_weight=None):
+        if len(np.unique(labels)) <= 1:
+            int_model = IntegerModel()
+            return int_model.fit(labels)
+        self._model = GradientBoostingClassifier(max_depth=1000, random_state=seed).fit(features, labels,
+                                                                                      sample_weight=sample_weight)
+        return self._model
+
+    def predict(self, features):
+        if isinstance(self._model, IntegerModel):
+            return self._model.predict(features)
+        return int(self._model.predict(np.reshape(features, (1, -1)))[0])
+
+
+def predict_top_k(model, features, k: int) -> list[int]:
+    """
+    :param model: trained context model as returned by Model.fit
+    :param features: encoded query
+    :param k: maximum amount of predictions
+    :return: hint set integers ordered by descending predicted probability
+    """
+    if isinstance(model, IntegerModel):
+        return [int(model.predict([features])[0])]
+    probabilities = model.predict_proba(np.reshape(features, (1, -1)))[0]
+    return [int(model.classes_[idx]) for idx in np.argsort(-probabilities, kind="stable")[:k]]
+
+
+def save_models(context_models: dict[Context, object], path: str) -> None:
+    joblib.dump(list(context_models.items()), path)
+
+
+def load_models(path: str) -> dict[Context, object]:
+    return {context: model for context, model in joblib.load(path)}
@@ -17,8 +17,8 @@ def get_wildcard_cardinality(db_connection: DatabaseConnection,
 
 def build_wildcard_dictionary(db_type_dict: dict, workload: Workload, db_connection: DatabaseConnection):
     wild_card_dict = dict()
-    for query_name in tqdm(workload.queries):
-        query = q.Query(query_name, workload)
+    for query_name in tqdm(workload.query_names):
+        query = q.Query.from_workload(query_name, workload)
         for table in query.attributes:
             max_v = 0
             for column in query.attributes[table]:
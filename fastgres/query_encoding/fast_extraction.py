@@ -0,0 +1,193 @@
+import re
+
+from typing import Optional
+
+
+# strings with backslash escapes are left to the full parser
+TOKEN_PATTERN = re.compile(r"""
+    (?P<space>\s+|--[^\n]*)
+    |(?P<string>'(?:[^'\\]|'')*')
+    |(?P<number>\d+(?:\.\d+)?(?![\w.]))
+    |(?P<identifier>[A-Za-z_][A-Za-z0-9_$]*(?:\.[A-Za-z_][A-Za-z0-9_$]*)?)
+    |(?P<operator><>|!=|<=|>=|=|<|>|::|-)
+    |(?P<punctuation>[(),;*])
+""", re.VERBOSE)
+
+KEYWORDS = {"select", "from", "where", "and", "not", "like", "in", "as", "lower", "date", "group", "order", "limit",
+            "having"}
+COMPARISONS = {"=": "eq", "<>": "neq", "!=": "neq", "<": "lt", ">": "gt", "<=": "lte", ">=": "gte"}
+# clauses that may follow the where clause without affecting tables or attributes
+CLAUSE_ENDS = {"group", "order", "limit", "having", ";"}
+# anything that changes tables or predicates beyond plain conjunctions goes through the full parser
+UNSUPPORTED = {"join", "or", "between", "exists", "is", "union", "intersect", "except", "with", "case",
+               "interval", "lateral", "using", "on", "any", "all", "similar", "ilike", "escape"}
+
+
+def _tokenize(query_text: str) -> Optional[list[tuple[str, str]]]:
+    tokens = list()
+    position = 0
+    while position < len(query_text):
+        match = TOKEN_PATTERN.match(query_text, position)
+        if match is None:
+            return None
+        position = match.end()
+        if match.lastgroup == "space":
+            continue
+        kind, text = match.lastgroup, match.group()
+        if kind == "identifier" and text.lower() in KEYWORDS:
+            kind, text = "keyword", text.lower()
+        elif kind == "identifier" and text.lower() in UNSUPPORTED:
+            kind = "unsupported"
+        tokens.append((kind, text))
+    return tokens
+
+
+def _split(tokens: list, separator: tuple[str, str]) -> list[list]:
+    """
+    Splits tokens at the separator outside of parentheses.
+    """
+    parts, current, depth = list(), list(), 0
+    for token in tokens:
+        if token == ("punctuation", "("):
+            depth += 1
+        elif token == ("punctuation", ")"):
+            depth -= 1
+        if token == separator and depth == 0:
+            parts.append(current)
+            current = list()
+        else:
+            current.append(token)
+    parts.append(current)
+    return parts
+
+
+def _strip_parentheses(tokens: list) -> list:
+    while len(tokens) > 2 and tokens[0] == ("punctuation", "(") and tokens[-1] == ("punctuation", ")"):
+        depth = 0
+        for idx, token in enumerate(tokens):
+            if token == ("punctuation", "("):
+                depth += 1
+            elif token == ("punctuation", ")"):
+                depth -= 1
+            if depth == 0 and idx < len(tokens) - 1:
+                # the first parenthesis closes early, e.g., (a) = (b)
+                return tokens
+        tokens = tokens[1:-1]
+    return tokens
+
+
+def _parse_operand(tokens: list):
+    """
+    :return: the operand as mo_sql_parsing represents it or None if unsupported
+    """
+    tokens = _strip_parentheses(tokens)
+    if len(tokens) == 1:
+        kind, text = tokens[0]
+        if kind == "string":
+            return {"literal": text[1:-1].replace("''", "'")}
+        if kind == "number":
+            return float(text) if "." in text else int(text)
+        if kind == "identifier" and "." in text:
+            return text
+        return None
+    if len(tokens) == 2 and tokens[0] == ("operator", "-") and tokens[1][0] == "number":
+        return -_parse_operand(tokens[1:])
+    if len(tokens) == 3 and tokens[0][0] == "string" and tokens[1] == ("operator", "::") and \
+            tokens[2] == ("keyword", "date"):
+        return {"cast": [_parse_operand(tokens[:1]), {"date": {}}]}
+    if len(tokens) == 4 and tokens[0] == ("keyword", "lower") and tokens[1] == ("punctuation", "(") and \
+            tokens[3] == ("punctuation", ")") and tokens[2][0] in ("string", "identifier"):
+        operand = _parse_operand(tokens[2:3])
+        return None if operand is None else {"lower": operand}
+    return None
+
+
+def _parse_predicate(tokens: list) -> Optional[dict]:
+    tokens = _strip_parentheses(tokens)
+    for idx, (kind, text) in enumerate(tokens):
+        if kind == "operator" and text in COMPARISONS:
+            key, left, right = COMPARISONS[text], tokens[:idx], tokens[idx + 1:]
+            break
+        if (kind, text) == ("keyword", "like"):
+            key, left, right = "like", tokens[:idx], tokens[idx + 1:]
+            if left and left[-1] == ("keyword", "not"):
+                key, left = "not_like", left[:-1]
+            break
+        if (kind, text) == ("keyword", "in"):
+            key, left, right = "in", tokens[:idx], tokens[idx + 1:]
+            break
+    else:
+        return None
+    left_operand = _parse_operand(left)
+    if left_operand is None or isinstance(left_operand, (int, float)) or \
+            (isinstance(left_operand, dict) and "literal" in left_operand):
+        return None
+    if key != "in":
+        right_operand = _parse_operand(right)
+        return None if right_operand is None else {key: [left_operand, right_operand]}
+
+    if len(right) < 3 or right[0] != ("punctuation", "(") or right[-1] != ("punctuation", ")"):
+        return None
+    values = [_parse_operand(value) for value in _split(right[1:-1], ("punctuation", ","))]
+    if not all(isinstance(value, dict) and list(value) == ["literal"] for value in values):
+        # numbers and identifiers inside in-lists are represented differently
+        return None
+    if len(values) == 1:
+        return {key: [left_operand, values[0]]}
+    return {key: [left_operand, {"literal": [value["literal"] for value in values]}]}
+
+
+def _parse_from(tokens: list) -> Optional[list]:
+    from_part = list()
+    for entry in _split(tokens, ("punctuation", ",")):
+        if len(entry) == 3 and entry[1] == ("keyword", "as"):
+            entry = [entry[0], entry[2]]
+        if not entry or not all(kind == "identifier" and "." not in text for kind, text in entry):
+            return None
+        if len(entry) == 1:
+            from_part.append(entry[0][1])
+        elif len(entry) == 2:
+            from_part.append({"value": entry[0][1], "name": entry[1][1]})
+        else:
+            return None
+    return from_part
+
+
+def parse_conjunctive_query(query_text: str) -> Optional[dict]:
+    """
+    Tokenizes select-project-join queries whose where clause is a plain conjunction of comparisons and extracts the
+    from and where parts as mo_sql_parsing would.
+    :return: dictionary of the from and where parts or None if the query needs the full parser
+    """
+    tokens = _tokenize(query_text)
+    if not tokens or tokens[0] != ("keyword", "select"):
+        return None
+    if ("keyword", "select") in tokens[1:] or any(kind == "unsupported" for kind, _ in tokens):
+        return None
+    depth, from_index, where_index, end_index = 0, None, None, len(tokens)
+    for idx, token in enumerate(tokens):
+        if token == ("punctuation", "("):
+            depth += 1
+        elif token == ("punctuation", ")"):
+            depth -= 1
+        elif depth == 0 and token == ("keyword", "from") and from_index is None:
+            from_index = idx
+        elif depth == 0 and token == ("keyword", "where") and from_index is not None and where_index is None:
+            where_index = idx
+        elif depth == 0 and token[0] != "string" and token[1] in CLAUSE_ENDS and where_index is not None:
+            end_index = idx
+            break
+    if from_index is None or where_index is None:
+        return None
+
+    from_part = _parse_from(tokens[from_index + 1:where_index])
+    if not from_part:
+        return None
+    conjuncts = list()
+    for conjunct in _split(tokens[where_index + 1:end_index], ("keyword", "and")):
+        predicate = _parse_predicate(conjunct)
+        if predicate is None:
+            return None
+        conjuncts.append(predicate)
+    where_part = conjuncts[0] if len(conjuncts) == 1 else {"and": conjuncts}
+    return {"from": from_part if len(from_part) > 1 else from_part[0], "where": where_part}
@@ -1,8 +1,13 @@
 
+import dataclasses
+import sys
+
+from typing import Any, Optional
 from mo_sql_parsing import parse
 from fastgres.model.context import Context
 from fastgres.workload.workload import Workload
 from fastgres.baseline.log_utils import get_logger
+from fastgres.query_encoding.fast_extraction import parse_conjunctive_query
 from fastgres.query_encoding.query_handlers.select_handler import get_select
 from fastgres.query_encoding.query_handlers.equality_handler import get_equality_information
 from fastgres.query_encoding.query_handlers.context_handler import get_table_entries
@@ -35,6 +40,8 @@ class Query:
             raise ValueError(f"Could not initialize Query with arguments: {args}")
 
         self._select = None
+        # set if only the from and where parts were extracted by the fast path
+        self._query_text = None
         # TODO: handle separately
         self.from_part = self.parsed['from']
         self.where_part = self.parsed['where']
@@ -47,9 +54,15 @@ class Query:
         # actual encoding information
         self._attributes = None
 
+    def _complete(self):
+        if self._query_text is not None:
+            self.parsed = parse(self._query_text)
+            self._query_text = None
+
     @property
     def select(self):
         if self._select is None:
+            self._complete()
             self._select = get_select(self.parsed)
         return self._select
 
@@ -72,9 +85,12 @@ class Query:
         return self._attributes
 
     def __eq__(self, other):
+        self._complete()
+        other._complete()
         return self.parsed == other.parsed and self.attributes == other.attributes
 
     def to_dict(self):
+        self._complete()
         return {
             "name": self.name,
             "parsed": self.parsed,
@@ -99,6 +115,37 @@ class Query:
         obj._attributes = query_dict["attributes"]
         return obj
 
+    @classmethod
+    def from_text(cls, query_name: str, query_text: str):
+        """
+        Extracts the from and where parts of conjunctive select-project-join queries without the full parser, which is
+        used for all other queries and deferred until the full parse is needed.
+        """
+        parts = parse_conjunctive_query(query_text)
+        if parts is None:
+            return cls(query_name, query_text)
+        obj = cls(query_name, parts)
+        obj._query_text = query_text
+        return obj
+
+    @classmethod
+    def from_workload(cls, query_name: str, workload: Workload):
+        """
+        Builds a query from the workload cache if its extracted attributes are cached, parsing it otherwise.
+        """
+        if workload.cache_path is None:
+            return cls.from_text(query_name, workload.read_query(query_name))
+        query_dict = workload.get_cached(query_name, 'query')
+        if query_dict is not None:
+            return cls.from_dict(query_dict)
+        query = cls(query_name, workload)
+        try:
+            workload.set_cached(query_name, 'query', query.to_dict())
+        except (KeyError, ValueError):
+            # unsupported queries only fail once their attributes are used
+            pass
+        return query
+
     def __gt__(self, other):
         return self.name > other.name
 
@@ -108,6 +155,9 @@ class Query:
     def is_in(self, context: Context):
         return self.context in context.covered_contexts
 
+    def compact(self) -> "CompactQuery":
+        return CompactQuery.from_query(self)
+
     def print_info(self):
         print(self.name)
         print('Context: ', self.context)
@@ -189,3 +239,99 @@ class Query:
                             raise ValueError()
 
         return attribute_dict
+
+
+# contexts shared by all compact queries over the same tables
+_contexts = dict()
+
+
+def _freeze(value):
+    return tuple(value) if isinstance(value, list) else value
+
+
+def _thaw(value):
+    return list(value) if isinstance(value, tuple) else value
+
+
+@dataclasses.dataclass(frozen=True)
+class CompactQuery:
+    """
+    Immutable query without the parsed statement that keeps only what the encoders need. Table and column names are
+    interned, equal contexts are shared, and attributes are stored as flat (table, column, operator, value) tuples.
+    """
+    __slots__ = ("name", "aliases", "context", "predicates")
+    name: str
+    # (alias, table) pairs
+    aliases: tuple[tuple[str, str], ...]
+    context: frozenset
+    predicates: tuple[tuple[str, str, str, Any], ...]
+
+    @classmethod
+    def create(cls, name: str, tables: dict, context, attributes: dict):
+        aliases = tuple((sys.intern(alias), sys.intern(table)) for alias, table in tables.items())
+        context = frozenset(sys.intern(table) for table in context)
+        context = _contexts.setdefault(context, context)
+        predicates = tuple((sys.intern(table), sys.intern(column), sys.intern(operator), _freeze(value))
+                           for table, columns in attributes.items()
+                           for column, operators in columns.items()
+                           for operator, value in operators.items())
+        return cls(name, aliases, context, predicates)
+
+    @classmethod
+    def from_query(cls, query: Query):
+        return cls.create(query.name, query.tables, query.context, query.attributes)
+
+    @property
+    def tables(self) -> dict:
+        return dict(self.aliases)
+
+    @property
+    def attributes(self) -> dict:
+        """
+        :return: table -> column -> operator -> value as in Query.attributes, built on every access
+        """
+        attribute_dict = dict()
+        for table, column, operator, value in self.predicates:
+            attribute_dict.setdefault(table, dict()).setdefault(column, dict())[operator] = _thaw(value)
+        return attribute_dict
+
+    def __gt__(self, other):
+        return self.name > other.name
+
+    def __lt__(self, other):
+        return self.name < other.name
+
+    def is_in(self, context: Context):
+        return self.context in context.covered_contexts
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "tables": self.tables,
+            "context": list(self.context),
+            "attributes": self.attributes
+        }
+
+    @classmethod
+    def from_dict(cls, query_dict):
+        """
+        Reads both compact and full query dictionaries.
+        """
+        return cls.create(query_dict["name"], query_dict["tables"], query_dict["context"], query_dict["attributes"])
+
+
+def prepare_queries(workload: Workload, query_names: Optional[list[str]] = None, jobs: Optional[int] = None,
+                    compact: bool = False) -> dict:
+    """
+    Parses uncached queries in parallel, extracts their attributes, and saves the workload cache.
+    :param compact: whether to keep compact queries without parsed statements
+    :return: queries by name
+    """
+    query_names = workload.query_names if query_names is None else query_names
+    workload.parse_queries(query_names, jobs)
+    queries = dict()
+    for query_name in query_names:
+        query = Query.from_workload(query_name, workload)
+        queries[query_name] = query.compact() if compact else query
+    workload.save_cache()
+    return queries
@@ -0,0 +1,190 @@
+import argparse
+import csv
+import dataclasses
+import hashlib
+import os
+import re
+import pandas as pd
+
+from typing import Optional
+from tqdm import tqdm
+
+
+# column positions of the PostgreSQL csvlog format, later versions only append columns
+CSVLOG_SEVERITY = 11
+CSVLOG_MESSAGE = 13
+CSVLOG_DETAIL = 14
+
+MESSAGE_PATTERN = re.compile(r"^(?:duration: (?P<duration>[\d.]+) ms\s*)?(?:statement|execute [^:]*): (?P<query>.*)$",
+                             re.DOTALL)
+PARAMETER_PATTERN = re.compile(r"\$(?P<index>\d+) = (?P<value>'(?:[^']|'')*'|NULL)")
+PLACEHOLDER_PATTERN = re.compile(r"\$(\d+)")
+LITERAL_PATTERN = re.compile(r"'(?:[^']|'')*'|\$\d+|(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])")
+LITERAL_LIST_PATTERN = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+
+
+@dataclasses.dataclass
+class CapturedQuery:
+    query_name: str
+    calls: float
+    total_time: float
+    template: str
+
+
+def normalize(query: str) -> str:
+    return " ".join(query.strip().rstrip(";").split())
+
+
+def get_template_key(query: str) -> str:
+    """
+    Replaces literals and placeholders by ? and collapses literal lists, so concrete queries match the normalized
+    statements of pg_stat_statements.
+    """
+    template = LITERAL_LIST_PATTERN.sub("(?)", LITERAL_PATTERN.sub("?", normalize(query)))
+    return hashlib.sha1(template.lower().encode("utf-8")).hexdigest()[:16]
+
+
+def bind_parameters(query: str, detail: str) -> Optional[str]:
+    """
+    Replaces the placeholders of a prepared statement by the parameters logged in its detail. Parameters keep their
+    logged quotes, so PostgreSQL resolves their type from the column they are compared with.
+    :return: the concrete query or None if a parameter is missing
+    """
+    parameters = dict()
+    for match in PARAMETER_PATTERN.finditer(detail or ""):
+        parameters[match.group("index")] = match.group("value")
+    if any(index not in parameters for index in PLACEHOLDER_PATTERN.findall(query)):
+        return None
+    return PLACEHOLDER_PATTERN.sub(lambda match: parameters[match.group(1)], query)
+
+
+def read_csvlog(log_path: str) -> list[tuple[str, Optional[float]]]:
+    """
+    Reads logged select statements with their duration in ms if log_min_duration_statement was set.
+    """
+    statements = list()
+    with open(log_path, newline="", encoding="utf-8") as file:
+        for row in csv.reader(file):
+            if len(row) <= CSVLOG_DETAIL or row[CSVLOG_SEVERITY] != "LOG":
+                continue
+            match = MESSAGE_PATTERN.match(row[CSVLOG_MESSAGE])
+            if match is None:
+                continue
+            query = match.group("query")
+            if PLACEHOLDER_PATTERN.search(query):
+                query = bind_parameters(query, row[CSVLOG_DETAIL])
+            if query is None or not normalize(query).lower().startswith("select"):
+                continue
+            duration = match.group("duration")
+            statements.append((normalize(query), None if duration is None else float(duration)))
+    return statements
+
+
+def read_statement_snapshot(snapshot_path: str) -> pd.DataFrame:
+    """
+    Reads a csv export of pg_stat_statements with the columns query, calls, and total_exec_time, or total_time before
+    PostgreSQL 13.
+    """
+    snapshot = pd.read_csv(snapshot_path)
+    if "total_exec_time" not in snapshot.columns:
+        snapshot = snapshot.rename(columns={"total_time": "total_exec_time"})
+    missing = {"query", "calls", "total_exec_time"}.difference(snapshot.columns)
+    if missing:
+        raise ValueError(f"Statement snapshot: {snapshot_path} misses columns: {sorted(missing)}.")
+    snapshot = snapshot[snapshot["query"].astype(str).str.lstrip().str.lower().str.startswith("select")]
+    return snapshot.groupby(snapshot["query"].map(get_template_key)).agg(
+        query=("query", "first"), calls=("calls", "sum"), total_exec_time=("total_exec_time", "sum"))
+
+
+class WorkloadCapture:
+    """
+    Collects concrete queries with their number of calls and total execution time in ms. Logged statements count one
+    call each, and snapshot statistics of a template are split over its logged queries by their number of calls.
+    """
+
+    def __init__(self):
+        # normalized query -> [calls, total time]
+        self.queries = dict()
+        self.skipped_templates = 0
+
+    def add_statements(self, statements: list[tuple[str, Optional[float]]]) -> None:
+        for query, duration in statements:
+            try:
+                self.queries[query][0] += 1
+            except KeyError:
+                self.queries[query] = [1, 0.0]
+            self.queries[query][1] += 0.0 if duration is None else duration
+
+    def add_snapshot(self, snapshot: pd.DataFrame) -> None:
+        """
+        Replaces the weights of logged queries by the snapshot statistics of their template. Templates without logged
+        queries are only kept if they contain no placeholders.
+        """
+        logged = dict()
+        for query in self.queries:
+            try:
+                logged[get_template_key(query)].append(query)
+            except KeyError:
+                logged[get_template_key(query)] = [query]
+        for template_key, entry in snapshot.iterrows():
+            if template_key not in logged:
+                if PLACEHOLDER_PATTERN.search(entry["query"]):
+                    self.skipped_templates += 1
+                    continue
+                self.queries[normalize(entry["query"])] = [float(entry["calls"]), float(entry["total_exec_time"])]
+                continue
+            template_calls = sum(self.queries[query][0] for query in logged[template_key])
+            for query in logged[template_key]:
+                share = self.queries[query][0] / template_calls
+                self.queries[query] = [share * float(entry["calls"]), share * float(entry["total_exec_time"])]
+
+    def save(self, save_path: str) -> list[CapturedQuery]:
+        """
+        Writes every query into its own .sql-file named by its content hash and their weights into weights.csv.
+        """
+        os.makedirs(save_path)
+        captured_queries = list()
+        for query, (calls, total_time) in tqdm(sorted(self.queries.items()), desc="Saving Queries"):
+            query_name = hashlib.sha1(query.encode("utf-8")).hexdigest()[:16] + ".sql"
+            with open(os.path.join(save_path, query_name), "w", encoding="utf-8") as file:
+                file.write(query + ";\n")
+            captured_queries.append(CapturedQuery(query_name, calls, total_time, get_template_key(query)))
+        pd.DataFrame([captured.__dict__ for captured in captured_queries],
+                     columns=[captured_field.name for captured_field in dataclasses.fields(CapturedQuery)]).to_csv(
+            os.path.join(save_path, "weights.csv"), index=False)
+        return captured_queries
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Capture a frequency weighted workload of .sql-queries from "
+                                                 "PostgreSQL csv logs and pg_stat_statements snapshots")
+    parser.add_argument("-l", "--logs", nargs="*", default=[], help="PostgreSQL csvlog files. Prepared statements "
+                                                                    "need log_parameter_max_length != 0 so that "
+                                                                    "their parameters are logged.")
+    parser.add_argument("-pss", "--pg-stat-statements", default=None,
+                        help="Optional: csv export of pg_stat_statements with query, calls, and total_exec_time.")
+    parser.add_argument("-o", "--output", required=True, help="Output directory of the captured workload")
+    args = parser.parse_args()
+
+    if os.path.exists(args.output):
+        raise ValueError(f"Save path: {args.output} already exists.")
+    for log_path in args.logs:
+        if not os.path.exists(log_path):
+            raise ValueError(f"Invalid log path: {log_path}.")
+    if args.pg_stat_statements is not None and not os.path.exists(args.pg_stat_statements):
+        raise ValueError(f"Invalid statement snapshot path: {args.pg_stat_statements}.")
+    if not args.logs and args.pg_stat_statements is None:
+        raise ValueError("Either logs or a statement snapshot are needed.")
+
+    capture = WorkloadCapture()
+    for log_path in tqdm(args.logs, desc="Reading Logs"):
+        capture.add_statements(read_csvlog(log_path))
+    if args.pg_stat_statements is not None:
+        capture.add_snapshot(read_statement_snapshot(args.pg_stat_statements))
+    captured_queries = capture.save(args.output)
+    print(f"Captured {len(captured_queries)} queries, skipped {capture.skipped_templates} snapshot templates without "
+          f"logged parameters.")
+
+
+if __name__ == "__main__":
+    run()
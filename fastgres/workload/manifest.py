@@ -0,0 +1,118 @@
+import hashlib
+import json
+import mmap
+import os
+
+from typing import Optional
+
+
+class WorkloadManifest:
+    """
+    Records name, size, modification time, and content hash of every query file of a directory and keeps their texts
+    in one append-only pack file next to the manifest. Rescans only read files whose size or modification time changed,
+    and queries are read from the memory-mapped pack.
+    """
+
+    # rewrite the pack once replaced texts take more space than live ones
+    COMPACTION_RATIO = 1.0
+
+    def __init__(self, query_path: str, manifest_path: str):
+        self.query_path = query_path
+        self.manifest_path = manifest_path
+        self.pack_path = manifest_path + ".pack"
+        # name -> [size, mtime_ns, content hash, pack offset, pack length]
+        self.entries = dict()
+        self._names = None
+        self._pack = None
+        self._pack_file = None
+        self._pack_size = 0
+        if os.path.exists(self.manifest_path) and os.path.exists(self.pack_path):
+            with open(self.manifest_path, "r") as file:
+                self.entries = json.load(file)
+            self._pack_size = os.path.getsize(self.pack_path)
+        elif os.path.exists(self.pack_path):
+            # a pack without manifest cannot be indexed
+            os.remove(self.pack_path)
+        self.changed = self.refresh()
+
+    @property
+    def names(self) -> list[str]:
+        if self._names is None:
+            self._names = sorted(self.entries.keys())
+        return self._names
+
+    def refresh(self) -> bool:
+        """
+        Rescans the query directory and packs new or changed files.
+        :return: whether the manifest changed
+        """
+        stats = dict()
+        with os.scandir(self.query_path) as directory:
+            for entry in directory:
+                if entry.name.endswith("sql") and entry.is_file():
+                    stat = entry.stat()
+                    stats[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        removed = [name for name in self.entries if name not in stats]
+        updated = [name for name, (size, mtime_ns) in stats.items()
+                   if name not in self.entries or self.entries[name][0] != size or self.entries[name][1] != mtime_ns]
+        for name in removed:
+            del self.entries[name]
+        if updated:
+            self._close_pack()
+            with open(self.pack_path, "ab") as pack:
+                for name in sorted(updated):
+                    with open(os.path.join(self.query_path, name), "rb") as file:
+                        content = file.read()
+                    size, mtime_ns = stats[name]
+                    self.entries[name] = [size, mtime_ns, hashlib.sha1(content).hexdigest(), self._pack_size,
+                                          len(content)]
+                    pack.write(content)
+                    self._pack_size += len(content)
+        if not removed and not updated:
+            return False
+        self._names = None
+        live_size = sum(entry[4] for entry in self.entries.values())
+        if self._pack_size - live_size > self.COMPACTION_RATIO * live_size:
+            self.compact()
+        self.save()
+        return True
+
+    def compact(self) -> None:
+        self._close_pack()
+        with open(self.pack_path, "rb") as old_pack:
+            contents = dict()
+            for name in self.names:
+                old_pack.seek(self.entries[name][3])
+                contents[name] = old_pack.read(self.entries[name][4])
+        offset = 0
+        with open(self.pack_path, "wb") as pack:
+            for name in self.names:
+                pack.write(contents[name])
+                self.entries[name][3] = offset
+                offset += len(contents[name])
+        self._pack_size = offset
+
+    def save(self) -> None:
+        with open(self.manifest_path, "w") as file:
+            json.dump(self.entries, file)
+
+    def _close_pack(self) -> None:
+        if self._pack is not None:
+            self._pack.close()
+            self._pack_file.close()
+            self._pack, self._pack_file = None, None
+
+    def _get_pack(self) -> Optional[mmap.mmap]:
+        if self._pack is None and self._pack_size > 0:
+            self._pack_file = open(self.pack_path, "rb")
+            self._pack = mmap.mmap(self._pack_file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._pack
+
+    def get_content_hash(self, name: str) -> str:
+        return self.entries[name][2]
+
+    def read(self, name: str) -> str:
+        _, _, _, offset, length = self.entries[name]
+        if length == 0:
+            return ""
+        return self._get_pack()[offset:offset + length].decode("utf-8")
@@ -0,0 +1,75 @@
+import hashlib
+import json
+
+from tqdm import tqdm
+from fastgres.workload.workload import Workload
+
+
+def strip_literals(node):
+    """
+    Replaces all literals of a parsed query by placeholders. Lists consisting only of literals, e.g., of IN predicates,
+    collapse into one placeholder since templates vary in their number of values.
+    :param node: query as parsed by mo_sql_parsing
+    :return: literal free copy of the node
+    """
+    if isinstance(node, dict):
+        if "literal" in node:
+            return "?"
+        return {key: strip_literals(value) for key, value in node.items()}
+    if isinstance(node, list):
+        stripped = [strip_literals(value) for value in node]
+        return "?" if stripped and all(value == "?" for value in stripped) else stripped
+    if isinstance(node, (bool, int, float)) or node is None:
+        return "?"
+    # remaining strings are identifiers
+    return node
+
+
+def get_fingerprint(node) -> str:
+    return hashlib.sha1(json.dumps(node, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+class TemplateIndex:
+    """
+    Groups the queries of a workload into exact duplicates, i.e., equal parsed queries, and templates, i.e., equal
+    parsed queries after removing their literals. Unparsable queries fall back to their whitespace normalized text and
+    form their own template.
+    """
+
+    def __init__(self, workload: Workload):
+        self.workload = workload
+        self.exact_fingerprints = dict()
+        self.template_fingerprints = dict()
+        for query_name in tqdm(sorted(self.workload.query_names), desc="Fingerprinting Queries"):
+            try:
+                parsed = self.workload.parse_query(query_name)
+                self.exact_fingerprints[query_name] = get_fingerprint(parsed)
+                self.template_fingerprints[query_name] = get_fingerprint(strip_literals(parsed))
+            except ValueError:
+                normalized = " ".join(self.workload.read_query(query_name).split())
+                self.exact_fingerprints[query_name] = get_fingerprint(normalized)
+                self.template_fingerprints[query_name] = self.exact_fingerprints[query_name]
+
+    @staticmethod
+    def _group(fingerprints: dict[str, str]) -> dict[str, list[str]]:
+        groups = dict()
+        for query_name, fingerprint in fingerprints.items():
+            try:
+                groups[fingerprint].append(query_name)
+            except KeyError:
+                groups[fingerprint] = [query_name]
+        return groups
+
+    @property
+    def duplicates(self) -> dict[str, list[str]]:
+        """
+        :return: query names by the first query name of their group of exact duplicates, which includes itself
+        """
+        return {group[0]: group for group in self._group(self.exact_fingerprints).values()}
+
+    @property
+    def templates(self) -> dict[str, list[str]]:
+        """
+        :return: first query names of exact duplicate groups by their template fingerprint
+        """
+        return self._group({query_name: self.template_fingerprints[query_name] for query_name in self.duplicates})
@@ -1,34 +1,84 @@
 
+import csv
+import hashlib
 import os
+import pickle
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
 from mo_sql_parsing import parse
 from fastgres.baseline.log_utils import get_logger
+from fastgres.workload.manifest import WorkloadManifest
 from tqdm import tqdm
 from sklearn.model_selection import train_test_split
 
 
+def _parse_query_file(path: str) -> tuple[str, Optional[dict]]:
+    with open(path, encoding='utf-8') as file:
+        q = file.read()
+    content_hash = hashlib.sha1(q.encode('utf-8')).hexdigest()
+    try:
+        return content_hash, parse(q)
+    except Exception:
+        return content_hash, None
+
+
+class QueryTexts(Sequence):
+    """
+    Query texts in the order of the query names, read on access.
+    """
+
+    def __init__(self, workload):
+        self.workload = workload
+
+    def __len__(self):
+        return len(self.workload.query_names)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.workload.read_query(query_name) for query_name in self.workload.query_names[index]]
+        return self.workload.read_query(self.workload.query_names[index])
+
+
 class Workload:
-    def __init__(self, path: str):
+    def __init__(self, path: str, cache_path: Optional[str] = None, manifest_path: Optional[str] = None):
+        """
+        :param path: directory of .sql-queries
+        :param cache_path: optional pickle file of parsed queries keyed by the hash of their content, so changed files
+        are parsed again automatically
+        :param manifest_path: optional manifest of the directory, whose pack file serves all query reads
+        """
         self.path: str = path
+        self.cache_path = cache_path
+        self.manifest_path = manifest_path
+        self._manifest: Optional[WorkloadManifest] = None
         self._query_names: list[str] = None
-        self._queries: list[str] = None
+        self._queries: Optional[QueryTexts] = None
+        self._cache: Optional[dict] = None
+        self._cache_changed = False
+        self._content_hashes = dict()
+        self._weights: Optional[dict] = None
+
+    @property
+    def manifest(self) -> Optional[WorkloadManifest]:
+        if self._manifest is None and self.manifest_path is not None:
+            self._manifest = WorkloadManifest(self.path, self.manifest_path)
+        return self._manifest
+
+    def get_query_path(self, query_name: str) -> str:
+        return os.path.join(self.path, query_name)
 
     def read_query(self, query_name: str):
-        with open(self.path + query_name, encoding='utf-8') as file:
+        if self.manifest is not None:
+            return self.manifest.read(query_name)
+        with open(self.get_query_path(query_name), encoding='utf-8') as file:
             query = file.read()
         return query
 
-    def _get_queries(self):
-        queries = list()
-        for file in tqdm(os.scandir(self.path), desc="Loading Queries"):
-            if os.path.isfile(os.path.join(self.path, file.name)):
-                if file.name.endswith('sql'):
-                    queries.append(file.name)
-        return list(sorted(queries))
-
     @property
     def queries(self):
         if self._queries is None:
-            self._queries = [self.read_query(q) for q in self._get_query_names()]
+            self._queries = QueryTexts(self)
         return self._queries
 
     @property
@@ -38,23 +88,119 @@ class Workload:
         return self._query_names
 
     def _get_query_names(self):
+        if self.manifest is not None:
+            return list(self.manifest.names)
         queries = list()
-        for file in os.scandir(self.path):
-            if os.path.isfile(os.path.join(self.path, file.name)):
-                if file.name.endswith('sql'):
+        with os.scandir(self.path) as directory:
+            for file in directory:
+                if file.name.endswith('sql') and file.is_file():
                     queries.append(file.name)
-        return queries
+        return list(sorted(queries))
+
+    @property
+    def cache(self) -> dict:
+        if self._cache is None:
+            self._cache = dict()
+            if self.cache_path is not None and os.path.exists(self.cache_path):
+                with open(self.cache_path, 'rb') as file:
+                    self._cache = pickle.load(file)
+        return self._cache
+
+    def save_cache(self):
+        if self.cache_path is not None and self._cache_changed:
+            with open(self.cache_path, 'wb') as file:
+                pickle.dump(self.cache, file, protocol=pickle.HIGHEST_PROTOCOL)
+            self._cache_changed = False
+
+    def get_content_hash(self, query_name: str) -> str:
+        if self.manifest is not None:
+            return self.manifest.get_content_hash(query_name)
+        if query_name not in self._content_hashes:
+            self._content_hashes[query_name] = hashlib.sha1(self.read_query(query_name).encode('utf-8')).hexdigest()
+        return self._content_hashes[query_name]
+
+    def get_cached(self, query_name: str, key: str):
+        """
+        :return: value cached for the current content of the query or None
+        """
+        return self.cache.get(self.get_content_hash(query_name), dict()).get(key)
+
+    def set_cached(self, query_name: str, key: str, value) -> None:
+        self.cache.setdefault(self.get_content_hash(query_name), dict())[key] = value
+        self._cache_changed = True
+
+    def parse_queries(self, query_names: Optional[list[str]] = None, jobs: Optional[int] = None) -> None:
+        """
+        Parses all uncached queries in a process pool and saves the cache.
+        :param query_names: queries to parse, all by default
+        :param jobs: number of processes, all cores by default
+        """
+        query_names = self.query_names if query_names is None else query_names
+        missing = [query_name for query_name in query_names if self.get_cached(query_name, 'parsed') is None]
+        if missing:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                query_paths = [self.get_query_path(query_name) for query_name in missing]
+                parsed_queries = executor.map(_parse_query_file, query_paths,
+                                              chunksize=max(1, len(missing) // (4 * (jobs or os.cpu_count() or 1))))
+                for query_name, (content_hash, parsed_query) in tqdm(zip(missing, parsed_queries), total=len(missing),
+                                                                     desc="Parsing Queries"):
+                    # the file may have changed since hashing
+                    self._content_hashes[query_name] = content_hash
+                    if parsed_query is not None:
+                        self.set_cached(query_name, 'parsed', parsed_query)
+        if len(query_names) == len(self.query_names):
+            # entries of changed or deleted files are dropped
+            current = set(self.get_content_hash(query_name) for query_name in self.query_names)
+            stale = [content_hash for content_hash in self.cache if content_hash not in current]
+            for content_hash in stale:
+                del self.cache[content_hash]
+            self._cache_changed |= bool(stale)
+        self.save_cache()
 
     def parse_query(self, query_name: str):
-        with open(self.path + query_name, encoding='utf-8') as file:
-            q = file.read()
+        if self.cache_path is not None:
+            parsed_query = self.get_cached(query_name, 'parsed')
+            if parsed_query is not None:
+                return parsed_query
+        q = self.read_query(query_name)
         try:
             parsed_query = parse(q)
         except:
             logger = get_logger()
             logger.info(f"Parsing error for query: {query_name}")
             raise ValueError('Could not parse query')
+        if self.cache_path is not None:
+            self.set_cached(query_name, 'parsed', parsed_query)
         return parsed_query
 
+    @property
+    def weights(self) -> dict[str, dict[str, float]]:
+        """
+        :return: calls and total_time by query name as captured in weights.csv of the query directory, empty otherwise
+        """
+        if self._weights is None:
+            self._weights = dict()
+            weights_path = os.path.join(self.path, "weights.csv")
+            if os.path.exists(weights_path):
+                with open(weights_path, newline='', encoding='utf-8') as file:
+                    for row in csv.DictReader(file):
+                        self._weights[row['query_name']] = {'calls': float(row['calls']),
+                                                            'total_time': float(row['total_time'])}
+        return self._weights
+
+    def get_weight(self, query_name: str, by: str) -> float:
+        """
+        :param by: calls or total_time
+        :return: weight of the query, queries without captured weights count once
+        """
+        try:
+            return self.weights[query_name][by]
+        except KeyError:
+            return 1.0
+
+    def get_query_names_by_weight(self, by: str) -> list[str]:
+        # heaviest queries first, ties keep the name order
+        return sorted(self.query_names, key=lambda query_name: -self.get_weight(query_name, by))
+
     def split_query_names(self, train_size: float, seed: int):
         return train_test_split(self.query_names, train_size=train_size, random_state=seed)